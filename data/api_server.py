@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""Read-only asyncio HTTP server for the dashboard API over converted data.
+
+A local stand-in for the dashboard endpoints in ``docs/api-documentation.yaml``,
+for offline use and load testing. It serves what ``convert_invoices.py``
+wrote:
+
+    GET /api/v1/invoices                          one filtered, sorted page of invoices
+    GET /api/v1/invoices/facets                   invoice-filter-facets.json for the filters
+    GET /api/v1/dashboard/summary                 totals, payment stats and top vendors
+    GET /api/v1/dashboard/charts/payment-trends   paid/pending/overdue amounts per period
+    GET /api/v1/stats                             dashboard-metrics.json payload (rollups)
+    GET /api/v1/stats/trends                      count/amount series and deltas (trend cubes)
+
+Every path also answers without the ``/v1`` prefix, as the Next.js routes
+do, and every ``200`` body is ``{"success": true, "data": ...}``. The two
+dashboard endpoints take the documented ``period`` (``7d``, ``30d``,
+``90d`` or ``1y``, counted back from today by received date) and the
+payment trends also take ``groupBy`` (``day``, ``week`` or ``month``).
+The trends endpoint takes ``grain`` (``day``, ``week`` or
+``month``), an optional ``dimension`` (``vendor``, ``category`` or
+``status``, the processing status) with an optional ``value``, and
+``dateFrom``/``dateTo``; it reads the per-day cubes in ``trend_cubes.py``. The listing
+takes the documented ``page``, ``limit``, ``sortBy``, ``sortOrder``,
+``vendor``, ``paymentStatus``, ``sourceTab``, ``dateFrom``, ``dateTo``,
+``amountMin`` and ``amountMax`` parameters, plus ``category``. The
+vendor, status, category and source tab filters may be repeated.
+
+The query store (``invoice_store.py``) and its in-memory column index are
+loaded once, so a request costs a few vectorised operations. Whole responses
+are kept in an LRU cache keyed on the path, the parameters and the as-of
+minute (overdue is judged at the current UTC minute). Every response has an
+ETag, and a request whose ``If-None-Match`` matches it gets an empty ``304``.
+
+Each listing also returns ``nextCursor`` and ``prevCursor``. A cursor pins the
+filters, sort, limit and dataset version, and passing it back as ``cursor``
+continues from there. After a new conversion, an old cursor gets
+``410 CURSOR_EXPIRED`` instead of silently skipping or repeating rows.
+
+The server polls the cleaned CSV. When a conversion replaces it, the new
+dataset loads in a worker thread while requests are still answered from the
+old one. Then the datasets swap and the cache is cleared. If the converter
+didn't refresh the store (``--store``), the server rebuilds it itself once the
+CSV has been unchanged for ``--settle`` seconds.
+
+Usage:
+    python data/api_server.py [--host 127.0.0.1] [--port 8000]
+        [--csv PATH] [--store PATH] [--rollups DIR]
+        [--cache-size 1024] [--poll 1] [--settle 10]
+
+Dependencies:
+    pip install numpy
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import traceback
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+from dashboard_rollups import STATUSES, load_rollups
+from invoice_store import (CSV_FILE, MAX_LIMIT, SORT_FIELDS, STORE_FILE, InvoiceQuery,
+                           InvoiceStore, build_store, store_is_current)
+from trend_cubes import DIMENSIONS, GRAINS
+
+DEFAULT_PORT = 8000
+CACHE_SIZE = 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+STATS_PATHS = ('/api/v1/stats', '/api/stats')
+INVOICE_PATHS = ('/api/v1/invoices', '/api/invoices')
+FACET_PATHS = ('/api/v1/invoices/facets', '/api/invoices/facets')
+TREND_PATHS = ('/api/v1/stats/trends', '/api/stats/trends')
+SUMMARY_PATHS = ('/api/v1/dashboard/summary', '/api/dashboard/summary')
+PAYMENT_TREND_PATHS = ('/api/v1/dashboard/charts/payment-trends',
+                       '/api/dashboard/charts/payment-trends')
+
+FILTER_PARAMS = ('vendor', 'paymentStatus', 'category', 'sourceTab', 'dateFrom', 'dateTo',
+                 'amountMin', 'amountMax')
+LIST_PARAMS = ('page', 'limit', 'sortBy', 'sortOrder', 'cursor')
+TREND_PARAMS = ('grain', 'dimension', 'value', 'dateFrom', 'dateTo')
+SUMMARY_PARAMS = ('period',)
+PAYMENT_TREND_PARAMS = ('period', 'groupBy')
+# Documented ``period`` values in days, and the default per endpoint
+PERIODS = {'7d': 7, '30d': 30, '90d': 90, '1y': 365}
+
+REASONS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 410: 'Gone', 431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class ApiError(Exception):
+    """A request the API rejects, reported in the documented error format."""
+
+    def __init__(self, status: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def _fingerprint(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        out = path.stat()
+    except FileNotFoundError:
+        return None
+    return out.st_size, out.st_mtime_ns
+
+
+def _as_of_minute() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:00.000Z')
+
+
+def _error_payload(code: str, message: str) -> Dict[str, Any]:
+    return {'error': {'code': code, 'message': message, 'details': {}}}
+
+
+class Dataset:
+    """One conversion's rollups and indexed query store, loaded together."""
+
+    def __init__(self, csv_file: Path, store_file: Path, rollups_dir: Path) -> None:
+        # Taken first: if the CSV changes while loading, the next poll notices
+        self.fingerprint = _fingerprint(csv_file)
+        if self.fingerprint is None:
+            raise RuntimeError(f"No converted data at {csv_file}; run convert_invoices.py first")
+        if not store_is_current(store_file, csv_file):
+            build_store(store_file, csv_file)
+        self.rollups = load_rollups(rollups_dir, csv_file)
+        self.store = InvoiceStore(store_file)
+        self.store.load_index()
+        self.version = hashlib.blake2b(repr(self.fingerprint).encode('ascii'),
+                                       digest_size=6).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self.store.index.size
+
+    def close(self) -> None:
+        self.store.close()
+
+
+class ResponseCache:
+    """Least-recently-used cache of encoded ``200`` responses."""
+
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+        self.size = size
+        self.entries: 'OrderedDict[Any, CachedResponse]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Any, entry: CachedResponse) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+# -- parameters -----------------------------------------------------------
+
+def _params(params: Sequence[Tuple[str, str]], allowed: Sequence[str]) -> Dict[str, List[str]]:
+    """Group query parameters by name, rejecting any the endpoint doesn't take."""
+    values: Dict[str, List[str]] = {}
+    for name, value in params:
+        if name not in allowed:
+            raise ApiError(400, 'VALIDATION_ERROR', f"Unknown parameter {name!r}")
+        values.setdefault(name, []).append(value)
+    return values
+
+
+def _single(values: Dict[str, List[str]], name: str) -> Optional[str]:
+    found = values.get(name)
+    if not found:
+        return None
+    if len(found) > 1:
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} may only be given once")
+    return found[0]
+
+
+def _integer(values: Dict[str, List[str]], name: str, default: int,
+             minimum: int, maximum: Optional[int] = None) -> int:
+    raw = _single(values, name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} must be an integer") from None
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f"at least {minimum}" if maximum is None else f"between {minimum} and {maximum}"
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} must be {bounds}")
+    return value
+
+
+def _number(values: Dict[str, List[str]], name: str) -> Optional[float]:
+    raw = _single(values, name)
+    if raw is None:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} must be a number") from None
+
+
+def _date(values: Dict[str, List[str]], name: str) -> Optional[str]:
+    raw = _single(values, name)
+    if raw is None:
+        return None
+    try:
+        return date.fromisoformat(raw).isoformat()
+    except ValueError:
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} must be a date (YYYY-MM-DD)") from None
+
+
+def _choice(values: Dict[str, List[str]], name: str, choices: Sequence[str], default: str) -> str:
+    raw = _single(values, name)
+    if raw is None:
+        return default
+    if raw not in choices:
+        raise ApiError(400, 'VALIDATION_ERROR', f"{name} must be one of {', '.join(choices)}")
+    return raw
+
+
+def _query(values: Dict[str, List[str]]) -> InvoiceQuery:
+    statuses = [status.lower() for status in values.get('paymentStatus', [])]
+    if set(statuses) - set(STATUSES):
+        # PROCESSING, CANCELLED and DISPUTED aren't derivable from the converted data
+        allowed = ', '.join(status.upper() for status in STATUSES)
+        raise ApiError(400, 'VALIDATION_ERROR', f"paymentStatus must be one of {allowed}")
+    return InvoiceQuery(statuses=statuses,
+                        vendors=values.get('vendor', []),
+                        categories=values.get('category', []),
+                        source_tabs=values.get('sourceTab', []),
+                        date_from=_date(values, 'dateFrom'),
+                        date_to=_date(values, 'dateTo'),
+                        amount_min=_number(values, 'amountMin'),
+                        amount_max=_number(values, 'amountMax'))
+
+
+class ApiServer:
+    """Routes requests against the current :class:`Dataset`."""
+
+    def __init__(self, csv_file: Path, store_file: Path, rollups_dir: Path,
+                 cache_size: int = CACHE_SIZE) -> None:
+        self.csv_file = csv_file
+        self.store_file = store_file
+        self.rollups_dir = rollups_dir
+        self.cache = ResponseCache(cache_size)
+        self.dataset = self.load()
+
+    def load(self) -> Dataset:
+        return Dataset(self.csv_file, self.store_file, self.rollups_dir)
+
+    # -- cursors ----------------------------------------------------------
+
+    def _cursor_scope(self, values: Dict[str, List[str]]) -> str:
+        """Digest of everything a cursor must be used with besides its offset."""
+        scope = sorted((name, value) for name, found in values.items()
+                       if name not in ('page', 'cursor') for value in found)
+        return hashlib.blake2b(repr(scope).encode('utf-8'), digest_size=6).hexdigest()
+
+    def _encode_cursor(self, offset: int, scope: str) -> str:
+        raw = json.dumps([self.dataset.version, scope, offset], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def _decode_cursor(self, cursor: str, scope: str) -> int:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            decoded = json.loads(raw)
+            # Valid base64 JSON can still be any value, e.g. "NQ" decodes to 5
+            if not isinstance(decoded, list) or len(decoded) != 3:
+                raise ValueError(decoded)
+            version, cursor_scope, offset = decoded
+        except ValueError:
+            raise ApiError(400, 'INVALID_CURSOR', "cursor is not one this API returned") from None
+        if version != self.dataset.version:
+            raise ApiError(410, 'CURSOR_EXPIRED',
+                           "The data changed since this cursor was issued; start again from page 1")
+        if cursor_scope != scope or not isinstance(offset, int) or offset < 0:
+            raise ApiError(400, 'INVALID_CURSOR',
+                           "cursor was issued for different filters, sort or limit")
+        return offset
+
+    # -- routes -----------------------------------------------------------
+
+    def _invoices(self, values: Dict[str, List[str]], as_of: str) -> Dict[str, Any]:
+        limit = _integer(values, 'limit', 20, 1, MAX_LIMIT)
+        page = _integer(values, 'page', 1, 1)
+        sort_by = _choice(values, 'sortBy', tuple(SORT_FIELDS), 'receivedDate')
+        sort_order = _choice(values, 'sortOrder', ('asc', 'desc'), 'desc')
+        query = _query(values)
+        scope = self._cursor_scope(values)
+        cursor = _single(values, 'cursor')
+        if cursor is not None:
+            # Cursor offsets are multiples of the limit they were issued with
+            page = self._decode_cursor(cursor, scope) // limit + 1
+        data = self.dataset.store.page(query, page, limit, sort_by, sort_order, as_of)
+        pagination = data['pagination']
+        pagination['nextCursor'] = (self._encode_cursor(page * limit, scope)
+                                    if pagination['hasNext'] else None)
+        pagination['prevCursor'] = (self._encode_cursor((page - 2) * limit, scope)
+                                    if pagination['hasPrev'] else None)
+        return {'success': True, 'data': data}
+
+    def _period_query(self, values: Dict[str, List[str]], default: str,
+                      as_of: str) -> InvoiceQuery:
+        days = PERIODS[_choice(values, 'period', tuple(PERIODS), default)]
+        start = date.fromisoformat(as_of[:10]) - timedelta(days=days)
+        return InvoiceQuery(date_from=start.isoformat())
+
+    def _summary(self, params: Sequence[Tuple[str, str]], as_of: str) -> Dict[str, Any]:
+        values = _params(params, SUMMARY_PARAMS)
+        query = self._period_query(values, '30d', as_of)
+        return {'success': True, 'data': self.dataset.store.summary(query, as_of)}
+
+    def _payment_trends(self, params: Sequence[Tuple[str, str]], as_of: str) -> Dict[str, Any]:
+        values = _params(params, PAYMENT_TREND_PARAMS)
+        query = self._period_query(values, '90d', as_of)
+        group_by = _choice(values, 'groupBy', GRAINS, 'week')
+        return {'success': True,
+                'data': self.dataset.store.payment_trends(query, group_by, as_of)}
+
+    def _trends(self, params: Sequence[Tuple[str, str]], as_of: str) -> Dict[str, Any]:
+        values = _params(params, TREND_PARAMS)
+        grain = _choice(values, 'grain', GRAINS, 'month')
+        dimension = _single(values, 'dimension')
+        if dimension is not None and dimension not in DIMENSIONS:
+            raise ApiError(400, 'VALIDATION_ERROR',
+                           f"dimension must be one of {', '.join(DIMENSIONS)}")
+        value = _single(values, 'value')
+        if value is not None and dimension is None:
+            raise ApiError(400, 'VALIDATION_ERROR', "value needs a dimension")
+        date_from, date_to = _date(values, 'dateFrom'), _date(values, 'dateTo')
+        cubes = self.dataset.rollups.trends
+        data: Dict[str, Any] = {'grain': grain, 'dimension': dimension, 'value': value}
+        if dimension is None or value is not None:
+            data['series'] = cubes.series(grain, dimension, value, date_from, date_to)
+            data['trends'] = cubes.deltas(as_of, dimension, value)
+        else:
+            names = cubes.values(dimension)
+            data['series'] = {name: cubes.series(grain, dimension, name, date_from, date_to)
+                              for name in names}
+            data['trends'] = {name: cubes.deltas(as_of, dimension, name) for name in names}
+        return {'success': True, 'data': data}
+
+    def _route(self, path: str, params: Sequence[Tuple[str, str]], as_of: str) -> Dict[str, Any]:
+        if path in STATS_PATHS:
+            return {'success': True, 'data': self.dataset.rollups.dashboard_metrics(as_of)}
+        if path in TREND_PATHS:
+            return self._trends(params, as_of)
+        if path in SUMMARY_PATHS:
+            return self._summary(params, as_of)
+        if path in PAYMENT_TREND_PATHS:
+            return self._payment_trends(params, as_of)
+        if path not in INVOICE_PATHS and path not in FACET_PATHS:
+            raise ApiError(404, 'NOT_FOUND', f"No such endpoint: {path}")
+        values = _params(params, FILTER_PARAMS + LIST_PARAMS)
+        if path in FACET_PATHS:
+            # Listing parameters are accepted and ignored, so the drawer can pass its URL on
+            return {'success': True, 'data': self.dataset.store.facets(_query(values), as_of)}
+        return self._invoices(values, as_of)
+
+    def respond(self, method: str, target: str, headers: Dict[str, str],
+                connection: str = '') -> bytes:
+        """The complete HTTP response message for one request."""
+        if method not in ('GET', 'HEAD'):
+            body = json.dumps(_error_payload('METHOD_NOT_ALLOWED', "This API is read-only"))
+            return _message(405, body.encode('utf-8'), ('Allow: GET, HEAD',), connection)
+
+        path, _, query_string = target.partition('?')
+        as_of = _as_of_minute()
+        params = tuple(sorted(parse_qsl(query_string)))
+        key = (path, params, as_of)
+        entry = self.cache.get(key)
+        if entry is None:
+            try:
+                payload = self._route(path, params, as_of)
+            except ApiError as exc:
+                body = json.dumps(_error_payload(exc.code, str(exc))).encode('utf-8')
+                return _message(exc.status, body, (), connection, method == 'HEAD')
+            except Exception:
+                traceback.print_exc()
+                body = json.dumps(_error_payload('INTERNAL_ERROR', "Unexpected server error"))
+                return _message(500, body.encode('utf-8'), (), connection, method == 'HEAD')
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            # Content-only, so a reconversion that changes nothing keeps clients' copies valid
+            entry = CachedResponse(f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"', body)
+            self.cache.put(key, entry)
+
+        extra = (f'ETag: {entry.etag}', 'Cache-Control: no-cache')
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            if entry.etag in tags or '*' in tags:
+                return _message(304, b'', extra, connection, head_only=True)
+        return _message(200, entry.body, extra, connection, method == 'HEAD')
+
+    # -- reloading --------------------------------------------------------
+
+    async def watch(self, poll: float, settle: float) -> None:
+        """Swap in each new conversion once its store is ready."""
+        loop = asyncio.get_running_loop()
+        seen, changed_at = None, 0.0
+        while True:
+            await asyncio.sleep(poll)
+            fingerprint = _fingerprint(self.csv_file)
+            if fingerprint is None or fingerprint == self.dataset.fingerprint:
+                continue
+            if fingerprint != seen:
+                # Still being written, or a new conversion: wait for it to settle
+                seen, changed_at = fingerprint, loop.time()
+            ready = await loop.run_in_executor(None, store_is_current,
+                                               self.store_file, self.csv_file)
+            if not ready and loop.time() - changed_at < settle:
+                continue
+            started = time.perf_counter()
+            try:
+                dataset = await loop.run_in_executor(None, self.load)
+            except Exception as exc:
+                print(f"Reload failed, still serving the previous data: {exc}")
+                seen = None
+                continue
+            previous, self.dataset = self.dataset, dataset
+            self.cache.clear()
+            previous.close()
+            print(f"Reloaded {dataset.size:,} invoices (version {dataset.version}) "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+    async def serve(self, host: str, port: int, poll: float, settle: float) -> None:
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: HttpProtocol(self), host, port)
+        print(f"Serving {self.dataset.size:,} invoices on http://{host}:{port}/api/v1/invoices")
+        watcher = asyncio.ensure_future(self.watch(poll, settle))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def _message(status: int, body: bytes, headers: Sequence[str] = (), connection: str = '',
+             head_only: bool = False) -> bytes:
+    lines = [f'HTTP/1.1 {status} {REASONS[status]}']
+    if status != 304:
+        lines.append('Content-Type: application/json')
+        lines.append(f'Content-Length: {len(body)}')
+    lines.extend(headers)
+    if connection:
+        lines.append(f'Connection: {connection}')
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    return head if head_only else head + body
+
+
+class HttpProtocol(asyncio.Protocol):
+    """HTTP/1.x with keep-alive and pipelining, for bodiless requests."""
+
+    def __init__(self, server: ApiServer) -> None:
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = b''
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.transport = None
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        while self.transport is not None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    body = json.dumps(_error_payload('HEADERS_TOO_LARGE', "Request head too large"))
+                    self._send(_message(431, body.encode('utf-8'), (), 'close'), keep_alive=False)
+                return
+            head = self.buffer[:end].decode('latin-1')
+            self.buffer = self.buffer[end + 4:]
+            self._handle(head)
+
+    def _handle(self, head: str) -> None:
+        request_line, *header_lines = head.lstrip('\r\n').split('\r\n')
+        parts = request_line.split(' ')
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            body = json.dumps(_error_payload('BAD_REQUEST', "Malformed request line"))
+            self._send(_message(400, body.encode('utf-8'), (), 'close'), keep_alive=False)
+            return
+        method, target, version = parts
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        requested = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive, connection = requested != 'close', ''
+        else:
+            keep_alive = requested == 'keep-alive'
+            connection = 'keep-alive' if keep_alive else ''
+        if headers.get('content-length', '0') != '0' or 'transfer-encoding' in headers:
+            # Bodies are never read, so the rest of this stream can't be parsed
+            keep_alive = False
+        if not keep_alive:
+            connection = 'close'
+        self._send(self.server.respond(method, target, headers, connection), keep_alive)
+
+    def _send(self, message: bytes, keep_alive: bool) -> None:
+        self.transport.write(message)
+        if not keep_alive:
+            self.transport.close()
+            self.transport = None
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--csv', type=Path, default=CSV_FILE,
+                        help='cleaned CSV to serve (default: %(default)s)')
+    parser.add_argument('--store', type=Path, default=STORE_FILE,
+                        help='query store built from it (default: %(default)s)')
+    parser.add_argument('--rollups', type=Path, default=None,
+                        help='rollups directory (default: next to the CSV)')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help='responses kept in the LRU cache (default: %(default)s)')
+    parser.add_argument('--poll', type=float, default=1.0,
+                        help='seconds between checks for a new conversion (default: %(default)s)')
+    parser.add_argument('--settle', type=float, default=10.0,
+                        help='seconds to wait for the converter to refresh the store before '
+                             'rebuilding it here (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    rollups_dir = args.rollups or args.csv.with_name(args.csv.stem + '.rollups')
+    started = time.perf_counter()
+    server = ApiServer(args.csv, args.store, rollups_dir, args.cache_size)
+    print(f"Loaded {server.dataset.size:,} invoices in {time.perf_counter() - started:.1f}s")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.poll, args.settle))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark the invoice converter on synthetic exports of increasing size.
+
+For every (size, mode) pair a synthetic export is generated once (and cached
+in the work directory), then converted in a fresh interpreter so peak RSS is
+measured per run. Results are printed, and optionally written, as JSON:
+
+    {"python": "3.11.7", "runs": [
+        {"rows": 100000, "mode": "batch", "seconds": 2.1, "rows_per_sec": 47619,
+         "stages": {"read": 0.9, "transform": 0.8, "sort": 0.1, "write": 0.3},
+         "peak_rss_mb": 412.5, "peak_children_rss_mb": 0.0, ...}]}
+
+Usage:
+    python data/benchmark_conversion.py [--sizes 10000 100000 1000000]
+        [--modes batch stream parallel columnar compact] [--parsers csv fast]
+        [--json results.json]
+
+``--parsers`` runs every row-engine mode once per TSV parser: the csv
+module's ``DictReader`` and the chunked reader in ``fast_tsv.py``. The
+``read`` stage isolates parsing time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import convert_invoices as converter
+from synthetic_invoices import write_tsv
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+MODES = ('batch', 'stream', 'parallel', 'columnar', 'compact')
+
+
+def _peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / scale, 1)
+
+
+def run_one(mode: str, input_file: Path, output_file: Path, parser: str = 'csv') -> Dict[str, Any]:
+    """Convert once in this process and describe the run."""
+    runners = {
+        'batch': converter.convert_batch,
+        'stream': converter.convert_streaming,
+        'parallel': converter.convert_parallel,
+        'columnar': converter.convert_columnar,
+        'compact': converter.convert_compact,
+    }
+    if mode not in runners:
+        raise ValueError(f"Unknown mode {mode!r}")
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'columnar':
+            stats = runners[mode](input_file, output_file)
+        else:
+            stats = runners[mode](input_file, output_file, parser=parser)
+    seconds = time.perf_counter() - started
+
+    return {
+        'mode': mode,
+        'parser': parser,
+        'rows': stats.original,
+        'rows_written': stats.written,
+        'duplicates': stats.duplicates,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(stats.original / seconds) if seconds else None,
+        'stages': {name: round(value, 4) for name, value in stats.timer.as_dict().items()},
+        'parse_failures': dict(stats.parse_failures),
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF),
+        'peak_children_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_isolated(mode: str, input_file: Path, output_file: Path,
+                 parser: str = 'csv') -> Dict[str, Any]:
+    """Run :func:`run_one` in a fresh interpreter so RSS isn't shared between runs."""
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), '--run-one', mode,
+         str(input_file), str(output_file), '--parser', parser],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def run_suite(sizes, modes, workdir: Path, seed: int = 2024,
+              parsers=('csv',)) -> Dict[str, Any]:
+    runs: List[Dict[str, Any]] = []
+    for size in sizes:
+        input_file = workdir / f'synthetic-{size}-{seed}.tsv'
+        if not input_file.exists():
+            started = time.perf_counter()
+            write_tsv(input_file, size, seed=seed)
+            print(f"[benchmark] generated {size:,} rows in "
+                  f"{time.perf_counter() - started:.1f}s", file=sys.stderr)
+        for mode in modes:
+            for parser in parsers if mode != 'columnar' else ('csv',):
+                output_file = workdir / f'out-{size}-{mode}-{parser}.csv'
+                result = run_isolated(mode, input_file, output_file, parser)
+                result['input_bytes'] = input_file.stat().st_size
+                runs.append(result)
+                print(f"[benchmark] {size:>9,} rows  {mode:<9} {parser:<5} "
+                      f"{result['seconds']:8.2f}s  {result['rows_per_sec'] or 0:>9,} rows/s  "
+                      f"read {result['stages'].get('read', 0):6.2f}s  "
+                      f"peak {result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+                output_file.unlink()
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'runs': runs,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=['batch', 'stream', 'parallel'])
+    parser.add_argument('--parsers', nargs='+', choices=converter.TSV_PARSERS, default=['csv'],
+                        help='TSV parsers to compare (columnar always uses its own)')
+    parser.add_argument('--parser', choices=converter.TSV_PARSERS, default='csv',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--json', type=Path, default=None, help='also write results here')
+    parser.add_argument('--workdir', type=Path, default=None,
+                        help='keep generated exports here between runs (default: temp dir)')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--run-one', nargs=3, metavar=('MODE', 'INPUT', 'OUTPUT'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        mode, input_file, output_file = args.run_one
+        print(json.dumps(run_one(mode, Path(input_file), Path(output_file), args.parser)))
+        return
+
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        report = run_suite(args.sizes, args.modes, args.workdir, args.seed, args.parsers)
+    else:
+        with tempfile.TemporaryDirectory(prefix='invoice-bench-') as workdir:
+            report = run_suite(args.sizes, args.modes, Path(workdir), args.seed, args.parsers)
+
+    text = json.dumps(report, indent=2)
+    if args.json:
+        args.json.write_text(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
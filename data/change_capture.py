@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Change-data-capture deltas of the cleaned CSV between conversions.
+
+Every conversion rewrites ``invoices_cleaned_2024.csv`` whole, but between
+two runs only a handful of invoices are new or different. This stage hashes
+each output row, keyed by ``Email_ID``, compares the hashes with the
+previous run's and writes only the differences:
+
+    invoices_cleaned_2024.changes/
+        index.sqlite                     row hash per key, plus a log of runs
+        20250918T031500Z-1a2b3c4d.jsonl  one delta per run
+
+A delta is JSON lines. The first line describes the run (``runId``,
+``previousRunId``, ``createdAt``, ``source``, ``fieldnames`` and counts per
+operation). Each following line is one change:
+
+    {"op": "insert", "key": "...", "row": {...}}
+    {"op": "update", "key": "...", "row": {...}}
+    {"op": "delete", "key": "..."}
+
+Rows are the CSV's values as strings. A row without an ``Email_ID`` is keyed
+by its own hash, so editing it shows up as a delete plus an insert. A repeated
+``Email_ID`` gets ``#2``, ``#3``, ... appended in file order. The first run
+against an empty index inserts every row.
+
+The delta file is published before the new hashes are committed. If a run
+dies between the two, the next run reports the same changes again under a
+new run id: deltas are at-least-once, which suits upserts. Deltas are never
+pruned here; the consumer removes files it has applied.
+
+``convert_invoices.py --changes`` runs this after each conversion.
+
+Usage:
+    python data/change_capture.py capture [--csv PATH] [--dir DIR]
+    python data/change_capture.py runs [--dir DIR]
+    python data/change_capture.py reset [--dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from compressed_io import open_file, plain_path
+
+DATA_DIR = Path(__file__).resolve().parent
+CSV_FILE = DATA_DIR / 'invoices_cleaned_2024.csv'
+INDEX_NAME = 'index.sqlite'
+KEY_FIELD = 'Email_ID'
+OPERATIONS = ('insert', 'update', 'delete')
+# Rows diffed per batch of index writes and lookups
+CHUNK_ROWS = 500
+# Separates values in the hashed text; never appears in the mailbox data
+_SEPARATOR = '\x1f'
+
+# The index is keyed on a 64-bit digest of the key: Email_IDs are ~150
+# characters sharing a long prefix, which makes a text B-tree several times
+# slower to fill and probe. The text is kept in append-only row_keys, read
+# only to name deleted rows.
+INDEX_TABLES = """
+CREATE TABLE IF NOT EXISTS {prefix}_hashes (
+    key_digest INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL,
+    batch INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {prefix}_keys (
+    key_digest INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+"""
+SCHEMA = INDEX_TABLES.format(prefix='row') + """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    delta_file TEXT NOT NULL,
+    inserted INTEGER NOT NULL,
+    updated INTEGER NOT NULL,
+    deleted INTEGER NOT NULL,
+    unchanged INTEGER NOT NULL
+);
+"""
+
+
+def changes_dir_for(csv_file: Path) -> Path:
+    """``x.changes/`` next to ``x.csv`` (or ``x.csv.gz``)."""
+    base = plain_path(Path(csv_file))
+    return base.with_name(base.stem + '.changes')
+
+
+def row_hash(values: Sequence[str]) -> bytes:
+    """Digest of a row's values as the CSV holds them."""
+    return hashlib.blake2b(_SEPARATOR.join(values).encode('utf-8'), digest_size=16).digest()
+
+
+def key_digest(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(),
+                          'big', signed=True)
+
+
+def new_run_id() -> str:
+    """Sortable by time, unique across runs started in the same second."""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class ChangeRun:
+    """Summary of one captured delta."""
+
+    run_id: str
+    previous_run_id: Optional[str]
+    created_at: str
+    source: str
+    delta_file: str
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def header(self, fieldnames: List[str]) -> Dict[str, Any]:
+        return {
+            'runId': self.run_id,
+            'previousRunId': self.previous_run_id,
+            'createdAt': self.created_at,
+            'source': self.source,
+            'fieldnames': fieldnames,
+            'counts': self.counts,
+        }
+
+
+class ChangeCapture:
+    """Hash index of the previous output and the deltas against it."""
+
+    def __init__(self, changes_dir: Path) -> None:
+        self.changes_dir = Path(changes_dir)
+        self.changes_dir.mkdir(parents=True, exist_ok=True)
+        # Transactions are explicit: the index swap includes table renames
+        self.conn = sqlite3.connect(str(self.changes_dir / INDEX_NAME), isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> 'ChangeCapture':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def last_run(self) -> Optional[str]:
+        row = self.conn.execute('SELECT run_id FROM runs ORDER BY rowid DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def runs(self) -> List[ChangeRun]:
+        runs, previous = [], None
+        for run_id, created_at, source, delta_file, *counts in self.conn.execute(
+                'SELECT run_id, created_at, source, delta_file, inserted, updated, deleted, '
+                'unchanged FROM runs ORDER BY rowid'):
+            runs.append(ChangeRun(run_id, previous, created_at, source, delta_file,
+                                  dict(zip(OPERATIONS + ('unchanged',), counts))))
+            previous = run_id
+        return runs
+
+    def reset(self) -> None:
+        """Forget the hashes, so the next capture inserts every row."""
+        self.conn.execute('DELETE FROM row_hashes')
+        self.conn.execute('DELETE FROM row_keys')
+
+    def _claim(self, key: str, digest: bytes, batch: int) -> Tuple[str, int]:
+        """Record ``key``, or under the first free ``key#n`` if it is taken."""
+        claimed, n = key, 2
+        while True:
+            claimed_digest = key_digest(claimed)
+            cursor = self.conn.execute('INSERT OR IGNORE INTO next_hashes VALUES (?, ?, ?)',
+                                       (claimed_digest, digest, batch))
+            if cursor.rowcount:
+                return claimed, claimed_digest
+            claimed = f'{key}#{n}'
+            n += 1
+
+    def _record(self, keys: List[str], digests: List[bytes],
+                batch: int) -> Tuple[List[str], List[int]]:
+        """Record a chunk of keys for this run; returns the keys used and their digests."""
+        conn = self.conn
+        key_digests = [key_digest(key) for key in keys]
+        before = conn.total_changes
+        conn.executemany('INSERT OR IGNORE INTO next_hashes VALUES (?, ?, ?)',
+                         zip(key_digests, digests, [batch] * len(keys)))
+        if conn.total_changes - before != len(keys):
+            # A repeated Email_ID: redo the chunk a row at a time so suffixes
+            # are handed out in file order, whatever the chunk boundaries
+            conn.execute('DELETE FROM next_hashes WHERE batch = ?', (batch,))
+            for i, (key, digest) in enumerate(zip(keys, digests)):
+                keys[i], key_digests[i] = self._claim(key, digest, batch)
+        conn.executemany('INSERT INTO next_keys VALUES (?, ?)', zip(key_digests, keys))
+        return keys, key_digests
+
+    def _previous(self, key_digests: List[int]) -> Dict[int, bytes]:
+        marks = ','.join('?' * len(key_digests))
+        return dict(self.conn.execute(
+            f'SELECT key_digest, hash FROM row_hashes WHERE key_digest IN ({marks})',
+            key_digests))
+
+    def capture(self, rows: Iterable[Sequence[str]], fieldnames: List[str],
+                source: str = '', chunk_rows: int = CHUNK_ROWS) -> ChangeRun:
+        """Diff ``rows`` (value lists in ``fieldnames`` order) against the index,
+        write the delta and advance the index."""
+        run = ChangeRun(new_run_id(), self.last_run(),
+                        datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        source, '')
+        run.delta_file = f'{run.run_id}.jsonl'
+        counts = dict.fromkeys(OPERATIONS + ('unchanged',), 0)
+        delta_path = self.changes_dir / run.delta_file
+        body_path = delta_path.with_name(delta_path.name + '.body')
+        tmp_path = delta_path.with_name(delta_path.name + '.tmp')
+        key_index = fieldnames.index(KEY_FIELD)
+        conn = self.conn
+        conn.execute('BEGIN')
+        try:
+            conn.execute('DROP TABLE IF EXISTS next_hashes')
+            conn.execute('DROP TABLE IF EXISTS next_keys')
+            for statement in INDEX_TABLES.format(prefix='next').split(';'):
+                conn.execute(statement)
+            with open(body_path, 'w', encoding='utf-8') as body:
+
+                def diff(chunk: List[Sequence[str]], batch: int) -> None:
+                    digests = [row_hash(values) for values in chunk]
+                    keys, key_digests = self._record(
+                        [values[key_index] or '#' + digest.hex()
+                         for values, digest in zip(chunk, digests)], digests, batch)
+                    previous = self._previous(key_digests)
+                    for values, key, digest, old in zip(chunk, keys, digests,
+                                                        map(previous.get, key_digests)):
+                        if old == digest:
+                            counts['unchanged'] += 1
+                            continue
+                        op = 'insert' if old is None else 'update'
+                        counts[op] += 1
+                        body.write(json.dumps({'op': op, 'key': key,
+                                               'row': dict(zip(fieldnames, values))},
+                                              ensure_ascii=False) + '\n')
+
+                chunk: List[Sequence[str]] = []
+                batch = 0
+                for values in rows:
+                    chunk.append(values)
+                    if len(chunk) >= chunk_rows:
+                        diff(chunk, batch)
+                        chunk, batch = [], batch + 1
+                if chunk:
+                    diff(chunk, batch)
+                for (key,) in conn.execute(
+                        'SELECT key FROM row_keys WHERE key_digest IN '
+                        '(SELECT key_digest FROM row_hashes EXCEPT '
+                        'SELECT key_digest FROM next_hashes) ORDER BY rowid'):
+                    counts['delete'] += 1
+                    body.write(json.dumps({'op': 'delete', 'key': key}, ensure_ascii=False) + '\n')
+            run.counts = counts
+
+            with open(tmp_path, 'w', encoding='utf-8') as out, \
+                    open(body_path, 'r', encoding='utf-8') as body:
+                out.write(json.dumps(run.header(fieldnames), ensure_ascii=False) + '\n')
+                for line in body:
+                    out.write(line)
+            for table in ('hashes', 'keys'):
+                conn.execute(f'DROP TABLE row_{table}')
+                conn.execute(f'ALTER TABLE next_{table} RENAME TO row_{table}')
+            conn.execute('INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (run.run_id, run.created_at, source, run.delta_file, counts['insert'],
+                          counts['update'], counts['delete'], counts['unchanged']))
+            os.replace(tmp_path, delta_path)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            body_path.unlink(missing_ok=True)
+        return run
+
+
+def capture_csv(csv_file: Path, changes_dir: Optional[Path] = None) -> ChangeRun:
+    """Capture the changes in a cleaned CSV since the previous capture."""
+    changes_dir = changes_dir or changes_dir_for(csv_file)
+    with ChangeCapture(changes_dir) as capture, \
+            open_file(csv_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        fieldnames = next(reader, [])
+        return capture.capture(reader, fieldnames, str(csv_file))
+
+
+def read_delta(delta_file: Path) -> Iterable[Dict[str, Any]]:
+    """The header, then each change, of a delta file."""
+    with open(delta_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def describe(run: ChangeRun) -> str:
+    counts = run.counts
+    return (f"{run.run_id}: {counts['insert']:,} inserted, {counts['update']:,} updated, "
+            f"{counts['delete']:,} deleted, {counts['unchanged']:,} unchanged")
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', type=Path, default=CSV_FILE,
+                        help='cleaned CSV (default: %(default)s)')
+    parser.add_argument('--dir', type=Path, default=None,
+                        help='changes directory (default: next to the CSV)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('capture', help='write the delta since the previous capture')
+    commands.add_parser('runs', help='list captured runs')
+    commands.add_parser('reset', help='forget the hashes; the next capture inserts every row')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    changes_dir = args.dir or changes_dir_for(args.csv)
+    if args.command == 'capture':
+        started = time.perf_counter()
+        run = capture_csv(args.csv, changes_dir)
+        print(f"{describe(run)} in {time.perf_counter() - started:.2f}s")
+        print(f"Delta written to: {changes_dir / run.delta_file}")
+        return
+    with ChangeCapture(changes_dir) as capture:
+        if args.command == 'reset':
+            capture.reset()
+            print(f"Cleared the hash index in {changes_dir}")
+            return
+        for run in capture.runs():
+            print(f"{describe(run)}  ({run.delta_file})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Declarative column mappings compiled into one Python function per spec.
+
+A mapping spec (JSON, or YAML with PyYAML installed) describes how a source
+row dict becomes one dashboard row:
+
+    {
+      "name": "mailbox",
+      "columns": ["Email_ID", "Vendor", ...],        output order
+      "fields": {                                     evaluated in order
+        "Email_ID": {"field": "message_id"},
+        "Vendor": {"field": "supplier_name",
+                   "fallback": {"field": "email_from_name", "default": "Unknown Vendor"},
+                   "count": "vendor_stats"},
+        ...
+      }
+    }
+
+Every entry of ``fields`` is computed in order and may refer to earlier ones;
+those named in ``columns`` are returned. An entry is an expression:
+
+* a JSON scalar: that constant;
+* ``{"field": name}``: the source column (``default``, ``''`` unless given,
+  when the row lacks it); a list of names reads the first column the row has,
+  else the last;
+* ``{"ref": name}``: an earlier entry;
+* ``{"stat": name}``: an attribute of the stats object, e.g. ``run_timestamp``;
+* ``{"template": "Invoice {invoice_number}"}``: ``str.format`` over source
+  columns;
+* ``{"cases": [{"when": condition, "then": value}, ...], "else": value}``;
+* conditions, which are expressions too: ``{"contains": [value, text]}``
+  (case-insensitive), ``{"present": column}``, ``{"empty": value}``,
+  ``{"equals": [a, b]}``, ``{"all": [...]}``, ``{"any": [...]}`` and
+  ``{"not": condition}``; any other value tests on its truthiness.
+
+and may add, applied in this order:
+
+* ``parser``: a named parser (``amount``, ``date``) returning
+  ``(value, ok)``; failures are counted in ``stats.parse_failures`` under the
+  source column's name, so a parsed entry must be a ``field``;
+* ``fallback``: a value used when the result is empty;
+* ``count``: a ``stats`` counter dict incremented per value, and ``sum``: a
+  ``stats`` attribute the value is added to.
+
+:func:`compile_spec` turns a spec into Python source (one local per entry,
+the rules inlined as plain ``if``/conditional expressions) and executes it
+once, so rows pay nothing for the spec being data. ``convert_invoices.py``
+builds ``transform_row`` from ``mappings/mailbox.json`` this way.
+
+Usage:
+    python data/column_mapping.py show [SPEC]
+
+Dependencies:
+    pip install pyyaml    (YAML specs only; JSON is in the standard library)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import linecache
+import string
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+MAPPINGS_DIR = Path(__file__).resolve().parent / 'mappings'
+MAILBOX_SPEC = MAPPINGS_DIR / 'mailbox.json'
+
+MODIFIERS = ('parser', 'fallback', 'count', 'sum')
+_CONDITIONS = ('contains', 'present', 'empty', 'equals', 'all', 'any', 'not')
+KINDS = ('field', 'ref', 'stat', 'template', 'cases') + _CONDITIONS
+
+
+def load_spec(path: Path) -> Dict[str, Any]:
+    """Read a spec from ``.json``, ``.yaml`` or ``.yml``."""
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise RuntimeError("YAML mapping specs need PyYAML: pip install pyyaml") from exc
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def spec_digest(spec: Dict[str, Any]) -> str:
+    """Digest of what a spec maps (its columns and fields, not its name or description)."""
+    rules = json.dumps({'columns': spec['columns'], 'fields': spec['fields']},
+                       sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(rules.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class _Compiler:
+    """Generates the source of one spec's function."""
+
+    def __init__(self, spec: Dict[str, Any], parsers: Dict[str, Callable]) -> None:
+        self.spec_name = spec.get('name', 'mapping')
+        self.parsers = parsers
+        self.names: Dict[str, str] = {}
+        self.lines: List[str] = []
+        self.aliases: Dict[str, str] = {}
+
+    def error(self, entry: str, message: str) -> ValueError:
+        return ValueError(f"Mapping {self.spec_name!r}, {entry!r}: {message}")
+
+    def _identifier(self, entry: str, name: Any, what: str) -> str:
+        if not isinstance(name, str) or not name.isidentifier():
+            raise self.error(entry, f"{what} must be an identifier, not {name!r}")
+        return name
+
+    def _kind(self, entry: str, node: Dict[str, Any]) -> str:
+        kinds = [key for key in node if key in KINDS]
+        if len(kinds) != 1:
+            raise self.error(entry, f"expected exactly one of {', '.join(KINDS)} in {node!r}")
+        return kinds[0]
+
+    def _field(self, entry: str, node: Dict[str, Any], field_var: Optional[str] = None) -> str:
+        names = node['field']
+        names = [names] if isinstance(names, str) else names
+        if not names or not all(isinstance(name, str) for name in names):
+            raise self.error(entry, f"field must be a column name or a list of them")
+        default = self.expr(entry, node.get('default', ''))
+        if field_var is not None:
+            choice = repr(names[-1])
+            for name in reversed(names[:-1]):
+                choice = f"{name!r} if {name!r} in row else {choice}"
+            self.lines.append(f"    {field_var} = {choice}")
+            return f"get({field_var}, {default})"
+        value = f"get({names[-1]!r}, {default})"
+        for name in reversed(names[:-1]):
+            value = f"(row[{name!r}] if {name!r} in row else {value})"
+        return value
+
+    def expr(self, entry: str, node: Any) -> str:
+        if not isinstance(node, dict):
+            if isinstance(node, (list, tuple)):
+                raise self.error(entry, f"a list is not a value: {node!r}")
+            return repr(node)
+        kind = self._kind(entry, node)
+        extra = set(node) - {kind} - ({'default'} if kind == 'field' else set()) - (
+            {'else'} if kind == 'cases' else set())
+        if extra:
+            raise self.error(entry, f"unexpected {', '.join(sorted(extra))} in {node!r}")
+        value = node[kind]
+        if kind == 'field':
+            return self._field(entry, node)
+        if kind == 'ref':
+            if value not in self.names:
+                raise self.error(entry, f"ref {value!r} is not an earlier entry")
+            return self.names[value]
+        if kind == 'stat':
+            return f"stats.{self._identifier(entry, value, 'stat')}"
+        if kind == 'template':
+            return self._template(entry, value)
+        if kind == 'cases':
+            result = self.expr(entry, node.get('else', ''))
+            for case in reversed(value):
+                if set(case) != {'when', 'then'}:
+                    raise self.error(entry, f"a case needs exactly when and then: {case!r}")
+                result = (f"({self.expr(entry, case['then'])} "
+                          f"if {self.expr(entry, case['when'])} else {result})")
+            return result
+        if kind == 'contains':
+            subject, text = value
+            return f"({str(text).lower()!r} in str({self.expr(entry, subject)}).lower())"
+        if kind == 'present':
+            return f"({value!r} in row)"
+        if kind == 'empty':
+            return f"(not {self.expr(entry, value)})"
+        if kind == 'equals':
+            left, right = value
+            return f"({self.expr(entry, left)} == {self.expr(entry, right)})"
+        if kind in ('all', 'any'):
+            joiner = ' and ' if kind == 'all' else ' or '
+            return '(' + joiner.join(self.expr(entry, item) for item in value) + ')'
+        return f"(not {self.expr(entry, value)})"
+
+    def _template(self, entry: str, template: str) -> str:
+        pattern, columns = [], []
+        for literal, name, spec, conversion in string.Formatter().parse(template):
+            pattern.append(literal.replace('{', '{{').replace('}', '}}'))
+            if name is None:
+                continue
+            if not name:
+                raise self.error(entry, f"template placeholders need a column name: {template!r}")
+            pattern.append('{' + (f'!{conversion}' if conversion else '')
+                           + (f':{spec}' if spec else '') + '}')
+            columns.append(f"get({name!r}, '')")
+        return f"{''.join(pattern)!r}.format({', '.join(columns)})"
+
+    def _alias(self, attribute: str) -> str:
+        local = self.aliases.get(attribute)
+        if local is None:
+            local = self.aliases[attribute] = f"s_{attribute}"
+        return local
+
+    def entry(self, name: str, node: Any) -> None:
+        var = f"v{len(self.names)}"
+        modifiers = {key: node.pop(key) for key in MODIFIERS if key in node} \
+            if isinstance(node, dict) else {}
+        parser = modifiers.get('parser')
+        if parser is not None:
+            if parser not in self.parsers:
+                raise self.error(name, f"unknown parser {parser!r}; "
+                                       f"expected one of {', '.join(self.parsers)}")
+            if not isinstance(node, dict) or self._kind(name, node) != 'field':
+                raise self.error(name, "only a field can be parsed")
+            columns = node['field']
+            if isinstance(columns, str):
+                value = self.expr(name, node)
+                failure_key = repr(columns)
+            else:
+                failure_key = f"f{len(self.names)}"
+                value = self._field(name, node, failure_key)
+            self._identifier(name, parser, 'parser')
+            self.lines.append(f"    {var}, ok = parse_{parser}({value})")
+            self.lines.append(f"    if not ok:")
+            self.lines.append(f"        {self._alias('parse_failures')}[{failure_key}] += 1")
+        else:
+            self.lines.append(f"    {var} = {self.expr(name, node)}")
+        if 'fallback' in modifiers:
+            self.lines.append(f"    if not {var}:")
+            self.lines.append(f"        {var} = {self.expr(name, modifiers['fallback'])}")
+        if 'count' in modifiers:
+            counter = self._identifier(name, modifiers['count'], 'count')
+            self.lines.append(f"    {self._alias(counter)}[{var}] += 1")
+        if 'sum' in modifiers:
+            total = self._identifier(name, modifiers['sum'], 'sum')
+            self.lines.append(f"    stats.{total} += {var}")
+        self.names[name] = var
+
+    def source(self, function_name: str, columns: List[str]) -> str:
+        missing = [column for column in columns if column not in self.names]
+        if missing:
+            raise ValueError(f"Mapping {self.spec_name!r}: no entry for column(s) "
+                             f"{', '.join(missing)}")
+        head = [f"def {function_name}(row, stats):", "    get = row.get"]
+        head += [f"    {local} = stats.{attribute}" for attribute, local in self.aliases.items()]
+        body = ', '.join(f"{column!r}: {self.names[column]}" for column in columns)
+        return '\n'.join(head + self.lines + [f"    return {{{body}}}", ''])
+
+
+def generate_source(spec: Dict[str, Any], parsers: Dict[str, Callable],
+                    function_name: Optional[str] = None) -> str:
+    """The Python source :func:`compile_spec` executes for ``spec``."""
+    compiler = _Compiler(spec, parsers)
+    for name, node in spec['fields'].items():
+        compiler.entry(name, dict(node) if isinstance(node, dict) else node)
+    function_name = function_name or f"transform_{compiler.spec_name}"
+    compiler._identifier('name', function_name, 'function name')
+    return compiler.source(function_name, list(spec['columns']))
+
+
+def compile_spec(spec: Dict[str, Any], parsers: Dict[str, Callable],
+                 function_name: Optional[str] = None) -> Callable[[Dict[str, Any], Any],
+                                                                   Dict[str, Any]]:
+    """Compile ``spec`` into ``function(row, stats) -> output row dict``.
+
+    ``parsers`` maps the names specs use to ``value -> (parsed, ok)``
+    callables. The function carries its ``columns`` and generated ``source``.
+    """
+    source = generate_source(spec, parsers, function_name)
+    function_name = source.split('(', 1)[0][len('def '):]
+    filename = f"<mapping {spec.get('name', 'mapping')}>"
+    # Lets tracebacks and inspect show the generated lines
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {f"parse_{name}": parser for name, parser in parsers.items()}
+    exec(compile(source, filename, 'exec'), namespace)
+    function = namespace[function_name]
+    function.__doc__ = spec.get('description')
+    function.columns = list(spec['columns'])
+    function.source = source
+    return function
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help='print the function generated for a spec')
+    show.add_argument('spec', nargs='?', type=Path, default=MAILBOX_SPEC,
+                      help='mapping spec (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    from convert_invoices import PARSERS
+    print(generate_source(load_spec(args.spec), PARSERS), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""Columnar binary copy of the cleaned invoices with a memory-mapped reader.
+
+The store is a directory written next to ``invoices_cleaned_2024.csv``::
+
+    invoices_cleaned_2024.columns/
+        manifest.json               row count and per-column encoding
+        Amount.npy                  float64
+        Vendor.codes.npy            int32 codes into Vendor.dict.*
+        Vendor.dict.offsets.npy     int64 offsets of the dictionary values
+        Vendor.dict.bin             UTF-8 bytes of the dictionary values
+        Subject.offsets.npy         int64 offsets (n + 1) into Subject.bin
+        Subject.bin                 UTF-8 bytes, one value after another
+
+Low-cardinality text (vendors, categories, statuses, dates) is dictionary
+encoded, so filters compare integer codes without decoding any strings;
+high-cardinality text is stored as an offsets array plus a byte blob and
+only the rows a caller touches are decoded. Every array is opened with
+``mmap_mode='r'``: loading is zero-parse and only the pages of the columns
+actually read are paged in.
+
+Dependencies:
+    pip install numpy
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+NUMERIC_COLUMNS = ('Amount',)
+DICTIONARY_COLUMNS = ('From_Email', 'From_Name', 'Received_Date', 'Category', 'Vendor',
+                      'Due_Date', 'Processing_Status', 'Processed_At')
+
+
+# Rows buffered per column before they are flushed to the temp directory;
+# only the dictionaries of the low-cardinality columns grow with the input.
+FLUSH_ROWS = 65536
+
+
+class _ArrayFile:
+    """An ``array.array`` spilled to a raw file every ``FLUSH_ROWS`` items."""
+
+    def __init__(self, path: Path, typecode: str, dtype: Any):
+        self.path = path
+        self.typecode = typecode
+        self.dtype = np.dtype(dtype)
+        self.buffer = array(typecode)
+        self.count = 0
+        self.file = open(f'{path}.raw', 'wb')
+
+    def append(self, value: Any) -> None:
+        self.buffer.append(value)
+        if len(self.buffer) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        self.buffer.tofile(self.file)
+        self.count += len(self.buffer)
+        self.buffer = array(self.typecode)
+
+    def save(self) -> None:
+        """Write ``path`` as a ``.npy`` file by streaming the spilled raw data."""
+        self.flush()
+        self.file.close()
+        with open(self.path, 'wb') as out, open(f'{self.path}.raw', 'rb') as raw:
+            np.lib.format.write_array_header_1_0(
+                out, {'descr': np.lib.format.dtype_to_descr(self.dtype),
+                      'fortran_order': False, 'shape': (self.count,)})
+            shutil.copyfileobj(raw, out)
+        os.remove(f'{self.path}.raw')
+
+    def discard(self) -> None:
+        self.file.close()
+
+
+class _StringBuilder:
+    def __init__(self, base: Path) -> None:
+        self.offsets = _ArrayFile(Path(f'{base}.offsets.npy'), 'q', np.int64)
+        self.offsets.append(0)
+        self.size = 0
+        self.data = open(f'{base}.bin', 'wb')
+
+    def append(self, value: Any) -> None:
+        if value is not None:
+            self.size += self.data.write(str(value).encode('utf-8'))
+        self.offsets.append(self.size)
+
+    def save(self) -> None:
+        self.data.close()
+        self.offsets.save()
+
+    def discard(self) -> None:
+        self.data.close()
+        self.offsets.discard()
+
+
+class _DictionaryBuilder:
+    def __init__(self, base: Path) -> None:
+        self.base = base
+        self.codes = _ArrayFile(Path(f'{base}.codes.npy'), 'i', np.int32)
+        self.lookup: Dict[str, int] = {}
+
+    def append(self, value: Any) -> None:
+        value = '' if value is None else str(value)
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.lookup)
+        self.codes.append(code)
+
+    def save(self) -> None:
+        self.codes.save()
+        values = _StringBuilder(Path(f'{self.base}.dict'))
+        for value in self.lookup:  # insertion order == code order
+            values.append(value)
+        values.save()
+
+    def discard(self) -> None:
+        self.codes.discard()
+
+
+class _NumericBuilder:
+    def __init__(self, base: Path) -> None:
+        self.values = _ArrayFile(Path(f'{base}.npy'), 'd', np.float64)
+
+    def append(self, value: Any) -> None:
+        self.values.append(float(value) if value not in (None, '') else 0.0)
+
+    def save(self) -> None:
+        self.values.save()
+
+    def discard(self) -> None:
+        self.values.discard()
+
+
+class ColumnStoreWriter:
+    """Stream dashboard rows into a column store.
+
+    Each column is flushed to a sibling temp directory every ``FLUSH_ROWS``
+    rows, so memory stays flat however long the output is (``--stream``
+    relies on this). :meth:`close` swaps the finished store in, so readers
+    never see a half-written store; :meth:`abort` drops it instead.
+    """
+
+    def __init__(self, path: Union[str, Path], fieldnames: Sequence[str]):
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        self.rows = 0
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+        self.builders: Dict[str, Any] = {}
+        for name in self.fieldnames:
+            if name in NUMERIC_COLUMNS:
+                self.builders[name] = _NumericBuilder(self.tmp_path / name)
+            elif name in DICTIONARY_COLUMNS:
+                self.builders[name] = _DictionaryBuilder(self.tmp_path / name)
+            else:
+                self.builders[name] = _StringBuilder(self.tmp_path / name)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        for name, builder in self.builders.items():
+            builder.append(row.get(name))
+        self.rows += 1
+
+    def tap(self, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass rows through unchanged while recording them in the store."""
+        for row in rows:
+            self.append(row)
+            yield row
+
+    def extend_columns(self, columns: Dict[str, List[Any]]) -> None:
+        """Append whole column lists (as produced by the columnar engine)."""
+        count = len(columns[self.fieldnames[0]])
+        for name, builder in self.builders.items():
+            for value in columns[name]:
+                builder.append(value)
+        self.rows += count
+
+    def abort(self) -> None:
+        """Close the temp files and remove the unfinished store."""
+        for builder in self.builders.values():
+            builder.discard()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def close(self) -> Path:
+        manifest = {'version': FORMAT_VERSION, 'rows': self.rows, 'columns': []}
+        for name, builder in self.builders.items():
+            builder.save()
+            if isinstance(builder, _NumericBuilder):
+                encoding = 'float64'
+            elif isinstance(builder, _DictionaryBuilder):
+                encoding = 'dictionary'
+            else:
+                encoding = 'string'
+            manifest['columns'].append({'name': name, 'encoding': encoding})
+        (self.tmp_path / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+
+        old_path = self.path.with_name(self.path.name + '.old')
+        if self.path.exists():
+            os.replace(self.path, old_path)
+        os.replace(self.tmp_path, self.path)
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        return self.path
+
+
+def _map_bytes(path: Path) -> np.ndarray:
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+class StringColumn:
+    """Variable-length UTF-8 strings backed by memory-mapped offsets and bytes."""
+
+    def __init__(self, base: Path):
+        self.offsets = np.load(f'{base}.offsets.npy', mmap_mode='r')
+        self.data = _map_bytes(Path(f'{base}.bin'))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def to_list(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+
+class DictionaryColumn:
+    """Integer codes into a small dictionary of distinct values."""
+
+    def __init__(self, base: Path):
+        self.codes = np.load(f'{base}.codes.npy', mmap_mode='r')
+        self._dictionary = StringColumn(Path(f'{base}.dict'))
+        self._values: Optional[List[str]] = None
+
+    @property
+    def values(self) -> List[str]:
+        if self._values is None:
+            self._values = self._dictionary.to_list()
+        return self._values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[self.codes[index]]
+
+    def code_of(self, value: str) -> int:
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -1
+
+    def mask(self, *values: str) -> np.ndarray:
+        """Boolean row mask for rows equal to any of ``values``."""
+        codes = [self.code_of(value) for value in values]
+        return np.isin(self.codes, [code for code in codes if code >= 0])
+
+    def to_list(self) -> List[str]:
+        values = self.values
+        return [values[code] for code in self.codes.tolist()]
+
+
+class ColumnStore:
+    """Read-only, memory-mapped view of a store written by :class:`ColumnStoreWriter`.
+
+    Columns are opened lazily, so a query only maps the files it uses::
+
+        store = ColumnStore.open('data/invoices_cleaned_2024.columns')
+        pending = store['Processing_Status'].mask('Needs Manual Download')
+        total = store['Amount'][pending].sum()
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        manifest = json.loads((self.path / 'manifest.json').read_text())
+        if manifest.get('version') != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported column store version in {self.path!s}.")
+        self.num_rows: int = manifest['rows']
+        self.encodings = {column['name']: column['encoding'] for column in manifest['columns']}
+        self.fieldnames = list(self.encodings)
+        self._columns: Dict[str, Any] = {}
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> 'ColumnStore':
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, name: str) -> Any:
+        column = self._columns.get(name)
+        if column is None:
+            encoding = self.encodings[name]
+            base = self.path / name
+            if encoding == 'float64':
+                column = np.load(f'{base}.npy', mmap_mode='r')
+            elif encoding == 'dictionary':
+                column = DictionaryColumn(base)
+            else:
+                column = StringColumn(base)
+            self._columns[name] = column
+        return column
+
+    def rows(self, columns: Optional[Sequence[str]] = None,
+             indices: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """Decode selected rows (all by default) restricted to ``columns``."""
+        names = list(columns or self.fieldnames)
+        opened = [(name, self[name]) for name in names]
+        if indices is None:
+            indices = range(self.num_rows)
+        for index in indices:
+            yield {name: (float(column[index]) if isinstance(column, np.ndarray)
+                          else column[index])
+                   for name, column in opened}
@@ -0,0 +1,200 @@
+"""Compact record path for the in-memory conversion.
+
+``csv.DictReader`` builds a 31-key dict per export row and
+``transform_row`` another 14-key dict per output row, and the batch mode
+keeps both lists alive at once. This path instead:
+
+* reads with a plain ``csv.reader`` and projects the 12 columns the
+  converter uses by index into a :class:`SourceRecord` (a named tuple),
+  which is dropped as soon as it is transformed;
+* transforms straight into a plain tuple in ``FIELDNAMES`` order, so only
+  one small tuple per unique invoice is held until the sort; and
+* interns vendor, sender and date strings, which repeat across thousands
+  of rows, so each distinct value is stored once.
+
+:func:`transform_record` mirrors ``convert_invoices.transform_row`` field
+for field, including how missing columns and short rows are treated, so the
+CSV it produces is byte-identical. Like the columnar engine it is refused
+once ``mappings/mailbox.json`` no longer matches ``HAND_WRITTEN_MAPPING_DIGEST``.
+"""
+
+from __future__ import annotations
+
+import csv
+import sys
+from collections import namedtuple
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from compressed_io import open_file
+from convert_invoices import message_key, parse_amount
+from invoice_dates import parse_date
+
+PROJECTED_COLUMNS = ('message_id', 'email_subject', 'email_from_name', 'email_from_address',
+                     'invoice_number', 'supplier_name', 'customer_name', 'file_url',
+                     'invoice_date', 'due_date', 'total', 'amount_due')
+
+SourceRecord = namedtuple('SourceRecord', PROJECTED_COLUMNS)
+
+# Position of Received_Date in an output record (FIELDNAMES order)
+RECEIVED_DATE = 4
+
+_intern = sys.intern
+
+
+class RecordLayout:
+    """Maps export columns onto :class:`SourceRecord` fields for one header."""
+
+    def __init__(self, header: Sequence[str]) -> None:
+        index = {name: i for i, name in enumerate(header)}
+        self.width = len(header)
+        self.has_total = 'total' in index
+        self.has_amount_due = 'amount_due' in index
+        self.has_from_name = 'email_from_name' in index
+        # Absent columns read as '' (what ``row.get(name, '')`` returns); a
+        # padding slot past the header supplies it.
+        picks = [index.get(name, self.width) for name in PROJECTED_COLUMNS]
+        self._getter = itemgetter(*picks)
+
+    def project(self, fields: List[Optional[str]]) -> SourceRecord:
+        if len(fields) < self.width:
+            # DictReader gives None for fields missing from a short row
+            fields = fields + [None] * (self.width - len(fields))
+        elif len(fields) > self.width:
+            fields = fields[:self.width]
+        fields.append('')
+        return SourceRecord._make(self._getter(fields))
+
+
+def _csv_records(input_file: Path) -> Tuple[RecordLayout, Iterator[SourceRecord]]:
+    f = open_file(input_file, 'r', encoding='utf-8')
+    reader = csv.reader(f, delimiter='\t')
+    layout = RecordLayout(next(reader, []))
+
+    def records() -> Iterator[SourceRecord]:
+        with f:
+            for fields in reader:
+                if fields:
+                    yield layout.project(fields)
+
+    return layout, records()
+
+
+def _fast_records(input_file: Path) -> Tuple[RecordLayout, Iterator[SourceRecord]]:
+    from fast_tsv import TsvReader
+
+    f = open_file(input_file, 'rb')
+    reader = TsvReader(f)
+    layout = RecordLayout(reader.fieldnames)
+
+    def records() -> Iterator[SourceRecord]:
+        with f:
+            yield from map(SourceRecord._make, reader.rows(PROJECTED_COLUMNS))
+
+    return layout, records()
+
+
+def read_records(input_file: Path, stats: Any,
+                 parser: str = 'csv') -> Tuple[RecordLayout, Iterator[SourceRecord]]:
+    """The layout of ``input_file`` and its rows, skipping repeated messages.
+
+    ``parser`` is ``'csv'`` (``csv.reader``) or ``'fast'`` (``fast_tsv.py``).
+    """
+    layout, projected = _fast_records(input_file) if parser == 'fast' else _csv_records(input_file)
+
+    def records() -> Iterator[SourceRecord]:
+        seen_message_ids = set()
+        for record in projected:
+            stats.original += 1
+            message_id = record.message_id
+            if message_id:
+                key = message_key(message_id)
+                if key in seen_message_ids:
+                    stats.duplicates += 1
+                    continue
+                seen_message_ids.add(key)
+            yield record
+
+    return layout, records()
+
+
+def transform_record(record: SourceRecord, layout: RecordLayout, stats: Any) -> Tuple[Any, ...]:
+    """``transform_row`` for a projected record; returns a ``FIELDNAMES``-ordered tuple."""
+    from_address = record.email_from_address
+    email_from = str(from_address).lower()
+    file_url = record.file_url
+    is_xero = 'xero' in email_from
+
+    if is_xero:
+        category = 'xero_with_pdf' if file_url else 'xero_links_only'
+    else:
+        category = 'standard_pdf'
+    stats.category_stats[category] += 1
+
+    processing_status = 'Processed'
+    if not file_url and category == 'xero_links_only':
+        processing_status = 'Needs Manual Download'
+    stats.status_stats[processing_status] += 1
+
+    invoice_number = record.invoice_number
+    email_subject = record.email_subject
+    if not email_subject:
+        email_subject = (f"Invoice {invoice_number} from {record.supplier_name} "
+                         f"for {record.customer_name}")
+
+    vendor = record.supplier_name
+    if not vendor:
+        vendor = record.email_from_name if layout.has_from_name else 'Unknown Vendor'
+    if vendor:
+        vendor = _intern(vendor)
+    stats.vendor_stats[vendor] += 1
+
+    xero_link = ''
+    if is_xero and invoice_number:
+        xero_link = f"https://go.xero.com/invoice/{invoice_number}"
+
+    invoice_date, ok = parse_date(record.invoice_date)
+    if not ok:
+        stats.parse_failures['invoice_date'] += 1
+    due_date, ok = parse_date(record.due_date)
+    if not ok:
+        stats.parse_failures['due_date'] += 1
+    received_date = invoice_date or stats.run_timestamp
+
+    if layout.has_total:
+        amount_field, raw_amount = 'total', record.total
+    else:
+        amount_field = 'amount_due'
+        raw_amount = record.amount_due if layout.has_amount_due else 0
+    amount, ok = parse_amount(raw_amount)
+    if not ok:
+        stats.parse_failures[amount_field] += 1
+    stats.total_amount += amount
+
+    from_name = record.email_from_name if layout.has_from_name else vendor
+    return (
+        record.message_id,
+        email_subject,
+        _intern(from_address) if from_address else from_address,
+        _intern(from_name) if from_name else from_name,
+        _intern(received_date),
+        category,
+        invoice_number,
+        amount,
+        vendor,
+        _intern(due_date) if due_date else due_date,
+        file_url or '',
+        xero_link,
+        processing_status,
+        _intern(invoice_date) if invoice_date else invoice_date,
+    )
+
+
+def convert_records(input_file: Path, stats: Any, parser: str = 'csv') -> List[Tuple[Any, ...]]:
+    """Read, dedup and transform ``input_file`` into unsorted output records."""
+    timer = stats.timer
+    layout, records = read_records(input_file, stats, parser)
+    with timer.stage('transform'):
+        return [transform_record(record, layout, stats)
+                for record in timer.timed('read', records)]
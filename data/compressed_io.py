@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Transparent gzip and zstd for the conversion inputs and outputs.
+
+:func:`open_file` is a drop-in for ``open()`` that reads and writes gzip or
+zstd through streaming codecs, so memory is the codec's window whatever the
+file size. The codec is taken from the magic bytes of an existing file, or
+else from the extension (``.gz``; ``.zst``/``.zstd``). A trailing ``.tmp``
+is ignored, so the converter's temporary files get the codec of the file
+they replace.
+
+The mailbox export and the cleaned CSV are mostly repeated SharePoint URLs,
+vendor names and dates. The export compresses about 13x with gzip -6, so
+keeping it compressed at rest also cuts the bytes read per conversion::
+
+    python data/compressed_io.py compress data/invoice_data_since_2024 --remove
+
+The converter finds ``invoice_data_since_2024.zst`` (or ``.gz``) when the
+plain file is gone (:func:`resolve`). An ``--output`` ending in ``.csv.gz``
+or ``.csv.zst`` writes the cleaned CSV compressed, and the rollups, query
+store, export jobs and ingestion read it back the same way.
+``--incremental`` and ``--parallel`` seek by byte offset and need a plain
+input file.
+
+Usage:
+    python data/compressed_io.py compress PATH... [--codec zstd|gzip]
+        [--level N] [--remove]
+    python data/compressed_io.py decompress PATH... [--remove]
+
+Dependencies:
+    pip install zstandard    (zstd files only; gzip is in the standard library)
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import IO, Any, Optional, Tuple
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+# gzip -6 is zlib's default trade-off; zstd 3 is faster and smaller still
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+COPY_CHUNK = 1024 * 1024
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError("zstd files need zstandard: pip install zstandard") from exc
+    return zstandard
+
+
+def _name_codec(path: Path) -> Optional[str]:
+    name = path.name[:-4] if path.name.endswith('.tmp') else path.name
+    return EXTENSIONS.get(os.path.splitext(name)[1].lower())
+
+
+def detect_codec(path: Path) -> Optional[str]:
+    """``'gzip'``, ``'zstd'`` or ``None`` (plain) for ``path``."""
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+    except FileNotFoundError:
+        magic = b''
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    if magic:
+        return None
+    return _name_codec(Path(path))
+
+
+def plain_path(path: Path) -> Path:
+    """``path`` without its compression extension (``x.csv.gz`` -> ``x.csv``)."""
+    path = Path(path)
+    return path.with_suffix('') if path.suffix.lower() in EXTENSIONS else path
+
+
+def resolve(path: Path) -> Path:
+    """``path``, or its compressed sibling when only that exists."""
+    path = Path(path)
+    if path.exists():
+        return path
+    for suffix in ('.zst', '.gz', '.zstd'):
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def open_file(path: Path, mode: str = 'r', encoding: Optional[str] = None,
+              newline: Optional[str] = None, codec: Optional[str] = 'auto',
+              level: Optional[int] = None) -> IO[Any]:
+    """``open()`` that decompresses or compresses gzip and zstd transparently.
+
+    ``codec`` may force ``'gzip'``, ``'zstd'`` or ``None`` (plain); by default
+    reads look at the magic bytes and writes at the extension.
+    """
+    binary_mode = mode.replace('t', '').replace('b', '')
+    if binary_mode not in ('r', 'w', 'a', 'x'):
+        raise ValueError(f"Unsupported mode {mode!r}")
+    if codec == 'auto':
+        codec = detect_codec(path) if binary_mode == 'r' else _name_codec(Path(path))
+    if codec is None:
+        if 'b' in mode:
+            return open(path, mode)
+        return open(path, mode, encoding=encoding, newline=newline)
+
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == 'gzip':
+        raw: IO[bytes] = gzip.open(path, binary_mode + 'b', compresslevel=level)
+    elif codec == 'zstd':
+        zstandard = _zstd()
+        f = open(path, binary_mode + 'b')
+        if binary_mode == 'r':
+            # Buffered for readline/peek; a grown archive is several frames
+            raw = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+                f, read_across_frames=True, closefd=True), COPY_CHUNK)
+        else:
+            # Appending writes a new frame, which readers continue across
+            raw = zstandard.ZstdCompressor(level=level).stream_writer(f, closefd=True)
+    else:
+        raise ValueError(f"Unknown codec {codec!r}")
+    if 'b' in mode:
+        return raw
+    return io.TextIOWrapper(raw, encoding=encoding, newline=newline)
+
+
+def _copy(src: Path, dst: Path, read_codec: Optional[str], write_codec: Optional[str],
+          level: Optional[int]) -> None:
+    tmp = dst.with_name(dst.name + '.tmp')
+    try:
+        with open_file(src, 'rb', codec=read_codec) as fin, \
+                open_file(tmp, 'wb', codec=write_codec, level=level) as fout:
+            shutil.copyfileobj(fin, fout, COPY_CHUNK)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def compress_file(path: Path, codec: str = 'zstd', level: Optional[int] = None,
+                  remove: bool = False) -> Tuple[Path, int, int]:
+    """Write ``path`` + ``.zst``/``.gz``; returns it with the before/after sizes."""
+    if detect_codec(path) is not None:
+        raise ValueError(f"{path} is already compressed")
+    dst = path.with_name(path.name + SUFFIXES[codec])
+    _copy(path, dst, None, codec, level)
+    before, after = path.stat().st_size, dst.stat().st_size
+    if remove:
+        path.unlink()
+    return dst, before, after
+
+
+def decompress_file(path: Path, remove: bool = False) -> Tuple[Path, int, int]:
+    """Write ``path`` without its compression extension; returns it and the sizes."""
+    codec = detect_codec(path)
+    if codec is None:
+        raise ValueError(f"{path} is not compressed")
+    dst = plain_path(path)
+    if dst == path:
+        raise ValueError(f"{path} has no .gz/.zst extension to drop")
+    _copy(path, dst, codec, None, None)
+    before, after = path.stat().st_size, dst.stat().st_size
+    if remove:
+        path.unlink()
+    return dst, before, after
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    compress = commands.add_parser('compress', help='compress files next to the originals')
+    compress.add_argument('paths', type=Path, nargs='+')
+    compress.add_argument('--codec', choices=tuple(SUFFIXES), default='zstd')
+    compress.add_argument('--level', type=int, default=None,
+                          help='compression level (default: gzip 6, zstd 3)')
+    compress.add_argument('--remove', action='store_true',
+                          help='delete each original once its compressed copy is complete')
+    decompress = commands.add_parser('decompress', help='restore plain copies')
+    decompress.add_argument('paths', type=Path, nargs='+')
+    decompress.add_argument('--remove', action='store_true',
+                            help='delete each compressed file once its plain copy is complete')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    for path in args.paths:
+        started = time.perf_counter()
+        if args.command == 'compress':
+            dst, before, after = compress_file(path, args.codec, args.level, args.remove)
+        else:
+            dst, before, after = decompress_file(path, args.remove)
+        ratio = max(before, after) / max(1, min(before, after))
+        print(f"{path} -> {dst}: {before:,} -> {after:,} bytes ({ratio:.1f}x) "
+              f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
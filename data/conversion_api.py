@@ -0,0 +1,206 @@
+"""In-process conversion API for long-running callers (sync daemon, server).
+
+``convert_invoices.py`` is a CLI: every run pays interpreter start-up, module
+imports and a cold date cache, and it prints as it goes. A resident process
+can instead keep an :class:`InvoiceConverter` around and call it for each
+new drop::
+
+    from conversion_api import ConvertOptions, InvoiceConverter
+
+    converter = InvoiceConverter(ConvertOptions(dedup_across_calls=True))
+    stats = converter.convert('onedrive/drop-1.tsv', 'processed/drop-1.csv')
+    for row in converter.iter_rows(io.StringIO(tsv_text)):
+        ...
+
+Between calls the converter keeps the ``message_id`` digests it has seen
+(with ``dedup_across_calls``, a message already converted from an earlier
+drop is skipped) and the process-wide parsed-date cache stays warm, so
+re-converting a small drop costs milliseconds. A call only adds to the
+index once it has succeeded, so a failed conversion can be retried. Nothing is printed; results
+come back as :class:`~convert_invoices.ConversionStats`.
+
+Sources are paths or open text files holding the mailbox TSV; sinks are
+paths or writable text files. The module-level :func:`convert` and
+:func:`iter_rows` use one shared converter.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import AbstractSet, Any, Dict, Iterator, Optional, Set, TextIO, Union
+
+from compressed_io import open_file
+from convert_invoices import (
+    DEFAULT_MEMORY_BUDGET_MB,
+    ConversionStats,
+    dedup_rows,
+    keep_latest,
+    output_fieldnames,
+    received_date_key,
+    transform_rows,
+    write_rows,
+)
+from dashboard_rollups import DashboardRollups, as_of_now
+from external_sort import external_sort
+from invoice_duplicates import InvoiceDuplicates
+
+Source = Union[str, Path, TextIO]
+Sink = Union[str, Path, TextIO]
+
+
+@dataclass(frozen=True)
+class ConvertOptions:
+    """Per-call settings; pass one to a converter or to a single call."""
+
+    # Remember message ids between calls so a drop only yields unseen messages
+    dedup_across_calls: bool = False
+    # Same-invoice policy (see invoice_duplicates.POLICIES), or None
+    duplicates: Optional[str] = None
+    # Newest first, as the CLI writes; False keeps input order
+    sort: bool = True
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB
+    tmp_dir: Optional[str] = None
+    columns_dir: Optional[Path] = None
+    rollups_dir: Optional[Path] = None
+
+
+@contextlib.contextmanager
+def _open(target: Union[Source, Sink], mode: str) -> Iterator[TextIO]:
+    if isinstance(target, (str, Path)):
+        with open_file(target, mode, newline='' if 'w' in mode else None, encoding='utf-8') as f:
+            yield f
+    else:
+        yield target
+
+
+class _CallIds:
+    """Message ids from earlier calls plus the ones read by the current call.
+
+    ``dedup_rows`` only adds to ``pending``; the converter merges it into its
+    own index once the call has succeeded.
+    """
+
+    def __init__(self, committed: AbstractSet[bytes]) -> None:
+        self.committed = committed
+        self.pending: Set[bytes] = set()
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.pending or key in self.committed
+
+    def add(self, key: bytes) -> None:
+        self.pending.add(key)
+
+
+class InvoiceConverter:
+    """A reusable converter whose dedup index survives between calls."""
+
+    def __init__(self, options: Optional[ConvertOptions] = None) -> None:
+        self.options = options or ConvertOptions()
+        self.seen_message_ids: Set[bytes] = set()
+
+    def reset(self) -> None:
+        """Forget every message seen so far."""
+        self.seen_message_ids.clear()
+
+    def _options(self, options: Optional[ConvertOptions], overrides: Dict[str, Any]) -> ConvertOptions:
+        options = options or self.options
+        return replace(options, **overrides) if overrides else options
+
+    def _new_stats(self, options: ConvertOptions) -> ConversionStats:
+        stats = ConversionStats()
+        if options.duplicates is not None:
+            stats.invoice_duplicates = InvoiceDuplicates(options.duplicates)
+        return stats
+
+    def _call_ids(self, options: ConvertOptions) -> '_CallIds':
+        committed = self.seen_message_ids if options.dedup_across_calls else frozenset()
+        return _CallIds(committed)
+
+    def _commit(self, seen: '_CallIds', options: ConvertOptions) -> None:
+        if options.dedup_across_calls:
+            self.seen_message_ids |= seen.pending
+
+    def _rows(self, source: Source, seen: '_CallIds',
+              stats: ConversionStats) -> Iterator[Dict[str, Any]]:
+        timer = stats.timer
+        with _open(source, 'r') as f:
+            reader = timer.timed('read', csv.DictReader(f, delimiter='\t'))
+            unique_rows = timer.timed('dedup', dedup_rows(reader, stats, seen))
+            yield from timer.timed('transform', transform_rows(unique_rows, stats))
+
+    def iter_rows(self, source: Source, options: Optional[ConvertOptions] = None,
+                  stats: Optional[ConversionStats] = None, **overrides: Any) -> Iterator[Dict[str, Any]]:
+        """Yield unique dashboard rows in input order, one at a time.
+
+        Pass ``stats`` to collect counters. The messages are only remembered
+        for later calls once every row has been consumed. ``keep-latest``
+        needs the sort, so it raises ``ValueError`` here; use :meth:`convert`.
+        """
+        options = self._options(options, overrides)
+        if options.duplicates == 'keep-latest':
+            raise ValueError("The keep-latest duplicate policy needs the sort; use convert()")
+        if stats is None:
+            stats = self._new_stats(options)
+        seen = self._call_ids(options)
+
+        def rows() -> Iterator[Dict[str, Any]]:
+            yield from self._rows(source, seen, stats)
+            self._commit(seen, options)
+
+        return rows()
+
+    def convert(self, source: Source, sink: Sink, options: Optional[ConvertOptions] = None,
+                **overrides: Any) -> ConversionStats:
+        """Convert ``source`` into the cleaned CSV at ``sink`` and return the stats."""
+        options = self._options(options, overrides)
+        stats = self._new_stats(options)
+        timer = stats.timer
+
+        seen = self._call_ids(options)
+        rows = self._rows(source, seen, stats)
+        if options.sort:
+            rows = timer.timed('sort', external_sort(
+                rows,
+                key=received_date_key,
+                reverse=True,
+                memory_budget=options.memory_budget_mb * 1024 * 1024,
+                tmp_dir=options.tmp_dir,
+            ))
+        rollups = DashboardRollups() if options.rollups_dir is not None else None
+
+        with _open(sink, 'w') as f, timer.stage('write'):
+            stats.written = write_rows(f, keep_latest(rows, stats), options.columns_dir,
+                                       rollups, output_fieldnames(stats))
+        # Only a written drop counts as seen, so a failed call can be retried
+        self._commit(seen, options)
+        if rollups is not None:
+            sink_file = Path(sink) if isinstance(sink, (str, Path)) else None
+            with timer.stage('rollups'):
+                rollups.write(options.rollups_dir, as_of_now(), sink_file)
+        return stats
+
+
+_default_converter: Optional[InvoiceConverter] = None
+
+
+def default_converter() -> InvoiceConverter:
+    """The converter shared by the module-level functions."""
+    global _default_converter
+    if _default_converter is None:
+        _default_converter = InvoiceConverter()
+    return _default_converter
+
+
+def convert(source: Source, sink: Sink, options: Optional[ConvertOptions] = None,
+            **overrides: Any) -> ConversionStats:
+    """Convert with the shared converter; see :meth:`InvoiceConverter.convert`."""
+    return default_converter().convert(source, sink, options, **overrides)
+
+
+def iter_rows(source: Source, options: Optional[ConvertOptions] = None,
+              **overrides: Any) -> Iterator[Dict[str, Any]]:
+    """Stream rows with the shared converter; see :meth:`InvoiceConverter.iter_rows`."""
+    return default_converter().iter_rows(source, options, **overrides)
@@ -0,0 +1,118 @@
+"""SQLite-backed checkpoint for incremental invoice conversion.
+
+The mailbox export is append-only in practice, so each incremental run only
+needs the rows written after the previous run. The checkpoint records, per
+source file, how far it has been consumed and what the output looked like at
+that point, plus the digest of every ``message_id`` seen so far so that
+duplicates are still dropped across runs (first occurrence wins).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Set, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    tail_complete INTEGER NOT NULL,
+    tail_hash BLOB NOT NULL,
+    output_size INTEGER NOT NULL,
+    output_mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_messages (
+    key BLOB PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class CheckpointState:
+    """Where the previous run stopped reading ``source``."""
+
+    byte_offset: int
+    header: str
+    tail_complete: bool
+    tail_hash: bytes
+    output_size: int
+    output_mtime_ns: int
+
+
+class ConversionCheckpoint:
+    """Persisted read offset and ``message_id`` index for one checkpoint file.
+
+    Supports ``key in checkpoint`` and ``checkpoint.add(key)`` so it can stand
+    in for the in-memory dedup set. Added keys are buffered and only written
+    by :meth:`commit`, together with the new offset, in one transaction.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(SCHEMA)
+        self._pending: Set[bytes] = set()
+
+    def __enter__(self) -> 'ConversionCheckpoint':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __contains__(self, key: bytes) -> bool:
+        if key in self._pending:
+            return True
+        cur = self.conn.execute('SELECT 1 FROM seen_messages WHERE key = ?', (key,))
+        return cur.fetchone() is not None
+
+    def add(self, key: bytes) -> None:
+        self._pending.add(key)
+
+    def seen_count(self) -> int:
+        (count,) = self.conn.execute('SELECT COUNT(*) FROM seen_messages').fetchone()
+        return count + len(self._pending)
+
+    def state(self, source: Union[str, Path]) -> Optional[CheckpointState]:
+        row = self.conn.execute(
+            'SELECT byte_offset, header, tail_complete, tail_hash, output_size, output_mtime_ns '
+            'FROM checkpoint WHERE source = ?',
+            (str(Path(source).resolve()),),
+        ).fetchone()
+        if row is None:
+            return None
+        return CheckpointState(row[0], row[1], bool(row[2]), row[3], row[4], row[5])
+
+    def reset(self) -> None:
+        """Forget every offset and seen message (used before a full rebuild)."""
+        with self.conn:
+            self.conn.execute('DELETE FROM checkpoint')
+            self.conn.execute('DELETE FROM seen_messages')
+        self._pending.clear()
+
+    def commit(self, source: Union[str, Path], state: CheckpointState) -> None:
+        """Persist the buffered message keys and the new offset atomically."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO seen_messages (key) VALUES (?)',
+                ((key,) for key in self._pending),
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO checkpoint VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    str(Path(source).resolve()),
+                    state.byte_offset,
+                    state.header,
+                    int(state.tail_complete),
+                    state.tail_hash,
+                    state.output_size,
+                    state.output_mtime_ns,
+                ),
+            )
+        self._pending.clear()
+
@@ -0,0 +1,106 @@
+"""Stage timing and profiling hooks for the invoice converter.
+
+The converter's stages are mostly lazy generators chained together (read ->
+dedup -> transform -> sort -> write), so wrapping each one in a plain timer
+would count upstream work several times. :class:`StageTimer` keeps a stack
+of active stages instead and charges elapsed time to whichever stage is
+actually running, giving exclusive per-stage wall time for both the
+in-memory and the streaming pipelines.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+PROFILERS = ('cprofile', 'tracemalloc')
+TRACEMALLOC_TOP = 25
+
+
+class StageTimer:
+    """Exclusive wall-clock time per named stage."""
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._stack: List[str] = []
+        self._mark = 0.0
+
+    def _charge(self) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._mark
+        self._mark = now
+
+    def enter(self, name: str) -> None:
+        self._charge()
+        self._stack.append(name)
+
+    def exit(self) -> None:
+        self._charge()
+        self._stack.pop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def timed(self, name: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Yield from ``iterable``, charging the time spent producing items to ``name``."""
+        iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(value, 6) for name, value in self.seconds.items()}
+
+
+@contextmanager
+def profiled(kind: Optional[str], path: Optional[Path], report: Dict[str, Any]) -> Iterator[None]:
+    """Run the body under cProfile or tracemalloc and dump the result to ``path``.
+
+    ``cprofile`` writes a pstats file (``python -m pstats PATH``); ``tracemalloc``
+    writes the top allocation sites as text and records the peak in ``report``.
+    """
+    if kind is None:
+        yield
+        return
+    if kind not in PROFILERS:
+        raise ValueError(f"Unknown profiler {kind!r}; expected one of {PROFILERS}")
+
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(str(path))
+    else:
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 2)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"peak traced memory: {peak / (1024 * 1024):.2f} MB\n\n")
+                for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+    report['profile'] = {'kind': kind, 'path': str(path)}
@@ -1,189 +1,1088 @@
 #!/usr/bin/env python3
+"""Convert the mailbox invoice export into the dashboard's cleaned CSV.
+
+Reads the tab-separated ``invoice_data_since_2024`` export, removes duplicate
+messages (first occurrence of a ``message_id`` wins), maps every row onto the
+14 dashboard columns and writes ``invoices_cleaned_2024.csv`` newest first.
+The mapping is declared in ``mappings/mailbox.json`` and compiled into
+``transform_row`` at import (``column_mapping.py``).
+
+Usage:
+    python data/convert_invoices.py [--input PATH] [--output PATH]
+    python data/convert_invoices.py --stream [--memory-budget-mb 64]
+    python data/convert_invoices.py --incremental [--checkpoint PATH]
+    python data/convert_invoices.py --parallel [--workers N]
+    python data/convert_invoices.py --partitioned [DIR]
+    python data/convert_invoices.py --engine columnar|compact
+    python data/convert_invoices.py --columns
+    python data/convert_invoices.py --rollups
+    python data/convert_invoices.py --store
+    python data/convert_invoices.py --changes
+    python data/convert_invoices.py --changes --load postgresql://user@host/db
+    python data/convert_invoices.py --duplicates drop|flag|keep-latest
+    python data/convert_invoices.py --parser fast
+    python data/convert_invoices.py --metrics metrics.json [--profile cprofile]
+
+``--stream`` reads, transforms and writes one row at a time and orders the
+output with an on-disk merge sort (``external_sort.py``), so peak memory stays
+flat however large the export grows.
+
+``--incremental`` resumes from the byte offset and ``message_id`` index saved
+by the previous run (``conversion_checkpoint.py``), converts only the rows
+appended since, and merges them into the existing cleaned CSV. It falls back
+to a full conversion whenever the export or the output no longer match the
+checkpoint (rewritten header, truncated file, output edited by another run).
+
+``--parallel`` splits the export into byte-range shards on line boundaries
+and parses/transforms them in a process pool. Shards are deduplicated in the
+parent in file order, so the first occurrence of a ``message_id`` still wins
+and the output is identical to a sequential run. Rows must not contain
+embedded newlines (the mailbox export never quotes fields).
+
+``--partitioned`` writes one CSV per received month plus a manifest of row
+counts, amount totals and date spans (default ``processed/invoices/``, see
+``invoice_partitions.py``) instead of the single cleaned CSV, so date-range
+reads open only the months they cover. Rows are sorted on integer epoch keys
+through the same disk-spilling sort as ``--stream``.
+
+``--engine columnar`` runs the in-memory conversion through the vectorised
+NumPy engine (``columnar_engine.py``); ``--engine compact`` reads with an
+index-based ``csv.reader`` into tuples of only the needed columns
+(``compact_records.py``), using a fraction of the row engine's memory. Both
+produce the same output as the row engine.
+
+``--columns`` additionally writes a memory-mapped columnar copy of the output
+(``invoices_cleaned_2024.columns/``, see ``column_store.py``) in any mode.
+
+``--rollups`` materialises the dashboard metrics and filter facet payloads
+(``invoices_cleaned_2024.rollups/``, see ``dashboard_rollups.py``), plus
+vendor leaders, a distinct-vendor estimate and amount quantiles overall and
+per category from streaming sketches (``invoice_sketches.py``), and count and
+amount series by day, week and month, overall and per vendor, category and
+processing status, from per-day trend cubes (``trend_cubes.py``). With
+``--incremental`` only the appended rows are folded into the saved state.
+
+``--store`` maintains ``invoices_cleaned_2024.sqlite``, an indexed query
+store for filtered invoice pages and facet counts (see ``invoice_store.py``).
+It is rebuilt after each conversion; ``--incremental`` inserts only the
+appended rows while the store still matches the previous output.
+
+``--changes`` compares each output row's hash, keyed by ``Email_ID``, with
+the previous run's and writes only the inserted, updated and deleted rows to
+a delta file with a run id (``invoices_cleaned_2024.changes/``, see
+``change_capture.py``), for loaders that upsert just what changed.
+``--load DSN`` bulk-loads the output into the ``invoices`` table of a
+Postgres or SQLite database (``invoice_loader.py``); with ``--changes`` it
+applies just the new delta.
+
+``--duplicates`` also catches the same invoice arriving in several emails
+(reminders), keyed on supplier, invoice number and total
+(``invoice_duplicates.py``). It applies to the batch, stream, parallel and
+partitioned modes.
+
+``--parser fast`` swaps ``csv.DictReader`` for a chunked binary reader that
+splits lines and fields with ``bytes.split`` and decodes only the columns the
+conversion reads (``fast_tsv.py``); lines with quotes still go through the
+csv module. It applies to every mode except ``--engine columnar``.
+
+Inputs and outputs may be gzip or zstd compressed (``compressed_io.py``):
+a compressed export is recognised by its magic bytes and is also found as
+``invoice_data_since_2024.zst``/``.gz``, and an ``--output`` ending in
+``.csv.gz`` or ``.csv.zst`` is written compressed. ``--incremental`` and
+``--parallel`` seek by byte offset and need an uncompressed export.
+
+``--metrics`` writes a JSON file with exclusive wall time per stage (read,
+dedup, transform, sort, write, ...), duplicate counts and the number of
+amounts and dates per field that failed to parse and were zeroed or kept
+raw. ``--profile cprofile|tracemalloc`` dumps a profile of the run as well.
+"""
+
+from __future__ import annotations
+
+import argparse
 import csv
-from datetime import datetime
-import re
+import hashlib
+import heapq
+import json
+import math
+import os
+import tempfile
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from change_capture import capture_csv, describe
+from column_mapping import MAILBOX_SPEC, compile_spec, load_spec, spec_digest
+from compressed_io import detect_codec, open_file, plain_path, resolve
+from conversion_checkpoint import CheckpointState, ConversionCheckpoint
+from conversion_metrics import PROFILERS, StageTimer, profiled
+from dashboard_rollups import DashboardRollups, as_of_now, load_rollups
+from external_sort import external_sort, read_run, write_run
+from invoice_dates import parse_date
+from invoice_duplicates import POLICIES as DUPLICATE_POLICIES
+from invoice_duplicates import InvoiceDuplicates, invoice_key
+from invoice_loader import apply_changes, load_csv
+from invoice_partitions import PARTITION_DIR, received_epoch, write_partitions
+from invoice_store import InvoiceStore, build_store, store_is_current
 
 # File paths
-input_file = '/Users/niteshsure/Documents/todo/invoice-dashboard/data/invoice_data_since_2024'
-output_file = '/Users/niteshsure/Documents/todo/invoice-dashboard/data/invoices_cleaned_2024.csv'
+DATA_DIR = Path(__file__).resolve().parent
+INPUT_FILE = DATA_DIR / 'invoice_data_since_2024'
+OUTPUT_FILE = DATA_DIR / 'invoices_cleaned_2024.csv'
+CHECKPOINT_FILE = DATA_DIR / '.convert-checkpoint.sqlite'
+
+FIELDNAMES = ['Email_ID', 'Subject', 'From_Email', 'From_Name', 'Received_Date',
+              'Category', 'Invoice_Number', 'Amount', 'Vendor', 'Due_Date',
+              'OneDrive_Link', 'Xero_Link', 'Processing_Status', 'Processed_At']
+
+# Export columns read by transform_row, dedup and invoice_key; the fast
+# parser decodes only these.
+SOURCE_COLUMNS = ('message_id', 'email_subject', 'email_from_name', 'email_from_address',
+                  'invoice_number', 'supplier_name', 'supplier_abn', 'customer_name',
+                  'file_url', 'invoice_date', 'due_date', 'total', 'amount_due')
+TSV_PARSERS = ('csv', 'fast')
+# Rendered like the normalised dates (local clock, as the converter always did)
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
 
-# Function to clean amount strings
-def clean_amount(amount_str):
-    if not amount_str or amount_str == '':
-        return 0.0
+DEFAULT_MEMORY_BUDGET_MB = 64
+# Bytes before the checkpoint offset that must be unchanged for a resume.
+CHECKPOINT_TAIL_BYTES = 4096
+
+
+@dataclass
+class ConversionStats:
+    """Counters and aggregates collected while converting."""
+
+    original: int = 0
+    duplicates: int = 0
+    written: int = 0
+    total_amount: float = 0
+    vendor_stats: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    category_stats: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    status_stats: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # Unparseable values per source field (amounts zeroed, dates kept raw)
+    parse_failures: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    timer: StageTimer = field(default_factory=StageTimer)
+    # Same invoice in several emails, when a --duplicates policy is active
+    invoice_duplicates: Optional[InvoiceDuplicates] = None
+    # Received date for rows without an invoice date: one value per run
+    run_timestamp: str = field(default_factory=lambda: datetime.now().strftime(TIMESTAMP_FORMAT))
+
+    @property
+    def unique(self) -> int:
+        return self.original - self.duplicates
+
+    def to_metrics(self) -> Dict[str, Any]:
+        metrics = {
+            'rows': {
+                'original': self.original,
+                'duplicates': self.duplicates,
+                'unique': self.unique,
+                'written': self.written,
+            },
+            'total_amount': round(self.total_amount, 2),
+            'parse_failures': dict(self.parse_failures),
+            'stages_seconds': self.timer.as_dict(),
+        }
+        if self.invoice_duplicates is not None:
+            metrics['invoice_duplicates'] = {
+                'policy': self.invoice_duplicates.policy,
+                'count': self.invoice_duplicates.count,
+                'amount': round(self.invoice_duplicates.amount, 2),
+            }
+        return metrics
+
+
+def parse_amount(amount_str) -> Tuple[float, bool]:
+    """Return ``(amount, ok)``; unparseable amounts become 0.0 with ``ok`` False.
+
+    ``nan`` and ``inf`` parse as floats but are not amounts (and would end up
+    as invalid JSON in the manifests and rollups), so they count as failures.
+    """
+    if not amount_str:
+        return 0.0, True
     # Remove dollar signs, commas, and convert to float
     amount_str = str(amount_str).replace('$', '').replace(',', '')
     try:
-        return float(amount_str)
-    except:
-        return 0.0
-
-# Function to format date for ISO format
-def format_date(date_str):
-    if not date_str or date_str == '':
-        return ''
-    try:
-        # Try parsing format: 4-Sep-25
-        months = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
-                  'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
-        
-        parts = date_str.split('-')
-        if len(parts) == 3:
-            day = int(parts[0])
-            month = months.get(parts[1], 1)
-            year = int(parts[2])
-            # Assume 20xx for two-digit years
-            if year < 100:
-                year = 2000 + year
-            
-            date_obj = datetime(year, month, day)
-            return date_obj.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-    except:
-        pass
-    return date_str
-
-# Read the TSV file
-print("Reading invoice data...")
-rows = []
-seen_message_ids = set()
-duplicate_count = 0
-
-with open(input_file, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f, delimiter='\t')
-    
-    for row in reader:
+        amount = float(amount_str)
+    except ValueError:
+        return 0.0, False
+    if not math.isfinite(amount):
+        return 0.0, False
+    return amount, True
+
+
+def message_key(message_id: str) -> bytes:
+    """Fixed-size digest of a message id, so the dedup set stays compact."""
+    return hashlib.blake2b(message_id.encode('utf-8'), digest_size=16).digest()
+
+
+def dedup_rows(
+    rows: Iterable[Dict[str, Any]],
+    stats: ConversionStats,
+    seen_message_ids: Optional[Any] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Drop rows whose message was already seen; the first occurrence wins.
+
+    ``seen_message_ids`` may be any container supporting ``in`` and ``add``
+    (a set, or a persisted checkpoint index for incremental runs).
+    """
+    if seen_message_ids is None:
+        seen_message_ids = set()
+
+    for row in rows:
+        stats.original += 1
         message_id = row.get('message_id', '')
-        
+
         # Skip if we've seen this message_id before (remove duplicates)
-        if message_id and message_id in seen_message_ids:
-            duplicate_count += 1
-            continue
-        
         if message_id:
-            seen_message_ids.add(message_id)
-        rows.append(row)
-
-print(f"Original records: {len(rows) + duplicate_count}")
-print(f"Duplicates removed: {duplicate_count}")
-print(f"Unique records: {len(rows)}")
-
-# Process and convert the data
-output_data = []
-vendor_stats = defaultdict(int)
-total_amount = 0
-category_stats = defaultdict(int)
-status_stats = defaultdict(int)
-
-for row in rows:
-    # Determine category based on source
-    category = 'standard_pdf'
-    email_from = str(row.get('email_from_address', '')).lower()
-    if 'xero' in email_from:
-        if row.get('file_url', ''):
-            category = 'xero_with_pdf'
+            key = message_key(message_id)
+            if key in seen_message_ids:
+                stats.duplicates += 1
+                continue
+            seen_message_ids.add(key)
+
+        yield row
+
+
+def read_tsv_rows(input_file: Path, parser: str = 'csv') -> Iterator[Dict[str, Any]]:
+    """Yield TSV rows as dicts with ``csv.DictReader`` or the fast parser.
+
+    The fast parser (``fast_tsv.py``) only fills in ``SOURCE_COLUMNS``.
+    """
+    if parser == 'fast':
+        from fast_tsv import iter_dicts
+        yield from iter_dicts(input_file, SOURCE_COLUMNS)
+        return
+    with open_file(input_file, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f, delimiter='\t')
+
+
+def read_unique_rows(input_file: Path, stats: ConversionStats,
+                     parser: str = 'csv') -> Iterator[Dict[str, Any]]:
+    """Yield TSV rows one at a time, skipping messages that were already seen."""
+    timer = stats.timer
+    reader = timer.timed('read', read_tsv_rows(input_file, parser))
+    yield from timer.timed('dedup', dedup_rows(reader, stats))
+
+
+def read_tsv_header(input_file: Path) -> Tuple[str, int]:
+    """Return the TSV header line and its length in bytes."""
+    with open(input_file, 'rb') as f:
+        line = f.readline()
+    return line.decode('utf-8'), len(line)
+
+
+def read_tsv_range(input_file: Path, header: str, start: int, end: int,
+                   parser: str = 'csv') -> Iterator[Dict[str, Any]]:
+    """Yield TSV rows stored between byte offsets ``start`` and ``end``.
+
+    ``start`` must fall on a line boundary; ``header`` supplies the column
+    names since the range usually doesn't include the first line.
+    """
+    fieldnames = next(csv.reader([header], delimiter='\t'))
+    if parser == 'fast':
+        from fast_tsv import iter_dicts
+        yield from iter_dicts(input_file, SOURCE_COLUMNS, fieldnames, start, end)
+        return
+
+    def lines(f):
+        pos = start
+        while pos < end:
+            line = f.readline(end - pos)
+            if not line:
+                return
+            pos += len(line)
+            yield line.decode('utf-8')
+
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        yield from csv.DictReader(lines(f), fieldnames=fieldnames, delimiter='\t')
+
+
+# The mailbox-to-dashboard mapping (fields, fallbacks, the Xero category,
+# status and link rules) lives in mappings/mailbox.json and is compiled once,
+# here, into a plain function: transform_row(row, stats) -> output row dict.
+PARSERS = {'amount': parse_amount, 'date': parse_date}
+MAILBOX_MAPPING = load_spec(MAILBOX_SPEC)
+transform_row = compile_spec(MAILBOX_MAPPING, PARSERS, 'transform_row')
+# The columnar and compact engines don't build row dicts, so they implement
+# the same rules by hand (columnar_engine.py, compact_records.py). This is
+# spec_digest() of the mapping they implement; update it together with them.
+HAND_WRITTEN_MAPPING_DIGEST = '2fa1a274d891203e'
+HAND_WRITTEN_ENGINES = ('columnar', 'compact')
+
+
+def require_hand_written_mapping(engine: str) -> None:
+    """Refuse an engine whose hand-written rules no longer match mailbox.json."""
+    if spec_digest(MAILBOX_MAPPING) != HAND_WRITTEN_MAPPING_DIGEST:
+        raise RuntimeError(f"{MAILBOX_SPEC.name} has changed since the {engine} engine's "
+                           f"hand-written rules were last matched to it; update those rules "
+                           f"and HAND_WRITTEN_MAPPING_DIGEST, or use --engine rows")
+
+
+def transform_rows(rows: Iterable[Dict[str, Any]], stats: ConversionStats) -> Iterator[Dict[str, Any]]:
+    """``transform_row`` over ``rows``, applying the invoice duplicate policy if any."""
+    duplicates = stats.invoice_duplicates
+    if duplicates is None:
+        for row in rows:
+            yield transform_row(row, stats)
+        return
+
+    for row in rows:
+        amount, _ = parse_amount(row.get('total' if 'total' in row else 'amount_due', 0))
+        key = invoice_key(row, amount)
+        if not duplicates.admit(key, amount):
+            continue
+        output_row = transform_row(row, stats)
+        duplicates.annotate(key, output_row)
+        yield output_row
+
+
+def discount_row(output_row: Dict[str, Any], stats: ConversionStats) -> None:
+    """Back a row out of ``stats`` after a later duplicate superseded it."""
+    for counts, value in ((stats.category_stats, output_row['Category']),
+                          (stats.status_stats, output_row['Processing_Status']),
+                          (stats.vendor_stats, output_row['Vendor'])):
+        counts[value] -= 1
+        if not counts[value]:
+            del counts[value]
+    stats.total_amount -= output_row['Amount']
+
+
+def keep_latest(rows: Iterable[Dict[str, Any]], stats: ConversionStats) -> Iterator[Dict[str, Any]]:
+    """Drop superseded rows under ``keep-latest``; otherwise pass rows through."""
+    if stats.invoice_duplicates is None:
+        return iter(rows)
+    return stats.invoice_duplicates.keep_latest(rows, lambda row: discount_row(row, stats))
+
+
+def output_fieldnames(stats: ConversionStats) -> List[str]:
+    if stats.invoice_duplicates is None:
+        return FIELDNAMES
+    return FIELDNAMES + list(stats.invoice_duplicates.fieldnames_extra)
+
+
+def _new_stats(duplicate_policy: Optional[str]) -> ConversionStats:
+    stats = ConversionStats()
+    if duplicate_policy is not None:
+        stats.invoice_duplicates = InvoiceDuplicates(duplicate_policy)
+    return stats
+
+
+def received_date_key(output_row: Dict[str, Any]) -> str:
+    return output_row['Received_Date']
+
+
+def _column_store_writer(columns_dir: Optional[Path], fieldnames: List[str] = FIELDNAMES):
+    if columns_dir is None:
+        return None
+    try:
+        from column_store import ColumnStoreWriter
+    except ImportError as exc:
+        raise RuntimeError("The columnar output needs NumPy: pip install numpy") from exc
+    return ColumnStoreWriter(columns_dir, fieldnames)
+
+
+def _new_rollups(rollups_dir: Optional[Path]) -> Optional[DashboardRollups]:
+    return DashboardRollups() if rollups_dir is not None else None
+
+
+def _write_rollups(rollups: Optional[DashboardRollups], rollups_dir: Optional[Path],
+                   output_file: Path, stats: ConversionStats) -> None:
+    if rollups is None:
+        return
+    with stats.timer.stage('rollups'):
+        rollups.write(rollups_dir, as_of_now(), output_file)
+    print(f"Dashboard rollups written to: {rollups_dir}")
+
+
+def _build_store(store_file: Optional[Path], output_file: Path, stats: ConversionStats) -> None:
+    if store_file is None:
+        return
+    with stats.timer.stage('store'):
+        build_store(store_file, output_file)
+    print(f"Query store rebuilt: {store_file}")
+
+
+def _capture_changes(changes_dir: Optional[Path], output_file: Path,
+                     stats: ConversionStats) -> None:
+    if changes_dir is None:
+        return
+    with stats.timer.stage('changes'):
+        run = capture_csv(output_file, changes_dir)
+    print(f"Changes since the previous run: {describe(run)}")
+    print(f"Delta written to: {changes_dir / run.delta_file}")
+
+
+def _load_output(dsn: Optional[str], output_file: Path, changes_dir: Optional[Path],
+                 stats: ConversionStats) -> None:
+    if dsn is None:
+        return
+    with stats.timer.stage('load'):
+        if changes_dir is not None:
+            result = apply_changes(dsn, changes_dir)
         else:
-            category = 'xero_links_only'
-    
-    category_stats[category] += 1
-    
-    # Determine processing status
-    processing_status = 'Processed'
-    if not row.get('file_url', ''):
-        if category == 'xero_links_only':
-            processing_status = 'Needs Manual Download'
-    
-    status_stats[processing_status] += 1
-    
-    # Build the email subject if it's empty
-    email_subject = row.get('email_subject', '')
-    if not email_subject:
-        invoice_num = row.get('invoice_number', '')
-        supplier = row.get('supplier_name', '')
-        customer = row.get('customer_name', '')
-        email_subject = f"Invoice {invoice_num} from {supplier} for {customer}"
-    
-    # Get vendor name
-    vendor = row.get('supplier_name', '')
-    if not vendor:
-        vendor = row.get('email_from_name', 'Unknown Vendor')
-    
-    vendor_stats[vendor] += 1
-    
-    # Clean up OneDrive link
-    onedrive_link = row.get('file_url', '')
-    if not onedrive_link:
-        onedrive_link = ''
-    
-    # Create Xero link if from Xero
-    xero_link = ''
-    if 'xero' in email_from:
-        invoice_num = row.get('invoice_number', '')
-        if invoice_num:
-            xero_link = f"https://go.xero.com/invoice/{invoice_num}"
-    
-    # Format the received date (using invoice_date as proxy)
-    received_date = format_date(row.get('invoice_date', ''))
-    if not received_date:
-        received_date = datetime.now().strftime('%Y-%m-%dT%H:%M:%S.000Z')
-    
-    # Calculate amount
-    amount = clean_amount(row.get('total', row.get('amount_due', 0)))
-    total_amount += amount
-    
-    # Create the output row
-    output_row = {
-        'Email_ID': row.get('message_id', ''),
-        'Subject': email_subject,
-        'From_Email': row.get('email_from_address', ''),
-        'From_Name': row.get('email_from_name', vendor),
-        'Received_Date': received_date,
-        'Category': category,
-        'Invoice_Number': row.get('invoice_number', ''),
-        'Amount': amount,
-        'Vendor': vendor,
-        'Due_Date': format_date(row.get('due_date', '')),
-        'OneDrive_Link': onedrive_link,
-        'Xero_Link': xero_link,
-        'Processing_Status': processing_status,
-        'Processed_At': format_date(row.get('invoice_date', ''))
-    }
-    
-    output_data.append(output_row)
-
-# Sort by received date (newest first)
-output_data.sort(key=lambda x: x['Received_Date'], reverse=True)
-
-# Write to CSV
-print(f"\nWriting cleaned data to: {output_file}")
-with open(output_file, 'w', newline='', encoding='utf-8') as f:
-    fieldnames = ['Email_ID', 'Subject', 'From_Email', 'From_Name', 'Received_Date', 
-                  'Category', 'Invoice_Number', 'Amount', 'Vendor', 'Due_Date', 
-                  'OneDrive_Link', 'Xero_Link', 'Processing_Status', 'Processed_At']
-    
+            result = load_csv(dsn, output_file)
+    print(f"Loaded into the database: {result.describe()}")
+
+
+def write_rows(f: TextIO, rows: Iterable[Dict[str, Any]],
+               columns_dir: Optional[Path] = None,
+               rollups: Optional[DashboardRollups] = None,
+               fieldnames: List[str] = FIELDNAMES) -> int:
+    """Write dashboard rows as CSV to the open text file ``f``; returns the count.
+
+    With ``columns_dir`` the same rows are also published as a column store;
+    with ``rollups`` each written row is added to the dashboard aggregates.
+    """
+    store = _column_store_writer(columns_dir, fieldnames)
+    if store is not None:
+        rows = store.tap(rows)
+    if rollups is not None:
+        rows = rollups.tap(rows)
+
+    written = 0
     writer = csv.DictWriter(f, fieldnames=fieldnames)
     writer.writeheader()
-    writer.writerows(output_data)
-
-print(f"\n✅ Successfully created cleaned CSV file!")
-print(f"Total unique invoices: {len(output_data)}")
-
-# Display summary statistics
-print("\n=== Summary Statistics ===")
-print(f"Total Amount: ${total_amount:,.2f}")
-if len(output_data) > 0:
-    print(f"Average Invoice: ${total_amount/len(output_data):,.2f}")
-print(f"Number of Vendors: {len(vendor_stats)}")
-
-print(f"\nTop 5 Vendors by Invoice Count:")
-sorted_vendors = sorted(vendor_stats.items(), key=lambda x: x[1], reverse=True)
-for vendor, count in sorted_vendors[:5]:
-    print(f"  {vendor}: {count} invoices")
-
-print(f"\nProcessing Status:")
-for status, count in status_stats.items():
-    print(f"  {status}: {count}")
-
-print(f"\nCategory Distribution:")
-for category, count in category_stats.items():
-    print(f"  {category}: {count}")
\ No newline at end of file
+    try:
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    except BaseException:
+        if store is not None:
+            store.abort()
+        raise
+
+    if store is not None:
+        store.close()
+    return written
+
+
+def write_csv(output_file: Path, rows: Iterable[Dict[str, Any]],
+              columns_dir: Optional[Path] = None,
+              rollups: Optional[DashboardRollups] = None,
+              fieldnames: List[str] = FIELDNAMES) -> int:
+    """Write dashboard rows to ``output_file`` and return how many were written."""
+    with open_file(output_file, 'w', newline='', encoding='utf-8') as f:
+        return write_rows(f, rows, columns_dir, rollups, fieldnames)
+
+
+def print_dedup_summary(stats: ConversionStats) -> None:
+    print(f"Original records: {stats.original}")
+    print(f"Duplicates removed: {stats.duplicates}")
+    print(f"Unique records: {stats.unique}")
+
+
+def print_summary(stats: ConversionStats) -> None:
+    print(f"\n✅ Successfully created cleaned CSV file!")
+    print(f"Total unique invoices: {stats.written}")
+    if stats.invoice_duplicates is not None:
+        print(f"Same invoice in several emails: {stats.invoice_duplicates.describe()}")
+
+    # Display summary statistics
+    print("\n=== Summary Statistics ===")
+    print(f"Total Amount: ${stats.total_amount:,.2f}")
+    if stats.written > 0:
+        print(f"Average Invoice: ${stats.total_amount/stats.written:,.2f}")
+    print(f"Number of Vendors: {len(stats.vendor_stats)}")
+
+    print(f"\nTop 5 Vendors by Invoice Count:")
+    # A 5-element heap rather than sorting every vendor; ties keep first-seen order
+    top_vendors = heapq.nlargest(5, stats.vendor_stats.items(), key=itemgetter(1))
+    for vendor, count in top_vendors:
+        print(f"  {vendor}: {count} invoices")
+
+    print(f"\nProcessing Status:")
+    for status, count in stats.status_stats.items():
+        print(f"  {status}: {count}")
+
+    print(f"\nCategory Distribution:")
+    for category, count in stats.category_stats.items():
+        print(f"  {category}: {count}")
+
+
+def convert_batch(input_file: Path, output_file: Path,
+                  columns_dir: Optional[Path] = None,
+                  rollups_dir: Optional[Path] = None,
+                  duplicate_policy: Optional[str] = None,
+                  parser: str = 'csv',
+                  run_timestamp: Optional[str] = None) -> ConversionStats:
+    """Original in-memory conversion: load everything, sort, then write."""
+    stats = _new_stats(duplicate_policy)
+    if run_timestamp is not None:
+        stats.run_timestamp = run_timestamp
+    rollups = _new_rollups(rollups_dir)
+
+    print("Reading invoice data...")
+    rows = list(read_unique_rows(input_file, stats, parser))
+    print_dedup_summary(stats)
+
+    # Process and convert the data
+    with stats.timer.stage('transform'):
+        output_data = list(transform_rows(rows, stats))
+
+    # Sort by received date (newest first)
+    with stats.timer.stage('sort'):
+        output_data.sort(key=received_date_key, reverse=True)
+
+    print(f"\nWriting cleaned data to: {output_file}")
+    with stats.timer.stage('write'):
+        stats.written = write_csv(output_file, keep_latest(output_data, stats), columns_dir,
+                                  rollups, output_fieldnames(stats))
+    _write_rollups(rollups, rollups_dir, output_file, stats)
+    return stats
+
+
+def write_csv_columns(output_file: Path, columns: Dict[str, List[Any]],
+                      columns_dir: Optional[Path] = None) -> int:
+    """Write column lists (keyed by dashboard field) as CSV rows."""
+    with open_file(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(zip(*(columns[name] for name in FIELDNAMES)))
+
+    store = _column_store_writer(columns_dir)
+    if store is not None:
+        store.extend_columns(columns)
+        store.close()
+    return len(columns[FIELDNAMES[0]])
+
+
+def convert_columnar(input_file: Path, output_file: Path,
+                     columns_dir: Optional[Path] = None,
+                     rollups_dir: Optional[Path] = None,
+                     run_timestamp: Optional[str] = None) -> ConversionStats:
+    """In-memory conversion through the vectorised NumPy engine."""
+    require_hand_written_mapping('columnar')
+    try:
+        from columnar_engine import convert_columns
+    except ImportError as exc:
+        raise RuntimeError("The columnar engine needs NumPy: pip install numpy") from exc
+
+    stats = ConversionStats()
+    if run_timestamp is not None:
+        stats.run_timestamp = run_timestamp
+
+    print("Reading invoice data (columnar engine)...")
+    columns = convert_columns(input_file, stats, stats.run_timestamp)
+    print_dedup_summary(stats)
+
+    print(f"\nWriting cleaned data to: {output_file}")
+    with stats.timer.stage('write'):
+        stats.written = write_csv_columns(output_file, columns, columns_dir)
+    rollups = _new_rollups(rollups_dir)
+    if rollups is not None:
+        with stats.timer.stage('rollups'):
+            rollups.add_columns(columns)
+    _write_rollups(rollups, rollups_dir, output_file, stats)
+    return stats
+
+
+def convert_compact(input_file: Path, output_file: Path,
+                    columns_dir: Optional[Path] = None,
+                    rollups_dir: Optional[Path] = None,
+                    parser: str = 'csv',
+                    run_timestamp: Optional[str] = None) -> ConversionStats:
+    """In-memory conversion over projected tuples instead of per-row dicts."""
+    require_hand_written_mapping('compact')
+    from compact_records import RECEIVED_DATE, convert_records
+
+    stats = ConversionStats()
+    if run_timestamp is not None:
+        stats.run_timestamp = run_timestamp
+
+    print("Reading invoice data (compact records)...")
+    records = convert_records(input_file, stats, parser)
+    print_dedup_summary(stats)
+
+    with stats.timer.stage('sort'):
+        records.sort(key=itemgetter(RECEIVED_DATE), reverse=True)
+
+    print(f"\nWriting cleaned data to: {output_file}")
+    rollups = _new_rollups(rollups_dir)
+    with stats.timer.stage('write'):
+        if columns_dir is None and rollups is None:
+            with open_file(output_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDNAMES)
+                writer.writerows(records)
+            stats.written = len(records)
+        else:
+            # The column store and rollups consume dicts; build them one at a time
+            rows = (dict(zip(FIELDNAMES, record)) for record in records)
+            stats.written = write_csv(output_file, rows, columns_dir, rollups)
+    _write_rollups(rollups, rollups_dir, output_file, stats)
+    return stats
+
+
+def convert_streaming(
+    input_file: Path,
+    output_file: Path,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    tmp_dir: Optional[str] = None,
+    columns_dir: Optional[Path] = None,
+    rollups_dir: Optional[Path] = None,
+    duplicate_policy: Optional[str] = None,
+    parser: str = 'csv',
+) -> ConversionStats:
+    """Constant-memory conversion: rows flow through an external merge sort."""
+    stats = _new_stats(duplicate_policy)
+    rollups = _new_rollups(rollups_dir)
+
+    print(f"Streaming invoice data (sort budget {memory_budget_mb} MB)...")
+    timer = stats.timer
+    output_rows = timer.timed('transform', transform_rows(
+        read_unique_rows(input_file, stats, parser), stats))
+    sorted_rows = timer.timed('sort', external_sort(
+        output_rows,
+        key=received_date_key,
+        reverse=True,
+        memory_budget=memory_budget_mb * 1024 * 1024,
+        tmp_dir=tmp_dir,
+    ))
+
+    print(f"Writing cleaned data to: {output_file}")
+    with timer.stage('write'):
+        stats.written = write_csv(output_file, keep_latest(sorted_rows, stats), columns_dir,
+                                  rollups, output_fieldnames(stats))
+    _write_rollups(rollups, rollups_dir, output_file, stats)
+    print_dedup_summary(stats)
+    return stats
+
+
+def convert_partitioned(
+    input_file: Path,
+    partition_dir: Path,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    tmp_dir: Optional[str] = None,
+    duplicate_policy: Optional[str] = None,
+    parser: str = 'csv',
+) -> ConversionStats:
+    """Streaming conversion into one CSV per received month plus a manifest."""
+    stats = _new_stats(duplicate_policy)
+
+    print(f"Streaming invoice data into month partitions (sort budget {memory_budget_mb} MB)...")
+    timer = stats.timer
+    output_rows = timer.timed('transform', transform_rows(
+        read_unique_rows(input_file, stats, parser), stats))
+    # Integer keys, computed once per row and cached per distinct date
+    sorted_rows = timer.timed('sort', external_sort(
+        output_rows,
+        key=received_epoch,
+        reverse=True,
+        memory_budget=memory_budget_mb * 1024 * 1024,
+        tmp_dir=tmp_dir,
+    ))
+
+    print(f"Writing month partitions to: {partition_dir}")
+    with timer.stage('write'):
+        stats.written = write_partitions(partition_dir, keep_latest(sorted_rows, stats),
+                                         output_fieldnames(stats), stats.run_timestamp,
+                                         input_file)
+    print_dedup_summary(stats)
+    return stats
+
+
+def _tail_hash(input_file: Path, offset: int) -> bytes:
+    with open(input_file, 'rb') as f:
+        f.seek(max(0, offset - CHECKPOINT_TAIL_BYTES))
+        return hashlib.blake2b(f.read(min(offset, CHECKPOINT_TAIL_BYTES)), digest_size=16).digest()
+
+
+def _can_resume(state: Optional[CheckpointState], header: str, input_file: Path,
+                output_file: Path, end: int) -> bool:
+    """Whether the export is an append-only extension of what the checkpoint saw."""
+    if state is None or state.header != header or end < state.byte_offset:
+        return False
+    if not output_file.exists():
+        return False
+    out = output_file.stat()
+    if (out.st_size, out.st_mtime_ns) != (state.output_size, state.output_mtime_ns):
+        return False
+    if _tail_hash(input_file, state.byte_offset) != state.tail_hash:
+        return False
+    if not state.tail_complete and end > state.byte_offset:
+        # The last row had no newline; new bytes must start a new line rather
+        # than extend that row.
+        with open(input_file, 'rb') as f:
+            f.seek(state.byte_offset)
+            if f.read(1) not in (b'\n', b'\r'):
+                return False
+    return True
+
+
+def convert_incremental(
+    input_file: Path,
+    output_file: Path,
+    checkpoint_file: Path = CHECKPOINT_FILE,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    tmp_dir: Optional[str] = None,
+    columns_dir: Optional[Path] = None,
+    rollups_dir: Optional[Path] = None,
+    parser: str = 'csv',
+    store_file: Optional[Path] = None,
+) -> ConversionStats:
+    """Convert only rows appended since the last checkpoint and merge them in.
+
+    Rollups and the query store are updated from the appended rows alone; the
+    rows already in the output come from the saved rollup state and the store.
+    """
+    stats = ConversionStats()
+    header, header_end = read_tsv_header(input_file)
+    end = input_file.stat().st_size
+
+    with ConversionCheckpoint(checkpoint_file) as checkpoint:
+        state = checkpoint.state(input_file)
+        resume = _can_resume(state, header, input_file, output_file, end)
+        if resume:
+            start = state.byte_offset
+            print(f"Resuming from byte {start:,} of {end:,} "
+                  f"({checkpoint.seen_count():,} messages already seen)...")
+            rollups = load_rollups(rollups_dir, output_file) if rollups_dir else None
+            if start == end:
+                print("No new rows since the last run.")
+                # Still move the as-of time forward so overdue counts stay current
+                _write_rollups(rollups, rollups_dir, output_file, stats)
+                if store_file is not None and not store_is_current(store_file, output_file):
+                    _build_store(store_file, output_file, stats)
+                return stats
+        else:
+            checkpoint.reset()
+            start = header_end
+            rollups = _new_rollups(rollups_dir)
+            print("No usable checkpoint; converting the full export...")
+
+        timer = stats.timer
+        raw_rows = timer.timed('read', read_tsv_range(input_file, header, start, end, parser))
+        unique_rows = timer.timed('dedup', dedup_rows(raw_rows, stats, checkpoint))
+        new_rows = timer.timed('transform', (transform_row(row, stats) for row in unique_rows))
+        sorted_rows = timer.timed('sort', external_sort(
+            new_rows,
+            key=received_date_key,
+            reverse=True,
+            memory_budget=memory_budget_mb * 1024 * 1024,
+            tmp_dir=tmp_dir,
+        ))
+        if rollups is not None:
+            sorted_rows = rollups.tap(sorted_rows)
+        store = None
+        if store_file is not None and resume and store_is_current(store_file, output_file):
+            store = InvoiceStore(store_file)
+            sorted_rows = store.tap(sorted_rows)
+
+        tmp_output = output_file.with_name(output_file.name + '.tmp')
+        print(f"Writing cleaned data to: {output_file}")
+        if resume:
+            # Existing rows were read earlier, so they go first on equal dates,
+            # exactly as a full stable sort would order them.
+            with open_file(output_file, 'r', newline='', encoding='utf-8') as existing:
+                merged = timer.timed('merge', heapq.merge(
+                    csv.DictReader(existing), sorted_rows, key=received_date_key, reverse=True))
+                with timer.stage('write'):
+                    total = write_csv(tmp_output, merged, columns_dir)
+        else:
+            with timer.stage('write'):
+                total = write_csv(tmp_output, sorted_rows, columns_dir)
+        os.replace(tmp_output, output_file)
+        if store is not None:
+            with timer.stage('store'), store:
+                store.commit(output_file)
+        elif store_file is not None:
+            _build_store(store_file, output_file, stats)
+
+        with open(input_file, 'rb') as f:
+            f.seek(max(0, end - 1))
+            tail_complete = f.read(1) == b'\n'
+        out = output_file.stat()
+        checkpoint.commit(input_file, CheckpointState(
+            byte_offset=end,
+            header=header,
+            tail_complete=tail_complete,
+            tail_hash=_tail_hash(input_file, end),
+            output_size=out.st_size,
+            output_mtime_ns=out.st_mtime_ns,
+        ))
+        _write_rollups(rollups, rollups_dir, output_file, stats)
+
+    stats.written = stats.unique
+    print_dedup_summary(stats)
+    print(f"Output now holds {total} invoices")
+    return stats
+
+
+def shard_ranges(input_file: Path, start: int, shards: int) -> List[Tuple[int, int]]:
+    """Split ``input_file`` from ``start`` to EOF into byte ranges on line boundaries."""
+    end = input_file.stat().st_size
+    step = max(1, (end - start) // max(1, shards))
+    ranges = []
+    with open(input_file, 'rb') as f:
+        lo = start
+        while lo < end:
+            f.seek(min(end, lo + step))
+            f.readline()  # advance to the start of the next line
+            hi = min(end, f.tell())
+            if hi <= lo:
+                hi = end
+            ranges.append((lo, hi))
+            lo = hi
+    return ranges
+
+
+def _convert_shard(input_file: Path, header: str, start: int, end: int, run_path: Path,
+                   invoice_keys: bool = False, parser: str = 'csv',
+                   run_timestamp: Optional[str] = None) -> int:
+    """Worker: parse and transform one shard into a run file of
+    (key, invoice key, row, failed fields) tuples.
+
+    Dedup is left to the parent, which sees every shard in file order; parse
+    failures travel with each row so dropped duplicates aren't counted.
+    """
+    scratch = ConversionStats()
+    if run_timestamp is not None:
+        scratch.run_timestamp = run_timestamp
+
+    def converted():
+        for row in read_tsv_range(input_file, header, start, end, parser):
+            message_id = row.get('message_id', '')
+            key = message_key(message_id) if message_id else None
+            scratch.parse_failures.clear()
+            output_row = transform_row(row, scratch)
+            fuzzy_key = invoice_key(row, output_row['Amount']) if invoice_keys else None
+            yield key, fuzzy_key, output_row, tuple(scratch.parse_failures)
+
+    write_run(converted(), run_path)
+    return scratch.original
+
+
+def accumulate_row(output_row: Dict[str, Any], stats: ConversionStats) -> None:
+    """Count an already transformed row into ``stats`` (used after late dedup)."""
+    stats.category_stats[output_row['Category']] += 1
+    stats.status_stats[output_row['Processing_Status']] += 1
+    stats.vendor_stats[output_row['Vendor']] += 1
+    stats.total_amount += output_row['Amount']
+
+
+def convert_parallel(
+    input_file: Path,
+    output_file: Path,
+    workers: Optional[int] = None,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    tmp_dir: Optional[str] = None,
+    columns_dir: Optional[Path] = None,
+    rollups_dir: Optional[Path] = None,
+    duplicate_policy: Optional[str] = None,
+    parser: str = 'csv',
+) -> ConversionStats:
+    """Convert byte-range shards in a process pool, then dedup and sort in order."""
+    stats = _new_stats(duplicate_policy)
+    duplicates = stats.invoice_duplicates
+    rollups = _new_rollups(rollups_dir)
+    workers = workers or os.cpu_count() or 1
+    header, header_end = read_tsv_header(input_file)
+    ranges = shard_ranges(input_file, header_end, workers)
+
+    print(f"Converting {len(ranges)} shards with {workers} workers...")
+    timer = stats.timer
+    with tempfile.TemporaryDirectory(prefix='invoice-shards-', dir=tmp_dir) as workdir:
+        run_paths = [Path(workdir) / f'shard-{i:05d}' for i in range(len(ranges))]
+        with timer.stage('shards'), ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_convert_shard, input_file, header, lo, hi, path,
+                                   duplicates is not None, parser, stats.run_timestamp)
+                       for (lo, hi), path in zip(ranges, run_paths)]
+            for future in futures:
+                future.result()
+
+        seen_message_ids = set()
+
+        def unique_rows():
+            # Walk shards in file order so the first occurrence wins globally.
+            for path in run_paths:
+                for key, fuzzy_key, output_row, failures in read_run(path):
+                    stats.original += 1
+                    if key is not None:
+                        if key in seen_message_ids:
+                            stats.duplicates += 1
+                            continue
+                        seen_message_ids.add(key)
+                    if duplicates is not None:
+                        if not duplicates.admit(fuzzy_key, output_row['Amount']):
+                            continue
+                        duplicates.annotate(fuzzy_key, output_row)
+                    accumulate_row(output_row, stats)
+                    for field_name in failures:
+                        stats.parse_failures[field_name] += 1
+                    yield output_row
+
+        sorted_rows = timer.timed('sort', external_sort(
+            timer.timed('dedup', unique_rows()),
+            key=received_date_key,
+            reverse=True,
+            memory_budget=memory_budget_mb * 1024 * 1024,
+            tmp_dir=workdir,
+        ))
+        print(f"Writing cleaned data to: {output_file}")
+        with timer.stage('write'):
+            stats.written = write_csv(output_file, keep_latest(sorted_rows, stats), columns_dir,
+                                      rollups, output_fieldnames(stats))
+    _write_rollups(rollups, rollups_dir, output_file, stats)
+
+    print_dedup_summary(stats)
+    return stats
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', type=Path, default=INPUT_FILE,
+                        help='mailbox TSV export (default: %(default)s)')
+    parser.add_argument('--output', type=Path, default=OUTPUT_FILE,
+                        help='cleaned CSV to write (default: %(default)s)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--stream', action='store_true',
+                      help='process row by row with a disk-spilling sort')
+    mode.add_argument('--incremental', action='store_true',
+                      help='convert only rows appended since the last checkpoint')
+    mode.add_argument('--parallel', action='store_true',
+                      help='convert byte-range shards in a process pool')
+    mode.add_argument('--partitioned', type=Path, nargs='?', const=PARTITION_DIR, default=None,
+                      metavar='DIR',
+                      help='write one CSV per received month plus a manifest instead of '
+                           f'--output (default DIR: {PARTITION_DIR})')
+    parser.add_argument('--columns', action='store_true',
+                        help='also write a memory-mapped columnar copy next to the output')
+    parser.add_argument('--rollups', action='store_true',
+                        help='also materialise dashboard metrics and filter facets next to the output')
+    parser.add_argument('--store', action='store_true',
+                        help='also maintain the indexed SQLite query store next to the output')
+    parser.add_argument('--changes', action='store_true',
+                        help='also write a delta of changed rows since the previous run')
+    parser.add_argument('--load', metavar='DSN', default=None,
+                        help='also bulk-load the output into a Postgres or SQLite invoices table')
+    parser.add_argument('--duplicates', choices=DUPLICATE_POLICIES, default=None,
+                        help='also handle the same invoice arriving in several emails')
+    parser.add_argument('--metrics', type=Path, default=None,
+                        help='write stage timings and parse-failure counters as JSON')
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                        help='profile the run with cProfile or tracemalloc')
+    parser.add_argument('--profile-output', type=Path, default=None,
+                        help='profile dump path (default: next to the output)')
+    parser.add_argument('--engine', choices=('rows', 'columnar', 'compact'), default='rows',
+                        help='conversion engine for the default in-memory mode')
+    parser.add_argument('--parser', choices=TSV_PARSERS, default='csv',
+                        help='TSV parser: the csv module, or the chunked fast path (fast_tsv.py)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for --parallel (default: CPU count)')
+    parser.add_argument('--checkpoint', type=Path, default=CHECKPOINT_FILE,
+                        help='checkpoint database for --incremental (default: %(default)s)')
+    parser.add_argument('--memory-budget-mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help='sort buffer size before spilling to disk '
+                             '(--stream/--incremental/--partitioned)')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='directory for sort run files (default: system temp)')
+    args = parser.parse_args(argv)
+    args.input = resolve(args.input)
+    if (args.incremental or args.parallel) and detect_codec(args.input) is not None:
+        parser.error('--incremental and --parallel seek by byte offset; '
+                     'they need an uncompressed input')
+    if args.partitioned and (args.columns or args.rollups or args.store or args.changes
+                             or args.load):
+        parser.error('--columns, --rollups, --store, --changes and --load build on the single '
+                     'cleaned CSV; they do not apply to --partitioned')
+    if args.engine != 'rows' and (args.stream or args.incremental or args.parallel
+                                  or args.partitioned):
+        parser.error(f'--engine {args.engine} only applies to the default in-memory mode')
+    if args.duplicates and (args.incremental or args.engine != 'rows'):
+        parser.error('--duplicates applies to the batch, --stream, --parallel and '
+                     '--partitioned modes')
+    if args.engine in HAND_WRITTEN_ENGINES:
+        try:
+            require_hand_written_mapping(args.engine)
+        except RuntimeError as exc:
+            parser.error(str(exc))
+    if args.parser != 'csv' and args.engine == 'columnar':
+        parser.error('--engine columnar has its own reader; --parser does not apply')
+    return args
+
+
+def run_mode(args: argparse.Namespace) -> str:
+    if args.incremental:
+        return 'incremental'
+    if args.parallel:
+        return 'parallel'
+    if args.stream:
+        return 'stream'
+    if args.partitioned:
+        return 'partitioned'
+    return args.engine if args.engine != 'rows' else 'batch'
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    mode = run_mode(args)
+    # Side outputs are named after the plain CSV: x.csv.gz still gets x.rollups/
+    base = plain_path(args.output)
+    columns_dir = base.with_name(base.stem + '.columns') if args.columns else None
+    rollups_dir = base.with_name(base.stem + '.rollups') if args.rollups else None
+    store_file = base.with_suffix('.sqlite') if args.store else None
+    changes_dir = base.with_name(base.stem + '.changes') if args.changes else None
+    profile_output = args.profile_output
+    if args.profile and profile_output is None:
+        suffix = '.prof' if args.profile == 'cprofile' else '.tracemalloc.txt'
+        profile_output = args.output.with_name(args.output.stem + suffix)
+
+    report: Dict[str, Any] = {
+        'mode': mode,
+        'input': str(args.input),
+        'output': str(args.partitioned if mode == 'partitioned' else args.output),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    started = time.perf_counter()
+    with profiled(args.profile, profile_output, report):
+        if mode == 'incremental':
+            stats = convert_incremental(args.input, args.output, args.checkpoint,
+                                        args.memory_budget_mb, args.tmp_dir, columns_dir,
+                                        rollups_dir, args.parser, store_file)
+        elif mode == 'parallel':
+            stats = convert_parallel(args.input, args.output, args.workers,
+                                     args.memory_budget_mb, args.tmp_dir, columns_dir,
+                                     rollups_dir, args.duplicates, args.parser)
+        elif mode == 'stream':
+            stats = convert_streaming(args.input, args.output, args.memory_budget_mb,
+                                      args.tmp_dir, columns_dir, rollups_dir, args.duplicates,
+                                      args.parser)
+        elif mode == 'partitioned':
+            stats = convert_partitioned(args.input, args.partitioned, args.memory_budget_mb,
+                                        args.tmp_dir, args.duplicates, args.parser)
+        elif mode == 'columnar':
+            stats = convert_columnar(args.input, args.output, columns_dir, rollups_dir)
+        elif mode == 'compact':
+            stats = convert_compact(args.input, args.output, columns_dir, rollups_dir,
+                                    args.parser)
+        else:
+            stats = convert_batch(args.input, args.output, columns_dir, rollups_dir,
+                                  args.duplicates, args.parser)
+        if mode != 'incremental':
+            _build_store(store_file, args.output, stats)
+        _capture_changes(changes_dir, args.output, stats)
+        _load_output(args.load, args.output, changes_dir, stats)
+    report['seconds'] = round(time.perf_counter() - started, 6)
+    report.update(stats.to_metrics())
+    report['date_cache'] = parse_date.cache_info()._asdict()
+
+    if stats.original:
+        print_summary(stats)
+    if stats.parse_failures:
+        failures = ', '.join(f"{name}: {count}" for name, count in stats.parse_failures.items())
+        print(f"\nUnparseable values: {failures}")
+    if args.metrics:
+        args.metrics.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nMetrics written to: {args.metrics}")
+
+
+if __name__ == '__main__':
+    main()
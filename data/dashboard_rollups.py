@@ -0,0 +1,283 @@
+"""Materialised dashboard rollups maintained at conversion time.
+
+The converter writes a directory next to the cleaned CSV::
+
+    invoices_cleaned_2024.rollups/
+        dashboard-metrics.json        /api/stats KPI payload
+        invoice-filter-facets.json    /api/invoices/facets payload
+        invoice-analytics.json        vendor leaders, distinct vendors, amount quantiles
+        invoice-trends.json           count/amount series and deltas by day, week, month
+        state.json                    running aggregates the payloads are built from
+
+The metrics and facet payloads have exactly the shapes of ``docs/api-samples/``, so the
+metrics and facet endpoints can serve them as-is instead of scanning every
+invoice per request.
+
+Payment status follows ``deriveInvoiceStatus`` in ``src/app/api/stats``: an
+amount of zero is ``paid``, a positive amount whose due date has passed is
+``overdue`` and everything else is ``pending``. The cleaned CSV carries a
+single ``Amount``, so it doubles as the amount due, as the stats route does
+when ``amount_due`` is missing.
+
+Because "overdue" depends on the clock, outstanding invoices are kept in
+``state.json`` bucketed by due date rather than as a fixed status. Adding a
+row is O(1); re-materialising the payloads walks only the distinct due and
+received days, so a later run can fold in new rows (or just move the as-of
+time forward) without rereading the output.
+
+The analytics payload comes from the streaming sketches in
+``invoice_sketches.py`` and the trends payload (and the metrics' deltas) from
+the per-day cubes in ``trend_cubes.py``. Both are saved in the state so
+incremental runs keep extending them.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from compressed_io import open_file
+from invoice_dates import is_iso_date
+from invoice_sketches import InvoiceSketches
+from trend_cubes import TrendCubes
+
+STATE_VERSION = 3
+METRICS_FILE = 'dashboard-metrics.json'
+FACETS_FILE = 'invoice-filter-facets.json'
+ANALYTICS_FILE = 'invoice-analytics.json'
+TRENDS_FILE = 'invoice-trends.json'
+STATE_FILE = 'state.json'
+
+STATUSES = ('pending', 'paid', 'overdue')
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+def _vendor_email(from_email: Optional[str]) -> str:
+    """The sender address, unless it is Xero's mailer rather than the vendor's."""
+    if not from_email or 'xero' in from_email.lower():
+        return ''
+    return from_email
+
+
+class DashboardRollups:
+    """Running aggregates behind the dashboard metrics and facet payloads."""
+
+    def __init__(self) -> None:
+        self.total_invoices = 0
+        self.total_amount = 0.0
+        self.paid = [0, 0.0]
+        # Never overdue: negative amounts and rows without a usable due date
+        self.open_undated = [0, 0.0]
+        # Positive amounts by due date; overdue once the date has passed
+        self.open_by_due: Dict[str, List[float]] = {}
+        # Received counts and amounts per day, overall and by vendor/category/status
+        self.trends = TrendCubes()
+        self.categories: Dict[str, int] = {}
+        self.vendors: Dict[str, List[Any]] = {}
+        self.amount_min: Optional[float] = None
+        self.amount_max: Optional[float] = None
+        self.date_min: Optional[str] = None
+        self.date_max: Optional[str] = None
+        self.sketches = InvoiceSketches()
+
+    def add(self, amount: float, due_date: str, received_date: str,
+            category: str, vendor: str, email: str, processing_status: str = '') -> None:
+        self.total_invoices += 1
+        self.total_amount += amount
+
+        if amount == 0:
+            bucket = self.paid
+        elif amount > 0 and is_iso_date(due_date):
+            bucket = self.open_by_due.setdefault(due_date, [0, 0.0])
+        else:
+            bucket = self.open_undated
+        bucket[0] += 1
+        bucket[1] += amount
+
+        category = category or 'Uncategorized'
+        vendor = vendor or 'Unknown Vendor'
+        if is_iso_date(received_date):
+            self.trends.add(received_date[:10], amount, vendor, category,
+                            processing_status or 'Unknown')
+            if self.date_min is None or received_date < self.date_min:
+                self.date_min = received_date
+            if self.date_max is None or received_date > self.date_max:
+                self.date_max = received_date
+
+        self.categories[category] = self.categories.get(category, 0) + 1
+
+        entry = self.vendors.get(vendor)
+        if entry is None:
+            self.vendors[vendor] = [email or None, 1]
+        else:
+            entry[1] += 1
+            if not entry[0] and email:
+                entry[0] = email
+
+        if self.amount_min is None or amount < self.amount_min:
+            self.amount_min = amount
+        if self.amount_max is None or amount > self.amount_max:
+            self.amount_max = amount
+
+        self.sketches.add(amount, vendor, category)
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        """Fold in one cleaned CSV row (dict keyed by the dashboard columns)."""
+        self.add(float(row['Amount'] or 0), row['Due_Date'] or '', row['Received_Date'] or '',
+                 row['Category'], row['Vendor'], _vendor_email(row['From_Email']),
+                 row['Processing_Status'])
+
+    def tap(self, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield ``rows`` unchanged, adding each one on the way through."""
+        for row in rows:
+            self.add_row(row)
+            yield row
+
+    def add_columns(self, columns: Dict[str, List[Any]]) -> None:
+        """Fold in column lists as produced by the columnar engine."""
+        for values in zip(columns['Amount'], columns['Due_Date'], columns['Received_Date'],
+                          columns['Category'], columns['Vendor'], columns['From_Email'],
+                          columns['Processing_Status']):
+            self.add(*values[:5], _vendor_email(values[5]), values[6])
+
+    def statuses(self, as_of: str) -> Dict[str, List[float]]:
+        """``{status: [count, amount]}`` with overdue judged at ``as_of``."""
+        pending = list(self.open_undated)
+        overdue = [0, 0.0]
+        for due_date, (count, amount) in self.open_by_due.items():
+            bucket = overdue if due_date < as_of else pending
+            bucket[0] += count
+            bucket[1] += amount
+        return {'pending': pending, 'paid': list(self.paid), 'overdue': overdue}
+
+    def dashboard_metrics(self, as_of: str) -> Dict[str, Any]:
+        """Payload shaped like ``docs/api-samples/dashboard-metrics.json``."""
+        statuses = self.statuses(as_of)
+        return {
+            'totals': {
+                'totalInvoices': self.total_invoices,
+                'pending': statuses['pending'][0],
+                'overdue': statuses['overdue'][0],
+                'paid': statuses['paid'][0],
+                'totalAmount': round(self.total_amount, 2),
+                'pendingAmount': round(statuses['pending'][1], 2),
+                'overdueAmount': round(statuses['overdue'][1], 2),
+                'paidAmount': round(statuses['paid'][1], 2),
+            },
+            'trends': self.trends.deltas(as_of),
+        }
+
+    def invoice_filter_facets(self, as_of: str) -> Dict[str, Any]:
+        """Payload shaped like ``docs/api-samples/invoice-filter-facets.json``."""
+        statuses = self.statuses(as_of)
+        vendors = []
+        for value, (email, count) in self.vendors.items():
+            entry: Dict[str, Any] = {'value': value}
+            if email:
+                entry['email'] = email
+            entry['count'] = count
+            vendors.append(entry)
+        return {
+            'facets': {
+                'statuses': [{'value': status, 'count': statuses[status][0]}
+                             for status in STATUSES if statuses[status][0]],
+                'categories': [{'value': value, 'count': count}
+                               for value, count in self.categories.items()],
+                'vendors': vendors,
+                'amountRange': {'min': self.amount_min or 0, 'max': self.amount_max or 0},
+                'dateRange': {'min': self.date_min, 'max': self.date_max},
+            },
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'version': STATE_VERSION,
+            'total_invoices': self.total_invoices,
+            'total_amount': self.total_amount,
+            'paid': self.paid,
+            'open_undated': self.open_undated,
+            'open_by_due': self.open_by_due,
+            'trends': self.trends.to_state(),
+            'categories': self.categories,
+            'vendors': self.vendors,
+            'amount_range': [self.amount_min, self.amount_max],
+            'date_range': [self.date_min, self.date_max],
+            'sketches': self.sketches.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'DashboardRollups':
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported rollup state version: {state.get('version')!r}")
+        rollups = cls()
+        rollups.total_invoices = state['total_invoices']
+        rollups.total_amount = state['total_amount']
+        rollups.paid = state['paid']
+        rollups.open_undated = state['open_undated']
+        rollups.open_by_due = state['open_by_due']
+        rollups.trends = TrendCubes.from_state(state['trends'])
+        rollups.categories = state['categories']
+        rollups.vendors = state['vendors']
+        rollups.amount_min, rollups.amount_max = state['amount_range']
+        rollups.date_min, rollups.date_max = state['date_range']
+        rollups.sketches = InvoiceSketches.from_state(state['sketches'])
+        return rollups
+
+    @classmethod
+    def from_csv(cls, csv_file: Path) -> 'DashboardRollups':
+        """Rebuild the aggregates from an existing cleaned CSV."""
+        rollups = cls()
+        with open_file(csv_file, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                rollups.add_row(row)
+        return rollups
+
+    def write(self, rollups_dir: Path, as_of: str, output_file: Optional[Path] = None) -> None:
+        """Materialise the payloads plus the state, each replaced atomically.
+
+        ``output_file`` is fingerprinted into the state so :func:`load_rollups`
+        can tell whether the state still describes that CSV.
+        """
+        rollups_dir.mkdir(parents=True, exist_ok=True)
+        state = self.to_state()
+        state['as_of'] = as_of
+        if output_file is not None:
+            out = output_file.stat()
+            state['output'] = {'size': out.st_size, 'mtime_ns': out.st_mtime_ns}
+        for name, payload in ((METRICS_FILE, self.dashboard_metrics(as_of)),
+                              (FACETS_FILE, self.invoice_filter_facets(as_of)),
+                              (ANALYTICS_FILE, self.sketches.analytics()),
+                              (TRENDS_FILE, self.trends.payload(as_of)),
+                              (STATE_FILE, state)):
+            path = rollups_dir / name
+            tmp = path.with_name(path.name + '.tmp')
+            tmp.write_text(json.dumps(payload, indent=2, allow_nan=False) + '\n', encoding='utf-8')
+            os.replace(tmp, path)
+
+
+def load_rollups(rollups_dir: Path, output_file: Path) -> DashboardRollups:
+    """Aggregates for the rows currently in ``output_file``.
+
+    Uses the saved state when it was written for this exact output file, and
+    otherwise rebuilds it from the CSV (first run with rollups, or the output
+    was rewritten without them).
+    """
+    state_file = rollups_dir / STATE_FILE
+    if state_file.exists() and output_file.exists():
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+        out = output_file.stat()
+        if (state.get('output') == {'size': out.st_size, 'mtime_ns': out.st_mtime_ns}
+                and state.get('version') == STATE_VERSION):
+            return DashboardRollups.from_state(state)
+    if output_file.exists():
+        return DashboardRollups.from_csv(output_file)
+    return DashboardRollups()
+
+
+def as_of_now() -> str:
+    """Current UTC time in the converter's date format."""
+    return datetime.now(timezone.utc).strftime(ISO_FORMAT)
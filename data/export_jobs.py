@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Export job queue and worker pool producing gzip CSV invoice exports.
+
+Jobs follow ``docs/api-samples/invoice-export-job.json`` (the columns of
+``invoice_export_jobs`` in the Supabase migration). Each one is a JSON
+record in ``data/exports/jobs/<id>.json``:
+
+    pending     queued (the table's default status)
+    processing  ``started_at`` set; ``row_count`` grows as chunks are written
+    completed   ``file_path`` and ``completed_at`` set
+    failed      ``error_message`` and ``completed_at`` set
+
+``requested_filters`` can be the contract's shape (``status``, ``vendor``,
+``dateFrom``, ``dateTo``), the invoices UI's ``serializeInvoiceFilters``
+shape (``statuses``, ``vendors``, ``categories``, ``amountRange``,
+``dateRange``, ``search``), or a mix of the two. Filters mean what they mean
+for the query store (``invoice_store.InvoiceQuery``). Payment status is
+judged when the job starts.
+
+A job streams the cleaned CSV in chunks of ``--chunk-rows`` rows and writes
+the matching ones, plus their ``Payment_Status``, through gzip into
+``data/exports/files/<id>.csv.gz``. Memory is one chunk, whatever the size
+of the export. The file is written under a temporary name and renamed on
+success, so a ``file_path`` always points at a complete export. Jobs run in
+a process pool of ``--concurrency`` workers. Run one runner per jobs
+directory; at start it requeues jobs a previous runner left ``processing``.
+
+Usage:
+    python data/export_jobs.py enqueue [--status overdue] [--vendor NAME]
+        [--category NAME] [--date-from YYYY-MM-DD] [--date-to YYYY-MM-DD]
+        [--amount-min N] [--amount-max N] [--search TEXT] [--filters JSON]
+    python data/export_jobs.py run [--concurrency 2] [--once] [--interval 2]
+    python data/export_jobs.py show [ID]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from compressed_io import open_file
+from dashboard_rollups import STATUSES, as_of_now
+from invoice_store import CSV_FILE, DATA_DIR, InvoiceQuery, _chunks, payment_status
+
+EXPORTS_DIR = DATA_DIR / 'exports'
+CHUNK_ROWS = 10_000
+DEFAULT_CONCURRENCY = 2
+COMPRESS_LEVEL = 6
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None or value == '':
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _date_only(value: Optional[str]) -> Optional[str]:
+    """``YYYY-MM-DD`` of a date or date-time filter value."""
+    return value[:10] if value else None
+
+
+def job_query(filters: Dict[str, Any]) -> Tuple[InvoiceQuery, str]:
+    """The store query and free-text search described by ``requested_filters``."""
+    date_range = filters.get('dateRange') or {}
+    amount_range = filters.get('amountRange') or {}
+    statuses = [status.lower() for status in
+                _as_list(filters.get('status')) + _as_list(filters.get('statuses'))]
+    unknown = set(statuses) - set(STATUSES)
+    if unknown:
+        raise ValueError(f"Unknown status {sorted(unknown)}; expected one of {STATUSES}")
+    amount_min = filters.get('amountMin', amount_range.get('min'))
+    amount_max = filters.get('amountMax', amount_range.get('max'))
+    query = InvoiceQuery(
+        statuses=statuses,
+        vendors=_as_list(filters.get('vendor')) + _as_list(filters.get('vendors')),
+        categories=_as_list(filters.get('category')) + _as_list(filters.get('categories')),
+        source_tabs=_as_list(filters.get('sourceTab')),
+        date_from=_date_only(filters.get('dateFrom') or date_range.get('start')),
+        date_to=_date_only(filters.get('dateTo') or date_range.get('end')),
+        amount_min=None if amount_min is None else float(amount_min),
+        amount_max=None if amount_max is None else float(amount_max),
+    )
+    return query, (filters.get('search') or '').strip().lower()
+
+
+def _matches_search(row: Dict[str, Any], search: str) -> bool:
+    # The fields the invoices route searches, as the cleaned CSV names them
+    haystack = ' '.join(filter(None, (row['Invoice_Number'], row['Vendor'], row['Subject'],
+                                      row['Category'], row['From_Email'])))
+    return search in haystack.lower()
+
+
+@dataclass
+class ExportJob:
+    """One ``invoice_export_jobs`` record."""
+
+    id: str
+    status: str = 'pending'
+    requested_filters: Dict[str, Any] = field(default_factory=dict)
+    row_count: Optional[int] = None
+    created_at: str = ''
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    file_path: Optional[str] = None
+    error_message: Optional[str] = None
+
+
+class JobQueue:
+    """Job records and export files under one exports directory."""
+
+    def __init__(self, exports_dir: Path = EXPORTS_DIR) -> None:
+        self.jobs_dir = exports_dir / 'jobs'
+        self.files_dir = exports_dir / 'files'
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f'{job_id}.json'
+
+    def save(self, job: ExportJob) -> None:
+        path = self._path(job.id)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(asdict(job), indent=2) + '\n', encoding='utf-8')
+        os.replace(tmp, path)
+
+    def load(self, job_id: str) -> ExportJob:
+        return ExportJob(**json.loads(self._path(job_id).read_text(encoding='utf-8')))
+
+    def enqueue(self, filters: Dict[str, Any]) -> ExportJob:
+        job_query(filters)  # reject filters no worker could apply
+        job = ExportJob(id=str(uuid.uuid4()), requested_filters=filters, created_at=_now())
+        self.save(job)
+        return job
+
+    def jobs(self) -> List[ExportJob]:
+        """Every job, oldest first."""
+        jobs = [self.load(path.stem) for path in self.jobs_dir.glob('*.json')]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+
+def export_rows(job: ExportJob, queue: JobQueue, csv_file: Path,
+                chunk_rows: int = CHUNK_ROWS) -> Path:
+    """Write the job's matching rows to its gzip CSV, saving progress per chunk."""
+    query, search = job_query(job.requested_filters)
+    as_of = as_of_now()
+    out = queue.files_dir / f'{job.id}.csv.gz'
+    tmp = out.with_name(out.name + '.tmp')
+    try:
+        with open_file(csv_file, 'r', newline='', encoding='utf-8') as src, \
+                gzip.open(tmp, 'wt', newline='', encoding='utf-8',
+                          compresslevel=COMPRESS_LEVEL) as dst:
+            reader = csv.DictReader(src)
+            fieldnames = list(reader.fieldnames or [])
+            writer = csv.writer(dst)
+            writer.writerow(fieldnames + ['Payment_Status'])
+            for chunk in _chunks(reader, chunk_rows):
+                matched = [[row[name] for name in fieldnames] + [payment_status(row, as_of)]
+                           for row in chunk
+                           if query.matches(row, as_of)
+                           and (not search or _matches_search(row, search))]
+                writer.writerows(matched)
+                job.row_count += len(matched)
+                queue.save(job)
+        os.replace(tmp, out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return out
+
+
+def run_job(exports_dir: Path, job_id: str, csv_file: Path, chunk_rows: int = CHUNK_ROWS) -> str:
+    """Process one queued job to completion (in a pool worker); returns its final status."""
+    queue = JobQueue(exports_dir)
+    job = queue.load(job_id)
+    job.status, job.started_at, job.row_count = 'processing', _now(), 0
+    queue.save(job)
+    try:
+        job.file_path = str(export_rows(job, queue, csv_file, chunk_rows))
+        job.status = 'completed'
+    except Exception as exc:
+        job.status, job.error_message = 'failed', f"{type(exc).__name__}: {exc}"
+    job.completed_at = _now()
+    queue.save(job)
+    return job.status
+
+
+class ExportWorker:
+    """Feeds pending jobs to a process pool of at most ``concurrency`` workers."""
+
+    def __init__(self, queue: JobQueue, csv_file: Path = CSV_FILE,
+                 concurrency: int = DEFAULT_CONCURRENCY, chunk_rows: int = CHUNK_ROWS) -> None:
+        self.queue = queue
+        self.csv_file = csv_file
+        self.concurrency = concurrency
+        self.chunk_rows = chunk_rows
+        self.running: Dict[str, Future] = {}
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs a dead runner left ``processing`` back in the queue."""
+        count = 0
+        for job in self.queue.jobs():
+            if job.status == 'processing':
+                job.status, job.started_at, job.row_count = 'pending', None, None
+                self.queue.save(job)
+                count += 1
+        return count
+
+    def _submit_pending(self, pool: ProcessPoolExecutor) -> None:
+        for job in self.queue.jobs():
+            if job.status == 'pending' and job.id not in self.running:
+                self.running[job.id] = pool.submit(run_job, self.queue.jobs_dir.parent, job.id,
+                                                   self.csv_file, self.chunk_rows)
+
+    def _reap(self) -> None:
+        for job_id, future in list(self.running.items()):
+            if future.done():
+                del self.running[job_id]
+                job = self.queue.load(job_id)
+                detail = job.file_path if job.status == 'completed' else job.error_message
+                print(f"Job {job_id} {job.status}: {job.row_count or 0:,} rows ({detail})")
+
+    def run(self, once: bool = False, interval: float = 2.0) -> None:
+        """Process queued jobs; with ``once``, stop when the queue is empty."""
+        requeued = self.requeue_interrupted()
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)")
+        with ProcessPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                self._submit_pending(pool)
+                if once and not self.running:
+                    return
+                time.sleep(interval if not once else 0.2)
+                self._reap()
+
+
+def _cli_filters(args: argparse.Namespace) -> Dict[str, Any]:
+    filters: Dict[str, Any] = json.loads(args.filters) if args.filters else {}
+    for key, value in (('status', args.status), ('vendor', args.vendor),
+                       ('categories', args.category), ('dateFrom', args.date_from),
+                       ('dateTo', args.date_to), ('amountMin', args.amount_min),
+                       ('amountMax', args.amount_max), ('search', args.search)):
+        if value not in (None, []):
+            filters[key] = value
+    return filters
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--exports-dir', type=Path, default=EXPORTS_DIR,
+                        help='job records and export files (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='queue an export job and print its record')
+    enqueue.add_argument('--status', action='append', default=[],
+                         choices=('pending', 'paid', 'overdue'))
+    enqueue.add_argument('--vendor', action='append', default=[])
+    enqueue.add_argument('--category', action='append', default=[])
+    enqueue.add_argument('--date-from', default=None, help='received on or after (YYYY-MM-DD)')
+    enqueue.add_argument('--date-to', default=None, help='received on or before (YYYY-MM-DD)')
+    enqueue.add_argument('--amount-min', type=float, default=None)
+    enqueue.add_argument('--amount-max', type=float, default=None)
+    enqueue.add_argument('--search', default=None)
+    enqueue.add_argument('--filters', default=None,
+                         help='requested_filters as JSON; the options above are merged in')
+
+    run = commands.add_parser('run', help='process queued jobs')
+    run.add_argument('--csv', type=Path, default=CSV_FILE,
+                     help='cleaned CSV to export from (default: %(default)s)')
+    run.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                     help='jobs exported at once (default: %(default)s)')
+    run.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                     help='rows filtered per chunk (default: %(default)s)')
+    run.add_argument('--once', action='store_true', help='exit once the queue is empty')
+    run.add_argument('--interval', type=float, default=2.0,
+                     help='seconds between queue checks (default: %(default)s)')
+
+    show = commands.add_parser('show', help='print one job record, or all of them')
+    show.add_argument('id', nargs='?', default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    queue = JobQueue(args.exports_dir)
+    if args.command == 'enqueue':
+        print(json.dumps(asdict(queue.enqueue(_cli_filters(args))), indent=2))
+    elif args.command == 'show':
+        if args.id:
+            print(json.dumps(asdict(queue.load(args.id)), indent=2))
+        else:
+            print(json.dumps([asdict(job) for job in queue.jobs()], indent=2))
+    else:
+        worker = ExportWorker(queue, args.csv, args.concurrency, args.chunk_rows)
+        try:
+            worker.run(once=args.once, interval=args.interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Disk-spilling external merge sort used by the streaming converter.
+
+Rows are buffered until their estimated in-memory size reaches the budget,
+then sorted and spilled to a temporary run file. Runs are merged lazily with
+``heapq.merge`` so only one row per run is resident while the output is
+consumed. Both the in-run sort and the merge are stable, so the result is
+identical to ``sorted(rows, key=key, reverse=reverse)``.
+"""
+
+from __future__ import annotations
+
+import heapq
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+# Upper bound on run files open at once; larger run counts are merged in passes.
+MAX_FAN_IN = 64
+_IO_BUFFER = 1024 * 1024
+
+
+def estimate_size(row: Any) -> int:
+    """Rough resident size of a row (container plus its values)."""
+    size = sys.getsizeof(row)
+    values = row.values() if isinstance(row, dict) else row
+    for value in values:
+        size += sys.getsizeof(value)
+    return size
+
+
+def write_run(rows: Iterable[Any], path: Path) -> Path:
+    """Pickle ``rows`` one after another into ``path``."""
+    # One self-contained pickle per row: a shared Pickler memo would grow with
+    # the run, and clearing it desyncs the reader's memo.
+    with open(path, 'wb', buffering=_IO_BUFFER) as f:
+        for row in rows:
+            pickle.dump(row, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def read_run(path: Path) -> Iterator[Any]:
+    """Stream rows back from a file written by :func:`write_run`."""
+    with open(path, 'rb', buffering=_IO_BUFFER) as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def external_sort(
+    rows: Iterable[Any],
+    key: Callable[[Any], Any],
+    reverse: bool = False,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    tmp_dir: Optional[str] = None,
+) -> Iterator[Any]:
+    """Yield ``rows`` sorted by ``key`` while holding at most ~``memory_budget`` bytes.
+
+    Inputs that fit in the budget are sorted in memory and never touch disk.
+    Temporary run files are removed when the generator is exhausted or closed.
+    """
+    buffer: List[Any] = []
+    used = 0
+
+    with tempfile.TemporaryDirectory(prefix='invoice-sort-', dir=tmp_dir) as workdir:
+        runs: List[Path] = []
+
+        def spill() -> None:
+            buffer.sort(key=key, reverse=reverse)
+            runs.append(write_run(buffer, Path(workdir) / f'run-{len(runs):05d}'))
+            buffer.clear()
+
+        for row in rows:
+            buffer.append(row)
+            used += estimate_size(row)
+            if used >= memory_budget:
+                spill()
+                used = 0
+
+        if not runs:
+            buffer.sort(key=key, reverse=reverse)
+            yield from buffer
+            return
+        if buffer:
+            spill()
+
+        # Collapse leading runs until the final merge fits under the fan-in limit.
+        # Merging a prefix and putting it back in front keeps the sort stable.
+        passes = 0
+        while len(runs) > MAX_FAN_IN:
+            head, runs = runs[:MAX_FAN_IN], runs[MAX_FAN_IN:]
+            merged = heapq.merge(*(read_run(p) for p in head), key=key, reverse=reverse)
+            runs.insert(0, write_run(merged, Path(workdir) / f'merge-{passes:05d}'))
+            for path in head:
+                path.unlink()
+            passes += 1
+
+        yield from heapq.merge(*(read_run(p) for p in runs), key=key, reverse=reverse)
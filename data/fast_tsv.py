@@ -0,0 +1,145 @@
+"""Chunked binary reader for the tab-separated mailbox export.
+
+``csv.DictReader`` decodes the whole file, runs every character through the
+csv state machine and builds a 31-key dict per row, although the converter
+only reads a dozen columns. The mailbox export never quotes fields, so this
+reader instead:
+
+* reads the file in large binary chunks and splits them into lines and
+  fields with ``bytes.split``;
+* decodes only the projected columns of each row, straight into a tuple; and
+* hands any line containing a ``"`` to the ``csv`` module, which pulls as
+  many following lines as a quoted field spans, so a quoted export still
+  parses exactly as ``DictReader`` would.
+
+Values follow ``DictReader``'s conventions: a column missing from the header
+reads as ``''``, a field missing from a short row as ``None``, blank lines
+are skipped and ``\\r\\n``/``\\r`` line endings are read like ``open()``'s
+universal newlines. Columns that aren't projected are never decoded, so
+invalid UTF-8 in them is not an error here.
+
+``convert_invoices.py --parser fast`` plugs it in behind every TSV mode;
+``benchmark_conversion.py --parsers csv fast`` compares the two.
+"""
+
+from __future__ import annotations
+
+import csv
+from itertools import chain
+from operator import itemgetter
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from compressed_io import open_file
+
+CHUNK_SIZE = 1024 * 1024
+
+Row = Tuple[Optional[str], ...]
+
+_decode = bytes.decode
+
+
+def _chunk_lines(f: BinaryIO, end: Optional[int], chunk_size: int) -> Iterator[List[bytes]]:
+    """Complete lines of ``f`` from its position up to byte ``end``, one list
+    per chunk read, without terminators."""
+    remaining = None if end is None else end - f.tell()
+    pending = b''
+    while True:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = f.read(size) if size > 0 else b''
+        if not chunk:
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        data = pending + chunk
+        carry = b''
+        if b'\r' in data:
+            if data.endswith(b'\r'):
+                # The matching \n may start the next chunk
+                data, carry = data[:-1], b'\r'
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        lines = data.split(b'\n')
+        pending = lines.pop() + carry
+        yield lines
+    if pending:
+        yield pending.replace(b'\r\n', b'\n').replace(b'\r', b'\n').split(b'\n')
+
+
+def _text_lines(first: bytes, lines: Iterator[bytes]) -> Iterator[str]:
+    yield _decode(first) + '\n'
+    for line in lines:
+        yield _decode(line) + '\n'
+
+
+def _getter(picks: Sequence[int]) -> Callable[[List], tuple]:
+    if len(picks) == 1:
+        pick = picks[0]
+        return lambda fields: (fields[pick],)
+    if not picks:
+        return lambda fields: ()
+    return itemgetter(*picks)
+
+
+class TsvReader:
+    """Projected rows of one TSV file (or a byte range of it).
+
+    ``fieldnames`` supplies the columns when reading a range that doesn't
+    start with the header; otherwise the first line is the header.
+    """
+
+    def __init__(self, f: BinaryIO, fieldnames: Optional[Sequence[str]] = None,
+                 end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> None:
+        # One flat iterator (chained in C) that the csv fallback can pull from too
+        self._lines = chain.from_iterable(_chunk_lines(f, end, chunk_size))
+        if fieldnames is None:
+            header = next(self._lines, b'')
+            fieldnames = next(csv.reader([_decode(header)], delimiter='\t'), [])
+        self.fieldnames: List[str] = list(fieldnames)
+        # Last occurrence wins for repeated names, as in DictReader's dicts
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.fieldnames)}
+
+    def rows(self, columns: Sequence[str]) -> Iterator[Row]:
+        """Yield one tuple per row holding ``columns`` in that order."""
+        width = len(self.fieldnames)
+        # Absent columns point at a padding slot past the last field
+        getter = _getter([self.index.get(name, width) for name in columns])
+
+        def project(fields: List[Optional[str]]) -> Row:
+            if len(fields) < width:
+                fields = fields + [None] * (width - len(fields))
+            elif len(fields) > width:
+                fields = fields[:width]
+            fields.append('')
+            return getter(fields)
+
+        lines = self._lines
+        for line in lines:
+            if not line:
+                continue
+            if b'"' in line:
+                # The csv module reads only as far as this record extends
+                fields = next(csv.reader(_text_lines(line, lines), delimiter='\t'))
+                yield project(fields)
+                continue
+            parts = line.split(b'\t')
+            if len(parts) == width:
+                parts.append(b'')
+                yield tuple(map(_decode, getter(parts)))
+            else:
+                yield project([_decode(part) for part in parts])
+
+
+def iter_dicts(input_file: Path, columns: Sequence[str], fieldnames: Optional[Sequence[str]] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Dict[str, Optional[str]]]:
+    """``DictReader``-style rows holding only the ``columns`` the header has.
+
+    With ``start``/``end`` only that byte range is read; ``start`` must fall
+    on a line boundary and ``fieldnames`` then names the columns.
+    """
+    with open_file(input_file, 'rb') as f:
+        if start is not None:
+            f.seek(start)
+        reader = TsvReader(f, fieldnames, end)
+        present = [name for name in columns if name in reader.index]
+        for values in reader.rows(present):
+            yield dict(zip(present, values))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Ingest the mailbox TSV and the invoice workbooks in one concurrent pass.
+
+Invoice rows reach us through several channels: the mailbox export
+(``invoice_data_since_2024``), ``current_invoices.xlsx`` and the dated
+OneDrive drops in ``onedrive/``. Every workflow tab carries the same 31
+columns as the mailbox export, so each source is one task in a process
+pool that streams its rows through ``convert_invoices.transform_row``:
+workbooks are opened read-only and each worker parses only its own sheet.
+
+The parent then deduplicates across sources on ``message_id`` in a fixed
+source order (the TSV first, then each workbook's tabs left to right), so the
+result doesn't depend on which worker finishes first, and writes one cleaned
+CSV, newest first, with a ``sourceTab`` column naming where each row came
+from: ``mailbox``, or the workbook stem and sheet title such as
+``current_invoices/Invoices``. Sheets without invoice columns (such as
+``Notes``) and files that aren't workbooks (a failed OneDrive download saves
+SharePoint's HTML sign-in page) are reported and skipped.
+
+Usage:
+    python data/ingest_sources.py [--tsv PATH] [--workbook PATH ...]
+        [--output PATH] [--summary PATH] [--workers N]
+
+Dependencies:
+    pip install openpyxl
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from compressed_io import open_file, resolve
+from convert_invoices import (
+    DATA_DIR,
+    DEFAULT_MEMORY_BUDGET_MB,
+    FIELDNAMES,
+    INPUT_FILE,
+    ConversionStats,
+    accumulate_row,
+    message_key,
+    print_dedup_summary,
+    print_summary,
+    received_date_key,
+    transform_row,
+    write_csv,
+)
+from external_sort import external_sort, read_run, write_run
+
+WORKBOOK_FILE = DATA_DIR / 'current_invoices.xlsx'
+ONEDRIVE_DIR = DATA_DIR / 'onedrive'
+OUTPUT_FILE = DATA_DIR / 'invoices_merged.csv'
+
+MAILBOX_TAB = 'mailbox'
+SOURCE_FIELD = 'sourceTab'
+MERGED_FIELDNAMES = FIELDNAMES + [SOURCE_FIELD]
+# A sheet is a workflow tab when its header has these export columns.
+REQUIRED_COLUMNS = ('message_id', 'invoice_number')
+
+
+@dataclass(frozen=True)
+class Source:
+    """One unit of work: the mailbox TSV, or a single sheet of a workbook."""
+
+    path: Path
+    sheet: Optional[str] = None
+
+    @property
+    def tab(self) -> str:
+        # Qualified by workbook: the current workbook and a OneDrive drop
+        # share sheet titles.
+        return f"{self.path.stem}/{self.sheet}" if self.sheet is not None else MAILBOX_TAB
+
+    def describe(self) -> str:
+        return f"{self.path.name} [{self.sheet}]" if self.sheet is not None else self.path.name
+
+
+def _load_workbook(path: Path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise RuntimeError("Reading Excel workbooks needs openpyxl: pip install openpyxl") from exc
+    return load_workbook(path, read_only=True, data_only=True)
+
+
+def workbook_sources(path: Path) -> List[Source]:
+    """One source per sheet; raises ``zipfile.BadZipFile`` for non-workbooks."""
+    workbook = _load_workbook(path)
+    try:
+        return [Source(path, name) for name in workbook.sheetnames]
+    finally:
+        workbook.close()
+
+
+def latest_onedrive_drop(directory: Path = ONEDRIVE_DIR) -> Optional[Path]:
+    """Newest ``YYYY-MM-DD-*.xlsx`` download, if any."""
+    drops = sorted(path for path in directory.glob('[0-9][0-9][0-9][0-9]-*.xlsx'))
+    return drops[-1] if drops else None
+
+
+def cell_text(value: Any) -> str:
+    """Render a workbook cell the way the mailbox export writes the same field."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if value.time() == time(0):
+            return value.strftime('%Y-%m-%d')
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        # Excel keeps every number as a float; 8016.0 is invoice "8016"
+        return str(int(value))
+    return str(value)
+
+
+def sheet_rows(path: Path, sheet: str) -> Iterator[Dict[str, Any]]:
+    """Stream one sheet as TSV-style dicts; yields nothing for non-invoice sheets."""
+    workbook = _load_workbook(path)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = [cell_text(value).strip() for value in next(rows, ())]
+        if not all(column in header for column in REQUIRED_COLUMNS):
+            return
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield {name: cell_text(value) for name, value in zip(header, values) if name}
+    finally:
+        workbook.close()
+
+
+def tsv_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with open_file(path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f, delimiter='\t')
+
+
+def _convert_source(source: Source, run_path: Path,
+                    run_timestamp: Optional[str] = None) -> Tuple[int, bool]:
+    """Worker: transform one source into a run file of (key, row, failed fields).
+
+    Returns the number of rows read and whether the source had invoice columns.
+    """
+    scratch = ConversionStats()
+    if run_timestamp is not None:
+        scratch.run_timestamp = run_timestamp
+    rows = tsv_rows(source.path) if source.sheet is None else sheet_rows(source.path, source.sheet)
+    count = 0
+
+    def converted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            message_id = row.get('message_id', '')
+            key = message_key(message_id) if message_id else None
+            scratch.parse_failures.clear()
+            output_row = transform_row(row, scratch)
+            output_row[SOURCE_FIELD] = source.tab
+            yield key, output_row, tuple(scratch.parse_failures)
+
+    write_run(converted(), run_path)
+    return count, source.sheet is None or count > 0
+
+
+def ingest(
+    sources: List[Source],
+    output_file: Path,
+    workers: Optional[int] = None,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    tmp_dir: Optional[str] = None,
+) -> Tuple[ConversionStats, Dict[str, Dict[str, int]]]:
+    """Convert every source concurrently and write one deduplicated CSV.
+
+    Returns the stats and, per ``sourceTab``, how many rows were read and kept.
+    """
+    stats = ConversionStats()
+    per_tab: Dict[str, Dict[str, int]] = {}
+    workers = workers or min(len(sources), os.cpu_count() or 1) or 1
+    timer = stats.timer
+
+    print(f"Converting {len(sources)} sources with {workers} workers...")
+    with tempfile.TemporaryDirectory(prefix='invoice-ingest-', dir=tmp_dir) as workdir:
+        run_paths = [Path(workdir) / f'source-{i:03d}' for i in range(len(sources))]
+        with timer.stage('sources'), ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_convert_source, source, path, stats.run_timestamp)
+                       for source, path in zip(sources, run_paths)]
+            results = [future.result() for future in futures]
+
+        used = []
+        for source, path, (count, has_invoices) in zip(sources, run_paths, results):
+            if not has_invoices:
+                print(f"  skipped {source.describe()}: no invoice columns")
+                continue
+            print(f"  {source.describe()}: {count} rows")
+            used.append((source, path))
+
+        seen_message_ids = set()
+
+        def unique_rows():
+            # Sources in their fixed order so the first occurrence wins, as in
+            # a sequential run.
+            for source, path in used:
+                counts = per_tab.setdefault(source.tab, {'read': 0, 'kept': 0})
+                for key, output_row, failures in read_run(path):
+                    stats.original += 1
+                    counts['read'] += 1
+                    if key is not None:
+                        if key in seen_message_ids:
+                            stats.duplicates += 1
+                            continue
+                        seen_message_ids.add(key)
+                    counts['kept'] += 1
+                    accumulate_row(output_row, stats)
+                    for field_name in failures:
+                        stats.parse_failures[field_name] += 1
+                    yield output_row
+
+        sorted_rows = timer.timed('sort', external_sort(
+            timer.timed('dedup', unique_rows()),
+            key=received_date_key,
+            reverse=True,
+            memory_budget=memory_budget_mb * 1024 * 1024,
+            tmp_dir=workdir,
+        ))
+        print(f"Writing merged data to: {output_file}")
+        with timer.stage('write'):
+            stats.written = write_csv(output_file, sorted_rows, fieldnames=MERGED_FIELDNAMES)
+
+    print_dedup_summary(stats)
+    return stats, per_tab
+
+
+def collect_sources(tsv: Optional[Path], workbooks: List[Path]) -> List[Source]:
+    """The TSV plus every sheet of every readable workbook, in that order."""
+    sources = [Source(tsv)] if tsv is not None else []
+    for path in workbooks:
+        try:
+            sources.extend(workbook_sources(path))
+        except (zipfile.BadZipFile, OSError) as exc:
+            print(f"Skipping {path}: not a readable Excel workbook ({exc})")
+    return sources
+
+
+def write_summary(summary_file: Path, stats: ConversionStats,
+                  per_tab: Dict[str, Dict[str, int]]) -> None:
+    """Write the ``processed/summary-DATE.json`` shape, plus per-tab kept counts."""
+    summary = {
+        'totalInvoices': stats.written,
+        'totalAmount': round(stats.total_amount, 2),
+        'bySourceTab': {tab: counts['kept'] for tab, counts in per_tab.items()},
+        'duplicatesBySourceTab': {tab: counts['read'] - counts['kept']
+                                  for tab, counts in per_tab.items()},
+        'processedAt': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+    }
+    with open_file(summary_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(summary, indent=2) + '\n')
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tsv', type=Path, default=INPUT_FILE,
+                        help='mailbox TSV export (default: %(default)s)')
+    parser.add_argument('--no-tsv', action='store_true', help='ingest workbooks only')
+    parser.add_argument('--workbook', type=Path, action='append', default=None,
+                        help='workbook to ingest; repeatable (default: current_invoices.xlsx '
+                             'and the newest OneDrive drop)')
+    parser.add_argument('--output', type=Path, default=OUTPUT_FILE,
+                        help='merged CSV to write (default: %(default)s)')
+    parser.add_argument('--summary', type=Path, default=None,
+                        help='also write a summary JSON with per-source counts')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per source, up to CPU count)')
+    parser.add_argument('--memory-budget-mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help='sort buffer size before spilling to disk')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='directory for run files (default: system temp)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    workbooks = args.workbook
+    if workbooks is None:
+        workbooks = [path for path in (WORKBOOK_FILE, latest_onedrive_drop()) if path]
+
+    sources = collect_sources(None if args.no_tsv else resolve(args.tsv), workbooks)
+    if not sources:
+        raise RuntimeError("Nothing to ingest: no TSV and no readable workbooks")
+
+    stats, per_tab = ingest(sources, args.output, args.workers,
+                            args.memory_budget_mb, args.tmp_dir)
+    if stats.original:
+        print_summary(stats)
+    print("\nRows by sourceTab (kept / read):")
+    for tab, counts in per_tab.items():
+        print(f"  {tab}: {counts['kept']} / {counts['read']}")
+    if args.summary:
+        write_summary(args.summary, stats, per_tab)
+        print(f"\nSummary written to: {args.summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Date normalisation for the invoice converter.
+
+Every date the dashboard sees is rendered as ``YYYY-MM-DDTHH:MM:SS.000Z``.
+The mailbox export mostly uses ``4-Sep-25``, but other drops carry ISO dates,
+Australian ``dd/mm/yyyy`` and raw Excel serial numbers, so each layout has a
+hand-rolled fast path instead of going through ``datetime.strptime``.
+
+Exports contain only a few hundred distinct date strings, so results are
+memoised in a bounded LRU cache and almost every call is a dictionary hit.
+Unparseable values are returned unchanged, as the converter always did;
+:func:`parse_date` additionally reports whether parsing succeeded.
+:func:`epoch_seconds` turns a normalised date back into an integer sort key.
+"""
+
+from __future__ import annotations
+
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+
+DATE_CACHE_SIZE = 4096
+
+MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+          'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Excel's day zero (accounts for the 1900 leap-year bug for serials > 60).
+_EXCEL_EPOCH = date(1899, 12, 30)
+# Serials outside this range are more likely amounts or ids than dates.
+_EXCEL_SERIAL_MIN = 20000   # 1954-10-03
+_EXCEL_SERIAL_MAX = 80000   # 2119-01-10
+
+
+def _valid(year: int, month: int, day: int) -> bool:
+    if not 1 <= month <= 12 or day < 1:
+        return False
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return day <= 29
+    return day <= _DAYS_IN_MONTH[month - 1]
+
+
+def _expand_year(year: int) -> int:
+    # Assume 20xx for two-digit years
+    return 2000 + year if year < 100 else year
+
+
+def _render(year: int, month: int, day: int, time: str = '00:00:00') -> str:
+    return f'{year:04d}-{month:02d}-{day:02d}T{time}.000Z'
+
+
+def _parse_day_month_name(text: str):
+    """``4-Sep-25`` / ``04-Sept-2025``."""
+    parts = text.split('-')
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[2].isdigit():
+        return None
+    month = MONTHS.get(parts[1][:3].lower())
+    if month is None:
+        return None
+    return _expand_year(int(parts[2])), month, int(parts[0])
+
+
+def _parse_iso(text: str):
+    """``2025-09-04`` with an optional ``T``/space separated ``HH:MM[:SS][.fff][Z]`` time.
+
+    Anything after the clock other than fractional seconds and a ``Z`` (a
+    ``+10:00`` offset, stray text) is rejected rather than silently dropped.
+    """
+    if len(text) < 10 or text[4] != '-' or text[7] != '-':
+        return None
+    y, m, d = text[0:4], text[5:7], text[8:10]
+    if not (y.isdigit() and m.isdigit() and d.isdigit()):
+        return None
+    time = '00:00:00'
+    rest = text[10:]
+    if rest:
+        if rest[0] not in 'T ':
+            return None
+        clock = rest[1:]
+        if clock.endswith('Z'):
+            clock = clock[:-1]
+        if len(clock) > 8 and clock[8] == '.' and clock[9:].isdigit():
+            clock = clock[:8]
+        if not (len(clock) in (5, 8) and clock[2] == ':' and clock[:2].isdigit()
+                and clock[3:5].isdigit() and int(clock[:2]) < 24 and int(clock[3:5]) < 60):
+            return None
+        seconds = '00'
+        if len(clock) == 8:
+            seconds = clock[6:8]
+            if clock[5] != ':' or not seconds.isdigit() or int(seconds) > 59:
+                return None
+        time = f'{clock[:2]}:{clock[3:5]}:{seconds}'
+    return int(y), int(m), int(d), time
+
+
+def _parse_slashed(text: str):
+    """Australian ``dd/mm/yyyy`` (or ``d/m/yy``)."""
+    parts = text.split('/')
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return None
+    return _expand_year(int(parts[2])), int(parts[1]), int(parts[0])
+
+
+def _parse_excel_serial(text: str):
+    """Excel serial day numbers such as ``45904`` or ``45904.0``."""
+    whole, _, frac = text.partition('.')
+    if not whole.isdigit() or (frac and not frac.isdigit()):
+        return None
+    serial = int(whole)
+    if not _EXCEL_SERIAL_MIN <= serial <= _EXCEL_SERIAL_MAX:
+        return None
+    value = _EXCEL_EPOCH + timedelta(days=serial)
+    return value.year, value.month, value.day
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str) -> Tuple[str, bool]:
+    """Return ``(normalised, ok)``; ``ok`` is False for non-empty unparseable input."""
+    if not date_str:
+        return '', True
+    text = date_str.strip()
+
+    if '-' in text:
+        parsed = _parse_day_month_name(text) if not text[:4].isdigit() else _parse_iso(text)
+    elif '/' in text:
+        parsed = _parse_slashed(text)
+    else:
+        parsed = _parse_excel_serial(text)
+
+    if parsed is None:
+        return date_str, False
+    year, month, day = parsed[:3]
+    if not _valid(year, month, day):
+        return date_str, False
+    return _render(year, month, day, *parsed[3:]), True
+
+
+def normalise_date(date_str) -> str:
+    """Render a raw export date as an ISO timestamp, or return it unchanged."""
+    return parse_date(date_str)[0]
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def is_calendar_day(day: str) -> bool:
+    """Whether ``YYYY-MM-DD`` names a real day (``2025-02-30`` does not)."""
+    if len(day) != 10 or day[4] != '-' or day[7] != '-':
+        return False
+    year, month, date = day[0:4], day[5:7], day[8:10]
+    if not (year.isdigit() and month.isdigit() and date.isdigit()):
+        return False
+    return int(year) >= 1 and _valid(int(year), int(month), int(date))
+
+
+def is_iso_date(value: str) -> bool:
+    """Whether ``value`` is a normalised ``YYYY-MM-DDT...`` date naming a real day.
+
+    :func:`parse_date` passes unparseable input through, so an ISO-shaped
+    value can still name a day that does not exist (``2025-13-01``).
+    """
+    return len(value) >= 10 and is_calendar_day(value[:10])
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def epoch_seconds(rendered: str) -> Optional[int]:
+    """Unix seconds of a normalised ``YYYY-MM-DDTHH:MM:SS.000Z`` date, else ``None``."""
+    if (len(rendered) < 19 or rendered[4] != '-' or rendered[7] != '-' or rendered[10] != 'T'
+            or rendered[13] != ':' or rendered[16] != ':'):
+        return None
+    fields = (rendered[0:4], rendered[5:7], rendered[8:10],
+              rendered[11:13], rendered[14:16], rendered[17:19])
+    if not all(part.isdigit() for part in fields):
+        return None
+    year, month, day, hour, minute, second = map(int, fields)
+    if not _valid(year, month, day) or hour > 23 or minute > 59 or second > 59:
+        return None
+    return calendar.timegm((year, month, day, hour, minute, second))
@@ -0,0 +1,125 @@
+"""Hash-indexed detection of the same invoice arriving in several emails.
+
+``message_id`` dedup only removes the same email exported twice. Xero sends
+the original invoice and then reminders, each a different message carrying
+the same invoice, so without this stage ``INV-1264`` from Align.Build is
+counted once per email in ``total_amount``.
+
+Each row is keyed on its normalised (``supplier_abn`` or supplier name,
+``invoice_number``, ``total`` in cents), hashed to a 16-byte digest, and
+looked up in a dict: one O(1) probe per row and no pairwise comparisons.
+Memory grows with the number of distinct invoices, not rows:
+
+``drop``
+    the first occurrence wins, later ones are skipped before they are
+    transformed (a set of digests)
+``flag``
+    every row is kept; later occurrences get the first one's ``Email_ID``
+    in an extra ``Duplicate_Of`` column (digest -> first ``Email_ID``)
+``keep-latest``
+    the last occurrence in export order wins. Rows are tagged with a
+    sequence number and :meth:`InvoiceDuplicates.keep_latest` drops the
+    superseded ones after the sort, so streaming modes still write in one
+    pass (digest -> latest sequence number)
+
+Rows without an invoice number are never treated as duplicates.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+POLICIES = ('drop', 'flag', 'keep-latest')
+DUPLICATE_FIELD = 'Duplicate_Of'
+# Private tag carried by rows through the sort under ``keep-latest``
+_SEQUENCE_FIELD = '_duplicate_seq'
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_NON_DIGIT = re.compile(r'\D+')
+
+
+def _normalise(text: Any) -> str:
+    return _NON_ALNUM.sub('', str(text or '').casefold())
+
+
+def invoice_key(row: Dict[str, Any], amount: float) -> Optional[bytes]:
+    """Digest of the row's supplier, invoice number and ``amount`` in cents."""
+    number = _normalise(row.get('invoice_number'))
+    if not number:
+        return None
+    abn = _NON_DIGIT.sub('', str(row.get('supplier_abn') or ''))
+    supplier = f'abn:{abn}' if abn else f"name:{_normalise(row.get('supplier_name'))}"
+    cents = round(amount * 100)
+    return hashlib.blake2b(f'{supplier}\x1f{number}\x1f{cents}'.encode('utf-8'),
+                           digest_size=16).digest()
+
+
+class InvoiceDuplicates:
+    """Single-pass duplicate index applying one of :data:`POLICIES`."""
+
+    def __init__(self, policy: str) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown duplicate policy {policy!r}; expected one of {POLICIES}")
+        self.policy = policy
+        self.count = 0
+        self.amount = 0.0
+        self._index: Dict[bytes, Any] = {}
+        self._sequence = 0
+
+    @property
+    def fieldnames_extra(self) -> Tuple[str, ...]:
+        return (DUPLICATE_FIELD,) if self.policy == 'flag' else ()
+
+    def admit(self, key: Optional[bytes], amount: float) -> bool:
+        """Whether a row should be transformed at all (False only under ``drop``)."""
+        if key is None or self.policy != 'drop':
+            return True
+        if key in self._index:
+            self.count += 1
+            self.amount += amount
+            return False
+        self._index[key] = None
+        return True
+
+    def annotate(self, key: Optional[bytes], output_row: Dict[str, Any]) -> None:
+        """Record an admitted row; flags or tags it depending on the policy."""
+        if self.policy == 'flag':
+            first = self._index.get(key) if key is not None else None
+            output_row[DUPLICATE_FIELD] = first or ''
+            if key is None:
+                return
+            if first is None:
+                self._index[key] = output_row['Email_ID'] or '?'
+            else:
+                self.count += 1
+                self.amount += output_row['Amount']
+        elif self.policy == 'keep-latest' and key is not None:
+            self._sequence += 1
+            if key in self._index:
+                self.count += 1
+                self.amount += output_row['Amount']
+            self._index[key] = self._sequence
+            output_row[_SEQUENCE_FIELD] = (key, self._sequence)
+
+    def keep_latest(self, rows: Iterable[Dict[str, Any]],
+                    on_superseded: Callable[[Dict[str, Any]], None]) -> Iterator[Dict[str, Any]]:
+        """Drop rows a later occurrence superseded; strips the private tag.
+
+        ``on_superseded`` is called for each dropped row (to back out stats).
+        A no-op pass-through for the other policies.
+        """
+        if self.policy != 'keep-latest':
+            yield from rows
+            return
+        for row in rows:
+            tag = row.pop(_SEQUENCE_FIELD, None)
+            if tag is not None and self._index[tag[0]] != tag[1]:
+                on_superseded(row)
+                continue
+            yield row
+
+    def describe(self) -> str:
+        action = {'drop': 'dropped', 'flag': 'flagged', 'keep-latest': 'superseded'}[self.policy]
+        return f"{self.count} {action} (${self.amount:,.2f})"
@@ -0,0 +1,206 @@
+"""In-memory column index over an invoice store (optional, needs NumPy).
+
+SQLite's covering indexes make selective queries cheap, but a filter that
+matches most of the table (no filter at all, or "every overdue invoice")
+still has to count, sum and group every matching index entry, which takes
+around a second per million invoices. A long-running reader can instead load
+the filter and facet columns once into dictionary-encoded arrays:
+
+* each filter is a vectorised comparison on integer codes (strings are
+  encoded in sorted order, so date ranges are code ranges);
+* facet counts are ``np.bincount`` over the matching codes; and
+* each sort order is computed once and cached, so a page is the first
+  ``offset + limit`` matches in that order.
+
+:class:`~invoice_store.InvoiceStore` uses it after ``load_index()`` and
+fetches only the rows of the page from SQLite, so results are the same as
+the pure SQL path. The index is a snapshot: reload it after the store
+changes.
+
+Dependencies:
+    pip install numpy
+"""
+
+from __future__ import annotations
+
+import bisect
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from invoice_dates import is_iso_date
+
+# Payment statuses as codes in string order, so sorting codes sorts names
+OVERDUE, PAID, PENDING = 0, 1, 2
+PAYMENT_STATUSES = ('overdue', 'paid', 'pending')
+
+
+class _Encoded:
+    """A text column as int32 codes into its sorted distinct values."""
+
+    def __init__(self, values: Sequence[Optional[str]]) -> None:
+        lookup: Dict[str, int] = {}
+        first_codes = np.fromiter((lookup.setdefault(value or '', len(lookup)) for value in values),
+                                  dtype=np.int32, count=len(values))
+        self.values: List[str] = sorted(lookup)
+        rank = np.empty(len(self.values), dtype=np.int32)
+        for code, value in enumerate(self.values):
+            rank[lookup[value]] = code
+        self.codes = rank[first_codes]
+
+    def isin(self, wanted: Sequence[str]) -> np.ndarray:
+        codes = [self.code(value) for value in wanted]
+        codes = [code for code in codes if code is not None]
+        if not codes:
+            return np.zeros(len(self.codes), dtype=bool)
+        if len(codes) == 1:
+            return self.codes == codes[0]
+        return np.isin(self.codes, codes)
+
+    def code(self, value: str) -> Optional[int]:
+        i = bisect.bisect_left(self.values, value)
+        return i if i < len(self.values) and self.values[i] == value else None
+
+    def below(self, value: str) -> np.ndarray:
+        """Rows whose value sorts before ``value``."""
+        return self.codes < bisect.bisect_left(self.values, value)
+
+
+class FacetIndex:
+    """Filter and facet columns of every stored invoice, in ``seq`` order."""
+
+    def __init__(self, rows: List[Tuple[Any, ...]]) -> None:
+        columns = list(zip(*rows)) if rows else [()] * 8
+        seq, received, vendor, category, status_class, due, amount, source_tab = columns
+        self.size = len(rows)
+        self.seq = np.asarray(seq, dtype=np.int64)
+        self.received = _Encoded(received)
+        self.vendor = _Encoded(vendor)
+        self.category = _Encoded(category)
+        self.source_tab = _Encoded(source_tab)
+        self.due = _Encoded(due)
+        status = _Encoded(status_class)
+        self.paid = status.isin(['paid'])
+        self.open = status.isin(['open'])
+        self.amount = np.array([np.nan if value is None else value for value in amount],
+                               dtype=np.float64)
+        iso = np.array([is_iso_date(value) for value in self.received.values], dtype=bool)
+        self.received_iso = iso[self.received.codes] if self.size else np.zeros(0, dtype=bool)
+        # Newest first, then insertion order: the CSV's order and every tie-break
+        self.recent = np.lexsort((self.seq, -self.received.codes.astype(np.int64)))
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> 'FacetIndex':
+        rows = conn.execute(
+            'SELECT seq, received_date, vendor, category, status_class, due_date, amount, '
+            'source_tab FROM invoices ORDER BY seq').fetchall()
+        return cls(rows)
+
+    def overdue(self, as_of: str) -> np.ndarray:
+        return self.open & self.due.below(as_of)
+
+    def mask(self, query: Any, as_of: str) -> np.ndarray:
+        """Rows matching an :class:`~invoice_store.InvoiceQuery`."""
+        mask = np.ones(self.size, dtype=bool)
+        if query.vendors:
+            mask &= self.vendor.isin(query.vendors)
+        if query.categories:
+            mask &= self.category.isin(query.categories)
+        if query.source_tabs:
+            mask &= self.source_tab.isin(query.source_tabs)
+        if query.statuses:
+            overdue = self.overdue(as_of)
+            wanted = np.zeros(self.size, dtype=bool)
+            if 'paid' in query.statuses:
+                wanted |= self.paid
+            if 'overdue' in query.statuses:
+                wanted |= overdue
+            if 'pending' in query.statuses:
+                wanted |= ~self.paid & ~overdue
+            mask &= wanted
+        date_from, date_to = query.received_bounds()
+        if date_from:
+            mask &= ~self.received.below(date_from)
+        if date_to:
+            mask &= self.received.below(date_to)
+        if query.amount_min is not None:
+            mask &= self.amount >= query.amount_min
+        if query.amount_max is not None:
+            mask &= self.amount <= query.amount_max
+        return mask
+
+    def payment_status(self, as_of: str) -> np.ndarray:
+        codes = np.full(self.size, PENDING, dtype=np.int8)
+        codes[self.paid] = PAID
+        codes[self.overdue(as_of)] = OVERDUE
+        return codes
+
+    def _order(self, column: str, descending: bool, as_of: str) -> np.ndarray:
+        """Row positions sorted by ``column``, ties in :attr:`recent` order."""
+        if column == 'received_date':
+            if descending:
+                return self.recent
+            key = (self.seq, self.received.codes)
+            return self._orders.setdefault((column, descending), np.lexsort(key))
+        if column == 'payment_status':
+            # Depends on the clock, so never cached
+            key = self.payment_status(as_of).astype(np.int64)
+            return self.recent[np.argsort(-key[self.recent] if descending else key[self.recent],
+                                          kind='stable')]
+        order = self._orders.get((column, descending))
+        if order is None:
+            if column == 'amount':
+                # SQL puts NULL amounts first ascending and last descending
+                key = -self.amount if descending else np.where(np.isnan(self.amount), -np.inf,
+                                                               self.amount)
+            else:
+                codes = {'vendor': self.vendor, 'due_date': self.due}[column].codes
+                key = -codes.astype(np.int64) if descending else codes
+            order = self.recent[np.argsort(key[self.recent], kind='stable')]
+            self._orders[(column, descending)] = order
+        return order
+
+    def page(self, mask: np.ndarray, column: str, descending: bool, as_of: str,
+             offset: int, limit: int) -> List[int]:
+        """``seq`` of the matching rows ``offset .. offset + limit`` in sort order."""
+        order = self._order(column, descending, as_of)
+        hits = order[mask[order]]
+        return self.seq[hits[offset:offset + limit]].tolist()
+
+    def summary(self, mask: np.ndarray, as_of: str) -> Tuple[int, float, float, float, int]:
+        """Count, total, paid and overdue amounts and pending count of the matches."""
+        overdue = self.overdue(as_of)
+        amount = self.amount
+        return (int(mask.sum()),
+                float(np.nansum(amount[mask])),
+                float(np.nansum(amount[mask & self.paid])),
+                float(np.nansum(amount[mask & overdue])),
+                int((mask & ~self.paid & ~overdue).sum()))
+
+    def _grouped(self, encoded: _Encoded, mask: np.ndarray) -> List[Tuple[str, int]]:
+        """``(value, count)`` of the matches, in order of first appearance."""
+        codes = encoded.codes[mask]
+        counts = np.bincount(codes, minlength=len(encoded.values))
+        first = np.full(len(encoded.values), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first, codes, self.seq[mask])
+        present = np.flatnonzero(counts)
+        present = present[np.argsort(first[present], kind='stable')]
+        return [(encoded.values[code], int(counts[code])) for code in present]
+
+    def facets(self, mask: np.ndarray, as_of: str) -> Dict[str, Any]:
+        """Raw facet values; :meth:`InvoiceStore.facets` shapes them."""
+        statuses = np.bincount(self.payment_status(as_of)[mask], minlength=3)
+        amounts = self.amount[mask]
+        amounts = amounts[~np.isnan(amounts)]
+        dated = self.received.codes[mask & self.received_iso]
+        return {
+            'statuses': {name: int(count) for name, count in zip(PAYMENT_STATUSES, statuses)},
+            'categories': self._grouped(self.category, mask),
+            'vendors': self._grouped(self.vendor, mask),
+            'amount_range': (float(amounts.min()), float(amounts.max())) if amounts.size
+                            else (None, None),
+            'date_range': ((self.received.values[dated.min()], self.received.values[dated.max()])
+                           if dated.size else (None, None)),
+        }
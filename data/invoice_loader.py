@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""Bulk loader from the cleaned CSV into the dashboard's ``invoices`` table.
+
+The Next.js API reads invoices from Supabase (``SUPABASE_INVOICES_TABLE``,
+``invoices`` by default), but nothing in this pipeline writes them there.
+This loader streams the converter's output into a Postgres-compatible
+database, or into SQLite as a local stand-in:
+
+* Postgres (``postgresql://...``, needs psycopg): each batch is sent with
+  ``COPY ... FROM STDIN`` into a temporary staging table and upserted from
+  there with one ``INSERT ... ON CONFLICT`` statement.
+* SQLite (``sqlite:///path`` or a plain path): each batch is one
+  ``executemany`` of the same upsert.
+
+Either way one connection is reused for the whole load and the load is one
+transaction, so a failed load leaves the table as it was.
+
+Rows are keyed like ``change_capture.py`` keys them: ``invoice_key`` is the
+``Email_ID``, ``#<row hash>`` for a row without one, and ``<key>#2``,
+``#3``, ... for repeats in file order. That makes loads idempotent, and lets
+the same table be kept current from change deltas instead of full loads:
+``apply`` upserts and deletes the changes of every captured run not yet
+recorded in ``invoice_load_runs``, oldest first, one transaction per run.
+(A delta file published by a capture that then failed is not in the run
+log; the next run reports the same changes, so it is skipped.) A full
+load only upserts: rows that left the CSV stay until a delta deletes them.
+
+The table is created if missing; an existing table needs the
+``invoice_key`` primary key. Amounts load as numbers and dates as
+timestamps; a value the converter could not normalise loads as NULL.
+
+``convert_invoices.py --load DSN`` loads after each conversion, applying the
+new delta when ``--changes`` is also given.
+
+Usage:
+    python data/invoice_loader.py load DSN [--csv PATH] [--table invoices]
+        [--batch-rows 5000]
+    python data/invoice_loader.py apply DSN [--dir DIR] [--table invoices]
+
+Dependencies:
+    pip install "psycopg[binary]"    (Postgres only; SQLite is in the standard library)
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from change_capture import (CSV_FILE, KEY_FIELD, ChangeCapture, changes_dir_for, key_digest,
+                            read_delta, row_hash)
+from compressed_io import open_file
+from invoice_dates import is_iso_date
+
+TABLE = 'invoices'
+RUNS_TABLE = 'invoice_load_runs'
+STAGE_TABLE = 'invoice_load_stage'
+# Rows per COPY / executemany; large enough to amortise the round trips,
+# small enough to keep a batch of converted rows in memory
+BATCH_ROWS = 5000
+
+# (CSV field, column, kind): names follow src/lib/schemas/invoice.ts, with
+# ``total`` and ``supplier_name`` as the API and the migrations read them
+COLUMNS = (
+    ('Email_ID', 'email_id', 'text'),
+    ('Subject', 'subject', 'text'),
+    ('From_Email', 'from_email', 'text'),
+    ('From_Name', 'from_name', 'text'),
+    ('Received_Date', 'received_date', 'timestamp'),
+    ('Category', 'category', 'text'),
+    ('Invoice_Number', 'invoice_number', 'text'),
+    ('Amount', 'total', 'numeric'),
+    ('Vendor', 'supplier_name', 'text'),
+    ('Due_Date', 'due_date', 'timestamp'),
+    ('OneDrive_Link', 'onedrive_link', 'text'),
+    ('Xero_Link', 'xero_link', 'text'),
+    ('Processing_Status', 'processing_status', 'text'),
+    ('Processed_At', 'processed_at', 'timestamp'),
+)
+COLUMN_NAMES = ['invoice_key'] + [column for _, column, _ in COLUMNS]
+_TYPES = {
+    'postgres': {'key': 'text PRIMARY KEY', 'text': 'text', 'timestamp': 'timestamptz',
+                 'numeric': 'numeric(18,2)'},
+    'sqlite': {'key': 'TEXT PRIMARY KEY', 'text': 'TEXT', 'timestamp': 'TEXT',
+               'numeric': 'REAL'},
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_ddl(table: str, dialect: str) -> str:
+    types = _TYPES[dialect]
+    columns = [f"    invoice_key {types['key']}"]
+    columns += [f'    {column} {types[kind]}' for _, column, kind in COLUMNS]
+    return (f'CREATE TABLE IF NOT EXISTS {_quote(table)} (\n' + ',\n'.join(columns) + '\n);\n'
+            f'CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (\n'
+            f'    run_id {types["key"]},\n'
+            f'    applied_at {types["text"]} NOT NULL,\n'
+            f'    upserted integer NOT NULL,\n'
+            f'    deleted integer NOT NULL\n'
+            f');\n')
+
+
+def upsert_sql(table: str, source: str, placeholders: Optional[str] = None) -> str:
+    """``INSERT`` of every column from ``source`` (a table, or VALUES when
+    ``placeholders`` is given) that overwrites the row on a key conflict."""
+    names = ', '.join(COLUMN_NAMES)
+    select = (f'VALUES ({placeholders})' if placeholders
+              else f'SELECT {names} FROM {source}')
+    updates = ', '.join(f'{column} = excluded.{column}' for column in COLUMN_NAMES[1:])
+    # SQLite needs a WHERE to tell the upsert clause from a join in INSERT ... SELECT
+    where = '' if placeholders else ' WHERE true'
+    return (f'INSERT INTO {_quote(table)} ({names}) {select}{where} '
+            f'ON CONFLICT (invoice_key) DO UPDATE SET {updates}')
+
+
+def _convert(value: str, kind: str) -> Any:
+    if kind == 'text':
+        return value
+    if kind == 'numeric':
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+    return value if is_iso_date(value) else None
+
+
+class RowKeys:
+    """Assigns ``invoice_key`` to rows in file order, as ``change_capture.py`` does."""
+
+    def __init__(self) -> None:
+        # Digests rather than the ~150-character keys keep this small
+        self.seen = set()
+
+    def key(self, values: Sequence[str], key_index: int) -> str:
+        key = values[key_index] or '#' + row_hash(values).hex()
+        claimed, n = key, 2
+        digest = key_digest(claimed)
+        while digest in self.seen:
+            claimed = f'{key}#{n}'
+            digest = key_digest(claimed)
+            n += 1
+        self.seen.add(digest)
+        return claimed
+
+
+def table_rows(rows: Iterable[Sequence[str]], fieldnames: List[str]) -> Iterator[tuple]:
+    """Table tuples (``COLUMN_NAMES`` order) for CSV value lists in ``fieldnames`` order."""
+    missing = [name for name, _, _ in COLUMNS if name not in fieldnames]
+    if missing:
+        raise ValueError(f"Cleaned CSV is missing {', '.join(missing)}")
+    positions = [fieldnames.index(name) for name, _, _ in COLUMNS]
+    # Text passes through; only these table positions need converting
+    converted = [(j + 1, kind) for j, (_, _, kind) in enumerate(COLUMNS) if kind != 'text']
+    key_index = fieldnames.index(KEY_FIELD)
+    keys = RowKeys()
+    for values in rows:
+        row = [keys.key(values, key_index)]
+        row += [values[i] for i in positions]
+        for j, kind in converted:
+            row[j] = _convert(row[j], kind)
+        yield tuple(row)
+
+
+def _delta_row(key: str, row: Dict[str, str]) -> tuple:
+    return (key, *[_convert(row.get(name, ''), kind) for name, _, kind in COLUMNS])
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class SqliteDriver:
+    """Local stand-in for the Postgres table."""
+
+    dialect = 'sqlite'
+
+    def __init__(self, path: str, table: str = TABLE) -> None:
+        self.table = table
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(table_ddl(table, self.dialect))
+        self._upsert = upsert_sql(table, '', ', '.join('?' * len(COLUMN_NAMES)))
+
+    def upsert(self, rows: List[tuple]) -> None:
+        self.conn.executemany(self._upsert, rows)
+
+    def delete(self, keys: List[str]) -> None:
+        self.conn.executemany(f'DELETE FROM {_quote(self.table)} WHERE invoice_key = ?',
+                              [(key,) for key in keys])
+
+    def applied_runs(self) -> set:
+        return {run_id for (run_id,) in self.conn.execute(f'SELECT run_id FROM {RUNS_TABLE}')}
+
+    def record_run(self, run_id: str, upserted: int, deleted: int) -> None:
+        self.conn.execute(f'INSERT INTO {RUNS_TABLE} VALUES (?, ?, ?, ?)',
+                          (run_id, _now(), upserted, deleted))
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class PostgresDriver:
+    """COPY into a session-local staging table, then one upsert per batch."""
+
+    dialect = 'postgres'
+
+    def __init__(self, dsn: str, table: str = TABLE) -> None:
+        try:
+            import psycopg
+        except ImportError as exc:
+            raise RuntimeError('Loading into Postgres needs psycopg: '
+                               'pip install "psycopg[binary]"') from exc
+        self.table = table
+        self.conn = psycopg.connect(dsn)
+        with self.conn.cursor() as cur:
+            for statement in table_ddl(table, self.dialect).split(';'):
+                if statement.strip():
+                    cur.execute(statement)
+            cur.execute(f'CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} '
+                        f'(LIKE {_quote(table)} INCLUDING DEFAULTS)')
+        self.conn.commit()
+        self._copy = f"COPY {STAGE_TABLE} ({', '.join(COLUMN_NAMES)}) FROM STDIN"
+        self._upsert = upsert_sql(table, STAGE_TABLE)
+
+    def upsert(self, rows: List[tuple]) -> None:
+        with self.conn.cursor() as cur:
+            with cur.copy(self._copy) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            cur.execute(self._upsert)
+            cur.execute(f'TRUNCATE {STAGE_TABLE}')
+
+    def delete(self, keys: List[str]) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(f'DELETE FROM {_quote(self.table)} WHERE invoice_key = ANY(%s)', (keys,))
+
+    def applied_runs(self) -> set:
+        with self.conn.cursor() as cur:
+            cur.execute(f'SELECT run_id FROM {RUNS_TABLE}')
+            return {run_id for (run_id,) in cur.fetchall()}
+
+    def record_run(self, run_id: str, upserted: int, deleted: int) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(f'INSERT INTO {RUNS_TABLE} VALUES (%s, %s, %s, %s)',
+                        (run_id, _now(), upserted, deleted))
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def connect(dsn: str, table: str = TABLE):
+    """Driver for ``dsn``: a ``postgres(ql)://`` URL, ``sqlite:///path`` or a file path."""
+    if dsn.startswith(('postgresql://', 'postgres://')):
+        return PostgresDriver(dsn, table)
+    if dsn.startswith('sqlite:///'):
+        dsn = dsn[len('sqlite:///'):]
+    return SqliteDriver(dsn, table)
+
+
+@dataclass
+class LoadResult:
+    upserted: int = 0
+    deleted: int = 0
+    runs: int = 0
+    seconds: float = 0.0
+
+    def describe(self) -> str:
+        rows = self.upserted + self.deleted
+        rate = rows / self.seconds if self.seconds else 0.0
+        runs = f" from {self.runs} delta(s)" if self.runs else ''
+        return (f"{self.upserted:,} upserted, {self.deleted:,} deleted{runs} "
+                f"in {self.seconds:.2f}s ({rate:,.0f} rows/sec)")
+
+
+def _in_transaction(driver, work) -> None:
+    try:
+        work()
+    except BaseException:
+        driver.rollback()
+        raise
+    driver.commit()
+
+
+def load_csv(dsn: str, csv_file: Path = CSV_FILE, table: str = TABLE,
+             batch_rows: int = BATCH_ROWS) -> LoadResult:
+    """Upsert every row of a cleaned CSV in one transaction."""
+    result = LoadResult()
+    started = time.perf_counter()
+    driver = connect(dsn, table)
+    try:
+        with open_file(csv_file, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            fieldnames = next(reader, [])
+
+            def work() -> None:
+                for batch in batched(table_rows(reader, fieldnames), batch_rows):
+                    driver.upsert(batch)
+                    result.upserted += len(batch)
+
+            _in_transaction(driver, work)
+    finally:
+        driver.close()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _apply_delta(driver, delta_file: Path, batch_rows: int) -> Tuple[int, int]:
+    # A key is either in the new output or not, so a delta never both
+    # upserts and deletes it and the order between the two does not matter
+    upserted, rows, deletes = 0, [], []
+    changes = read_delta(delta_file)
+    next(changes, None)
+    for change in changes:
+        if change['op'] == 'delete':
+            deletes.append(change['key'])
+            continue
+        rows.append(_delta_row(change['key'], change['row']))
+        if len(rows) >= batch_rows:
+            driver.upsert(rows)
+            upserted += len(rows)
+            rows = []
+    if rows:
+        driver.upsert(rows)
+        upserted += len(rows)
+    for batch in batched(deletes, batch_rows):
+        driver.delete(batch)
+    return upserted, len(deletes)
+
+
+def apply_changes(dsn: str, changes_dir: Path, table: str = TABLE,
+                  batch_rows: int = BATCH_ROWS) -> LoadResult:
+    """Apply every captured run not yet applied to the table, oldest first."""
+    result = LoadResult()
+    started = time.perf_counter()
+    with ChangeCapture(changes_dir) as capture:
+        runs = capture.runs()
+    driver = connect(dsn, table)
+    try:
+        applied = driver.applied_runs()
+        for run in runs:
+            delta_file = Path(changes_dir) / run.delta_file
+            if run.run_id in applied:
+                continue
+            if not delta_file.exists():
+                raise RuntimeError(f"Delta {delta_file} of unapplied run {run.run_id} is gone; "
+                                   f"reload the table with the load command")
+
+            def work() -> None:
+                upserted, deleted = _apply_delta(driver, delta_file, batch_rows)
+                driver.record_run(run.run_id, upserted, deleted)
+                result.upserted += upserted
+                result.deleted += deleted
+
+            _in_transaction(driver, work)
+            result.runs += 1
+    finally:
+        driver.close()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('load', help='upsert every row of a cleaned CSV')
+    apply = commands.add_parser('apply', help='apply captured change deltas not yet loaded')
+    for command in (load, apply):
+        command.add_argument('dsn', help='postgresql://... URL, sqlite:///path or a SQLite file')
+        command.add_argument('--csv', type=Path, default=CSV_FILE,
+                             help='cleaned CSV (default: %(default)s)')
+        command.add_argument('--table', default=TABLE, help='target table (default: %(default)s)')
+        command.add_argument('--batch-rows', type=int, default=BATCH_ROWS,
+                             help='rows per COPY/upsert batch (default: %(default)s)')
+    apply.add_argument('--dir', type=Path, default=None,
+                       help='changes directory (default: next to the CSV)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    if args.command == 'load':
+        result = load_csv(args.dsn, args.csv, args.table, args.batch_rows)
+    else:
+        result = apply_changes(args.dsn, args.dir or changes_dir_for(args.csv), args.table,
+                               args.batch_rows)
+    print(f"Loaded into {args.table}: {result.describe()}")
+
+
+if __name__ == '__main__':
+    main()
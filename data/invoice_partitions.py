@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Month-partitioned layout of the cleaned invoices for date-range reads.
+
+The dashboard's default views cover the last 30 or 90 days, but the cleaned
+CSV holds all of history in one file, so every range read scans it whole.
+``convert_invoices.py --partitioned`` writes the same rows split by received
+month instead, with a manifest describing each file:
+
+    processed/invoices/
+        manifest.json   rows, amount total and min/max received date per file
+        2025-09.csv     rows received in September 2025, newest first
+        2025-08.csv
+        undated.csv     rows whose received date is not an ISO date
+
+A reader loads the manifest and opens only the partitions whose date span
+overlaps the requested range (:func:`read_range`).
+
+Rows are ordered by an integer epoch key computed once per distinct received
+date (:func:`received_epoch`) rather than by comparing ISO strings. Undated
+rows sort after every dated row. The new layout is built in a sibling
+``.tmp`` directory and swapped in, so readers never see half a conversion
+and months that disappeared from the export do not linger.
+
+Usage:
+    python data/invoice_partitions.py show [--dir PATH]
+    python data/invoice_partitions.py read [--dir PATH] [--date-from YYYY-MM-DD]
+        [--date-to YYYY-MM-DD] [--output PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from invoice_dates import epoch_seconds
+
+DATA_DIR = Path(__file__).resolve().parent
+PARTITION_DIR = DATA_DIR / 'processed' / 'invoices'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+UNDATED = 'undated'
+# Sorts below every real epoch, including dates before 1970
+UNDATED_KEY = -(1 << 62)
+
+
+def received_epoch(row: Dict[str, Any]) -> int:
+    """Integer sort key of a row's received date; undated rows get :data:`UNDATED_KEY`."""
+    epoch = epoch_seconds(row['Received_Date'])
+    return UNDATED_KEY if epoch is None else epoch
+
+
+def partition_name(row: Dict[str, Any]) -> str:
+    """``YYYY-MM`` of the received date, or :data:`UNDATED`."""
+    received = row['Received_Date']
+    return received[:7] if epoch_seconds(received) is not None else UNDATED
+
+
+class PartitionWriter:
+    """Writes rows into per-month CSVs and a manifest, then publishes them.
+
+    Rows should arrive grouped by month (the converter writes them sorted),
+    so one partition file is open at a time; a month that shows up again is
+    appended to.
+    """
+
+    def __init__(self, directory: Path, fieldnames: List[str], generated_at: str,
+                 source: Optional[Path] = None) -> None:
+        self.directory = Path(directory)
+        self.fieldnames = fieldnames
+        self.generated_at = generated_at
+        self.source = source
+        self.staging = self.directory.with_name(self.directory.name + '.tmp')
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self.staging.mkdir(parents=True)
+        self.partitions: Dict[str, Dict[str, Any]] = {}
+        self._name: Optional[str] = None
+        self._file: Optional[TextIO] = None
+        self._writer: Optional[csv.DictWriter] = None
+
+    def _switch(self, name: str) -> None:
+        if self._file is not None:
+            self._file.close()
+        reopened = name in self.partitions
+        if not reopened:
+            self.partitions[name] = {'rows': 0, 'amount': 0.0, 'min': None, 'max': None}
+        self._file = open(self.staging / f'{name}.csv', 'a' if reopened else 'w',
+                          newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        if not reopened:
+            self._writer.writeheader()
+        self._name = name
+
+    def write(self, row: Dict[str, Any]) -> None:
+        received = row['Received_Date']
+        epoch = epoch_seconds(received)
+        name = received[:7] if epoch is not None else UNDATED
+        if name != self._name:
+            self._switch(name)
+        self._writer.writerow(row)
+        part = self.partitions[name]
+        part['rows'] += 1
+        part['amount'] += float(row['Amount'] or 0)
+        if epoch is not None:
+            if part['min'] is None or epoch < part['min'][0]:
+                part['min'] = (epoch, received)
+            if part['max'] is None or epoch > part['max'][0]:
+                part['max'] = (epoch, received)
+
+    def manifest(self) -> Dict[str, Any]:
+        entries = []
+        # Newest month first, undated last: concatenating the files in
+        # manifest order gives one newest-first listing
+        names = sorted((name for name in self.partitions if name != UNDATED), reverse=True)
+        if UNDATED in self.partitions:
+            names.append(UNDATED)
+        for name in names:
+            part = self.partitions[name]
+            low, high = part['min'] or (None, None), part['max'] or (None, None)
+            entries.append({
+                'month': name,
+                'file': f'{name}.csv',
+                'rows': part['rows'],
+                'totalAmount': round(part['amount'], 2),
+                'minReceived': low[1],
+                'maxReceived': high[1],
+                'minEpoch': low[0],
+                'maxEpoch': high[0],
+            })
+        return {
+            'version': MANIFEST_VERSION,
+            'generatedAt': self.generated_at,
+            'source': str(self.source) if self.source is not None else None,
+            'fieldnames': self.fieldnames,
+            'rows': sum(entry['rows'] for entry in entries),
+            'totalAmount': round(sum(part['amount'] for part in self.partitions.values()), 2),
+            'partitions': entries,
+        }
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the files and swap the staged layout into place."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        manifest = self.manifest()
+        (self.staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, allow_nan=False) + '\n')
+        previous = self.directory.with_name(self.directory.name + '.old')
+        shutil.rmtree(previous, ignore_errors=True)
+        if self.directory.exists():
+            os.replace(self.directory, previous)
+        os.replace(self.staging, self.directory)
+        shutil.rmtree(previous, ignore_errors=True)
+        return manifest
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+def write_partitions(directory: Path, rows: Iterable[Dict[str, Any]], fieldnames: List[str],
+                     generated_at: str, source: Optional[Path] = None) -> int:
+    """Write ``rows`` as month partitions under ``directory``; returns the count."""
+    writer = PartitionWriter(directory, fieldnames, generated_at, source)
+    try:
+        for row in rows:
+            writer.write(row)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()['rows']
+
+
+def load_manifest(directory: Path = PARTITION_DIR) -> Dict[str, Any]:
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        raise RuntimeError(f"No partition manifest at {path}; "
+                           f"run convert_invoices.py --partitioned first")
+    return json.loads(path.read_text())
+
+
+def select_partitions(manifest: Dict[str, Any], date_from: Optional[str] = None,
+                      date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Manifest entries whose received dates can fall in ``date_from .. date_to``.
+
+    Bounds are inclusive ``YYYY-MM-DD`` days. Undated rows only match an
+    unbounded read.
+    """
+    selected = []
+    for entry in manifest['partitions']:
+        if entry['month'] == UNDATED or not entry['rows']:
+            if not date_from and not date_to and entry['rows']:
+                selected.append(entry)
+            continue
+        if date_from and entry['maxReceived'][:10] < date_from:
+            continue
+        if date_to and entry['minReceived'][:10] > date_to:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def read_range(directory: Path = PARTITION_DIR, date_from: Optional[str] = None,
+               date_to: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """Rows received in ``date_from .. date_to`` (inclusive), newest first."""
+    directory = Path(directory)
+    for entry in select_partitions(load_manifest(directory), date_from, date_to):
+        with open(directory / entry['file'], newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                day = row['Received_Date'][:10]
+                if (date_from and day < date_from) or (date_to and day > date_to):
+                    continue
+                yield row
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', type=Path, default=PARTITION_DIR,
+                        help='partition directory (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('show', help='print the manifest as a table')
+    read = commands.add_parser('read', help='write the rows of a received-date range as CSV')
+    read.add_argument('--date-from', default=None, help='first received day (YYYY-MM-DD)')
+    read.add_argument('--date-to', default=None, help='last received day (YYYY-MM-DD)')
+    read.add_argument('--output', type=Path, default=None, help='CSV to write (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    manifest = load_manifest(args.dir)
+    if args.command == 'show':
+        print(f"{manifest['rows']:,} invoices, ${manifest['totalAmount']:,.2f} "
+              f"(generated {manifest['generatedAt']})")
+        for entry in manifest['partitions']:
+            span = (f"{entry['minReceived'][:10]} .. {entry['maxReceived'][:10]}"
+                    if entry['minReceived'] else '-')
+            print(f"  {entry['file']:<14} {entry['rows']:>9,} rows  "
+                  f"${entry['totalAmount']:>16,.2f}  {span}")
+        return
+
+    selected = select_partitions(manifest, args.date_from, args.date_to)
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=manifest['fieldnames'])
+        writer.writeheader()
+        count = 0
+        for row in read_range(args.dir, args.date_from, args.date_to):
+            writer.writerow(row)
+            count += 1
+    finally:
+        if args.output:
+            out.close()
+    print(f"{count:,} invoices from {len(selected)} of {len(manifest['partitions'])} partitions",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
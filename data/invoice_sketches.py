@@ -0,0 +1,288 @@
+"""Bounded-memory streaming sketches for vendor and amount analytics.
+
+The dashboard KPI cards want medians and p95s of invoice amounts and the
+vendor leaderboard wants the biggest suppliers, but exact answers mean
+keeping every amount and every vendor. These sketches answer in one pass
+with fixed memory, and their state round-trips through JSON, so an
+incremental run carries on from the saved sketches without rereading rows:
+
+:class:`SpaceSaving`
+    top-K heavy hitters (Metwally et al.), by count or by a weight such as
+    the amount. Reported totals are upper bounds off by at most ``error``;
+    the counter to evict is found through a min-heap in O(log capacity).
+:class:`HyperLogLog`
+    distinct-count estimate in ``2 ** precision`` one-byte registers
+    (about 1.6% standard error at the default 4 KiB).
+:class:`TDigest`
+    quantiles from weighted centroids (Dunning's merging t-digest with the
+    arcsine scale), most accurate in the tails where p95/p99 live.
+
+:class:`InvoiceSketches` bundles them for the cleaned rows: top vendors by
+count and by amount, distinct vendors, and amount quantiles overall and per
+category. ``dashboard_rollups.DashboardRollups`` feeds one and writes its
+:meth:`~InvoiceSketches.analytics` payload next to the other rollups.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p95', 0.95), ('p99', 0.99))
+
+
+class SpaceSaving:
+    """Top-K heavy hitters over at most ``capacity`` counters."""
+
+    def __init__(self, capacity: int = 100) -> None:
+        self.capacity = capacity
+        # item -> [estimated total, maximum overestimate]
+        self.counters: Dict[str, List[float]] = {}
+        # One (total when pushed, insertion order, item) entry per counter.
+        # Totals only grow, so a stale entry understates its counter and the
+        # smallest up-to-date entry is the minimum; ties go to the oldest.
+        self._heap: List[Tuple[float, int, str]] = []
+        self._inserted = 0
+
+    def _track(self, item: str, total: float) -> None:
+        heapq.heappush(self._heap, (total, self._inserted, item))
+        self._inserted += 1
+
+    def _evict_smallest(self) -> float:
+        while True:
+            total, order, item = heapq.heappop(self._heap)
+            current = self.counters[item][0]
+            if current == total:
+                del self.counters[item]
+                return total
+            heapq.heappush(self._heap, (current, order, item))
+
+    def add(self, item: str, weight: float = 1) -> None:
+        if weight <= 0:
+            return
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+            self._track(item, weight)
+            return
+        # Replace the smallest counter; the newcomer inherits its total as error
+        floor = self._evict_smallest()
+        self.counters[item] = [floor + weight, floor]
+        self._track(item, floor + weight)
+
+    def top(self, k: int) -> List[Tuple[str, float, float]]:
+        """``(item, total, error)`` for the ``k`` largest totals."""
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, total, error) for item, (total, error) in ranked[:k]]
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'capacity': self.capacity, 'counters': self.counters}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'SpaceSaving':
+        sketch = cls(state['capacity'])
+        sketch.counters = state['counters']
+        for item, (total, _) in sketch.counters.items():
+            sketch._track(item, total)
+        return sketch
+
+
+class HyperLogLog:
+    """Distinct-count estimate from ``2 ** precision`` registers."""
+
+    def __init__(self, precision: int = 12) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        bits = 64 - self.precision
+        rest = h & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        index = h >> bits
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'precision': self.precision,
+                'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'HyperLogLog':
+        sketch = cls(state['precision'])
+        sketch.registers = bytearray(base64.b64decode(state['registers']))
+        return sketch
+
+
+class TDigest:
+    """Quantile sketch of roughly ``compression / 2`` centroids."""
+
+    def __init__(self, compression: float = 300) -> None:
+        self.compression = compression
+        self.centroids: List[List[float]] = []  # [mean, weight], sorted by mean
+        self.count = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._buffer: List[List[float]] = []
+
+    def add(self, value: float, weight: float = 1) -> None:
+        self._buffer.append([value, weight])
+        self.count += weight
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def _k_to_q(self, k: float) -> float:
+        angle = min(math.pi / 2, k * 2 * math.pi / self.compression)
+        return (math.sin(angle) + 1) / 2
+
+    def _q_to_k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(self.centroids + self._buffer, key=lambda centroid: centroid[0])
+        self._buffer = []
+        total = sum(weight for _, weight in items)
+        merged = [list(items[0])]
+        done = 0.0
+        limit = total * self._k_to_q(self._q_to_k(0) + 1)
+        for mean, weight in items[1:]:
+            current = merged[-1]
+            if done + current[1] + weight <= limit:
+                current[1] += weight
+                current[0] += (mean - current[0]) * weight / current[1]
+            else:
+                done += current[1]
+                limit = total * self._k_to_q(self._q_to_k(done / total) + 1)
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at rank ``q`` (0..1), interpolating between centroids."""
+        self._compress()
+        centroids = self.centroids
+        if not centroids:
+            return None
+        if len(centroids) == 1:
+            return centroids[0][0]
+        target = q * self.count
+        first_mean, first_weight = centroids[0]
+        if target < first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+        last_mean, last_weight = centroids[-1]
+        if target > self.count - last_weight / 2:
+            tail = (self.count - target) / (last_weight / 2)
+            return self.max - (self.max - last_mean) * tail
+        seen = first_weight / 2
+        for (mean, weight), (next_mean, next_weight) in zip(centroids, centroids[1:]):
+            gap = (weight + next_weight) / 2
+            if target <= seen + gap:
+                return mean + (next_mean - mean) * (target - seen) / gap
+            seen += gap
+        return last_mean
+
+    def to_state(self) -> Dict[str, Any]:
+        self._compress()
+        return {'compression': self.compression, 'centroids': self.centroids,
+                'count': self.count, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'TDigest':
+        digest = cls(state['compression'])
+        digest.centroids = state['centroids']
+        digest.count = state['count']
+        digest.min, digest.max = state['min'], state['max']
+        return digest
+
+
+def _distribution(digest: TDigest) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {'count': int(digest.count)}
+    if digest.count:
+        summary['min'] = round(digest.min, 2)
+        summary['max'] = round(digest.max, 2)
+        for name, q in QUANTILES:
+            summary[name] = round(digest.quantile(q), 2)
+    return summary
+
+
+class InvoiceSketches:
+    """Vendor leaders, distinct vendors and amount quantiles for cleaned rows."""
+
+    def __init__(self) -> None:
+        self.vendors_by_count = SpaceSaving()
+        self.vendors_by_amount = SpaceSaving()
+        self.distinct_vendors = HyperLogLog()
+        self.amounts = TDigest()
+        self.amounts_by_category: Dict[str, TDigest] = {}
+
+    def add(self, amount: float, vendor: str, category: str) -> None:
+        self.vendors_by_count.add(vendor)
+        self.distinct_vendors.add(vendor)
+        if not math.isfinite(amount):
+            # A literal "nan"/"inf" in the export parses as a float; leave it out
+            return
+        # Credit notes (negative amounts) don't rank a vendor by spend
+        self.vendors_by_amount.add(vendor, amount)
+        self.amounts.add(amount)
+        digest = self.amounts_by_category.get(category)
+        if digest is None:
+            digest = self.amounts_by_category[category] = TDigest()
+        digest.add(amount)
+
+    def analytics(self, top: int = 10) -> Dict[str, Any]:
+        """The ``invoice-analytics.json`` payload."""
+        return {
+            'vendors': {
+                'distinctEstimate': self.distinct_vendors.estimate(),
+                'topByCount': [{'value': vendor, 'count': int(count), 'error': int(error)}
+                               for vendor, count, error in self.vendors_by_count.top(top)],
+                'topByAmount': [{'value': vendor, 'amount': round(amount, 2),
+                                 'error': round(error, 2)}
+                                for vendor, amount, error in self.vendors_by_amount.top(top)],
+            },
+            'amounts': _distribution(self.amounts),
+            'amountsByCategory': {category: _distribution(digest)
+                                  for category, digest in self.amounts_by_category.items()},
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            'vendors_by_count': self.vendors_by_count.to_state(),
+            'vendors_by_amount': self.vendors_by_amount.to_state(),
+            'distinct_vendors': self.distinct_vendors.to_state(),
+            'amounts': self.amounts.to_state(),
+            'amounts_by_category': {category: digest.to_state()
+                                    for category, digest in self.amounts_by_category.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'InvoiceSketches':
+        sketches = cls()
+        sketches.vendors_by_count = SpaceSaving.from_state(state['vendors_by_count'])
+        sketches.vendors_by_amount = SpaceSaving.from_state(state['vendors_by_amount'])
+        sketches.distinct_vendors = HyperLogLog.from_state(state['distinct_vendors'])
+        sketches.amounts = TDigest.from_state(state['amounts'])
+        sketches.amounts_by_category = {category: TDigest.from_state(digest)
+                                        for category, digest in state['amounts_by_category'].items()}
+        return sketches
@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""Indexed SQLite query store for the invoice list, filters and facets.
+
+The invoice filter drawer (``docs/api-samples/invoice-filter-facets.json``)
+filters by status, vendor, category and received date, and the list view
+pages through the result. Answering either from the cleaned CSV means a full
+scan per request; this store answers both from SQLite indexes instead:
+
+    invoices_cleaned_2024.sqlite
+        invoices    one row per cleaned CSV row
+        vendors     facet email per vendor (first non-Xero sender)
+        meta        fingerprint of the CSV the store describes
+
+Each filterable column leads one covering index that also carries every
+other filter and facet column, so filtered counts, facets and the page of
+row ids are answered from the index alone; only the rows of the requested
+page are read from the table.
+
+Payment status follows ``dashboard_rollups.py``: the store keeps a
+time-independent ``status_class`` (``paid`` for a zero amount, ``open`` for
+a positive amount with a due date, ``undated`` otherwise) and an ``open``
+invoice is ``overdue`` once its due date is before the query's ``as_of``.
+
+``convert_invoices.py --store`` rebuilds the store after every conversion;
+with ``--incremental`` only the appended rows are inserted. Pages come back
+in the CSV's order (newest first, earlier input first on equal dates).
+
+Usage:
+    python data/invoice_store.py build [--csv PATH] [--store PATH]
+    python data/invoice_store.py query [--status overdue] [--vendor NAME]
+        [--category NAME] [--date-from YYYY-MM-DD] [--date-to YYYY-MM-DD]
+        [--amount-min N] [--amount-max N] [--sort receivedDate] [--order desc]
+        [--page 1] [--limit 20]
+    python data/invoice_store.py facets [same filters]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from compressed_io import open_file
+from dashboard_rollups import STATUSES, _vendor_email, as_of_now
+from invoice_dates import is_iso_date
+from trend_cubes import period
+
+DATA_DIR = Path(__file__).resolve().parent
+CSV_FILE = DATA_DIR / 'invoices_cleaned_2024.csv'
+STORE_FILE = DATA_DIR / 'invoices_cleaned_2024.sqlite'
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    seq INTEGER PRIMARY KEY,
+    email_id TEXT,
+    subject TEXT,
+    from_email TEXT,
+    from_name TEXT,
+    received_date TEXT,
+    category TEXT,
+    invoice_number TEXT,
+    amount REAL,
+    vendor TEXT,
+    due_date TEXT,
+    onedrive_link TEXT,
+    xero_link TEXT,
+    processing_status TEXT,
+    processed_at TEXT,
+    source_tab TEXT,
+    status_class TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor TEXT PRIMARY KEY,
+    email TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+# Each index leads with one filter and covers the other filter/facet columns
+INDEXES = """
+CREATE INDEX IF NOT EXISTS invoices_by_received ON invoices
+    (received_date DESC, vendor, category, status_class, due_date, amount, source_tab);
+CREATE INDEX IF NOT EXISTS invoices_by_vendor ON invoices
+    (vendor, received_date, category, status_class, due_date, amount, source_tab);
+CREATE INDEX IF NOT EXISTS invoices_by_category ON invoices
+    (category, received_date, vendor, status_class, due_date, amount, source_tab);
+CREATE INDEX IF NOT EXISTS invoices_by_status ON invoices
+    (status_class, due_date, received_date, vendor, category, amount, source_tab);
+CREATE INDEX IF NOT EXISTS invoices_by_amount ON invoices
+    (amount, received_date, vendor, category, status_class, due_date, source_tab);
+"""
+
+# CSV column -> store column, in insert order
+COLUMNS = (
+    ('Email_ID', 'email_id'), ('Subject', 'subject'), ('From_Email', 'from_email'),
+    ('From_Name', 'from_name'), ('Received_Date', 'received_date'), ('Category', 'category'),
+    ('Invoice_Number', 'invoice_number'), ('Amount', 'amount'), ('Vendor', 'vendor'),
+    ('Due_Date', 'due_date'), ('OneDrive_Link', 'onedrive_link'), ('Xero_Link', 'xero_link'),
+    ('Processing_Status', 'processing_status'), ('Processed_At', 'processed_at'),
+    ('sourceTab', 'source_tab'),
+)
+# API field -> store column, for rows and sortBy
+API_FIELDS = (
+    ('emailId', 'email_id'), ('subject', 'subject'), ('fromEmail', 'from_email'),
+    ('fromName', 'from_name'), ('receivedDate', 'received_date'), ('category', 'category'),
+    ('invoiceNumber', 'invoice_number'), ('amount', 'amount'), ('vendor', 'vendor'),
+    ('dueDate', 'due_date'), ('oneDriveLink', 'onedrive_link'), ('xeroLink', 'xero_link'),
+    ('processingStatus', 'processing_status'), ('processedAt', 'processed_at'),
+    ('sourceTab', 'source_tab'),
+)
+SORT_FIELDS = {'receivedDate': 'received_date', 'dueDate': 'due_date', 'amount': 'amount',
+               'vendor': 'vendor', 'paymentStatus': 'payment_status'}
+MAX_LIMIT = 100
+
+_INSERT = (f"INSERT INTO invoices ({', '.join(column for _, column in COLUMNS)}, status_class) "
+           f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+_PAYMENT_STATUS = ("CASE WHEN status_class = 'paid' THEN 'paid' "
+                   "WHEN status_class = 'open' AND due_date < :as_of THEN 'overdue' "
+                   "ELSE 'pending' END")
+
+
+def status_class(amount: Optional[float], due_date: str) -> str:
+    """The clock-independent part of ``deriveInvoiceStatus``."""
+    if amount == 0:
+        return 'paid'
+    if amount is not None and amount > 0 and is_iso_date(due_date):
+        return 'open'
+    return 'undated'
+
+
+def _amount(row: Dict[str, Any]) -> Optional[float]:
+    amount = float(row['Amount'] or 0)
+    # NaN would be stored as NULL anyway; say so explicitly
+    return amount if math.isfinite(amount) else None
+
+
+def payment_status(row: Dict[str, Any], as_of: str) -> str:
+    """``deriveInvoiceStatus`` for a cleaned CSV row, judged at ``as_of``."""
+    due_date = row['Due_Date'] or ''
+    kind = status_class(_amount(row), due_date)
+    if kind == 'paid':
+        return 'paid'
+    return 'overdue' if kind == 'open' and due_date < as_of else 'pending'
+
+
+def _store_row(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    values = {name: row.get(name) for name, _ in COLUMNS}
+    values['Amount'] = _amount(row)
+    # Facet labels, so a facet value can be fed back as a filter
+    values['Vendor'] = values['Vendor'] or 'Unknown Vendor'
+    values['Category'] = values['Category'] or 'Uncategorized'
+    return (*values.values(), status_class(values['Amount'], row['Due_Date'] or ''))
+
+
+@dataclass
+class InvoiceQuery:
+    """Filters shared by :meth:`InvoiceStore.page` and :meth:`InvoiceStore.facets`."""
+
+    statuses: Sequence[str] = ()
+    vendors: Sequence[str] = ()
+    categories: Sequence[str] = ()
+    source_tabs: Sequence[str] = ()
+    # Received date, inclusive, as YYYY-MM-DD
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+
+    def received_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        """Half-open ``[from, to)`` received-date bounds as ISO date strings."""
+        date_to = None
+        if self.date_to:
+            date_to = (date.fromisoformat(self.date_to) + timedelta(days=1)).isoformat()
+        return self.date_from or None, date_to
+
+    def where(self, params: Dict[str, Any]) -> str:
+        """SQL condition for these filters; binds its values into ``params``."""
+        clauses = []
+
+        def any_of(column: str, values: Sequence[Any], prefix: str) -> None:
+            names = []
+            for i, value in enumerate(values):
+                params[f'{prefix}{i}'] = value
+                names.append(f':{prefix}{i}')
+            clauses.append(f"{column} IN ({', '.join(names)})")
+
+        if self.vendors:
+            any_of('vendor', self.vendors, 'vendor')
+        if self.categories:
+            any_of('category', self.categories, 'category')
+        if self.source_tabs:
+            any_of('source_tab', self.source_tabs, 'tab')
+        if self.statuses:
+            unknown = set(self.statuses) - set(STATUSES)
+            if unknown:
+                raise ValueError(f"Unknown status {sorted(unknown)}; expected one of {STATUSES}")
+            status_clauses = []
+            if 'paid' in self.statuses:
+                status_clauses.append("status_class = 'paid'")
+            if 'overdue' in self.statuses:
+                status_clauses.append("(status_class = 'open' AND due_date < :as_of)")
+            if 'pending' in self.statuses:
+                status_clauses.append("status_class = 'undated'")
+                status_clauses.append("(status_class = 'open' AND due_date >= :as_of)")
+            clauses.append(f"({' OR '.join(status_clauses)})")
+        date_from, date_to = self.received_bounds()
+        if date_from:
+            params['date_from'] = date_from
+            clauses.append('received_date >= :date_from')
+        if date_to:
+            params['date_to'] = date_to
+            clauses.append('received_date < :date_to')
+        if self.amount_min is not None:
+            params['amount_min'] = self.amount_min
+            clauses.append('amount >= :amount_min')
+        if self.amount_max is not None:
+            params['amount_max'] = self.amount_max
+            clauses.append('amount <= :amount_max')
+        return ' AND '.join(clauses) or '1'
+
+    def matches(self, row: Dict[str, Any], as_of: str) -> bool:
+        """Whether a cleaned CSV row passes these filters, as :meth:`where` would."""
+        if self.vendors and (row['Vendor'] or 'Unknown Vendor') not in self.vendors:
+            return False
+        if self.categories and (row['Category'] or 'Uncategorized') not in self.categories:
+            return False
+        if self.source_tabs and row.get('sourceTab') not in self.source_tabs:
+            return False
+        if self.statuses:
+            unknown = set(self.statuses) - set(STATUSES)
+            if unknown:
+                raise ValueError(f"Unknown status {sorted(unknown)}; expected one of {STATUSES}")
+            if payment_status(row, as_of) not in self.statuses:
+                return False
+        date_from, date_to = self.received_bounds()
+        received = row['Received_Date'] or ''
+        if (date_from and received < date_from) or (date_to and received >= date_to):
+            return False
+        if self.amount_min is not None or self.amount_max is not None:
+            # Like SQL, a missing amount never satisfies a bound
+            amount = _amount(row)
+            if amount is None:
+                return False
+            if self.amount_min is not None and amount < self.amount_min:
+                return False
+            if self.amount_max is not None and amount > self.amount_max:
+                return False
+        return True
+
+
+class InvoiceStore:
+    """One SQLite store file; use as a context manager."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        # A server opens the next store in a worker thread and queries it on its loop
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        # Optional in-memory index (see load_index), used by page and facets
+        self.index = None
+
+    def __enter__(self) -> 'InvoiceStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # -- building ---------------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        found = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return found[0] if found else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, json.dumps(value)))
+
+    def describes(self, csv_file: Path) -> bool:
+        """Whether the store holds exactly the rows of ``csv_file`` as it is now."""
+        if self._meta('version') != json.dumps(SCHEMA_VERSION) or not csv_file.exists():
+            return False
+        out = csv_file.stat()
+        return self._meta('output') == json.dumps({'size': out.st_size, 'mtime_ns': out.st_mtime_ns})
+
+    def insert(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Add cleaned CSV rows (dicts) after the existing ones; not committed."""
+        count = 0
+        vendors = []
+        for chunk in _chunks(rows, 10_000):
+            self.conn.executemany(_INSERT, [_store_row(row) for row in chunk])
+            vendors.extend((row['Vendor'] or 'Unknown Vendor', _vendor_email(row['From_Email']))
+                           for row in chunk)
+            count += len(chunk)
+        # The first sender address seen per vendor, as in the facet rollups
+        self.conn.executemany(
+            'INSERT INTO vendors VALUES (?, ?) ON CONFLICT (vendor) DO UPDATE '
+            'SET email = excluded.email WHERE vendors.email IS NULL',
+            [(vendor, email or None) for vendor, email in vendors])
+        return count
+
+    def tap(self, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield ``rows`` unchanged, inserting them on the way through."""
+        buffered: List[Dict[str, Any]] = []
+        for row in rows:
+            buffered.append(row)
+            if len(buffered) == 10_000:
+                self.insert(buffered)
+                buffered = []
+            yield row
+        self.insert(buffered)
+
+    def commit(self, csv_file: Path) -> None:
+        """Record ``csv_file`` as what the store now describes and commit."""
+        self.conn.executescript(INDEXES)
+        out = csv_file.stat()
+        self._set_meta('version', SCHEMA_VERSION)
+        self._set_meta('output', {'size': out.st_size, 'mtime_ns': out.st_mtime_ns})
+        self.conn.commit()
+        self.conn.execute('ANALYZE')
+
+    def rebuild(self, csv_file: Path) -> int:
+        """Replace the contents with every row of ``csv_file``."""
+        self.conn.executescript("""
+            DROP INDEX IF EXISTS invoices_by_received;
+            DROP INDEX IF EXISTS invoices_by_vendor;
+            DROP INDEX IF EXISTS invoices_by_category;
+            DROP INDEX IF EXISTS invoices_by_status;
+            DROP INDEX IF EXISTS invoices_by_amount;
+            DELETE FROM invoices;
+            DELETE FROM vendors;
+            DELETE FROM meta;
+        """)
+        with open_file(csv_file, 'r', newline='', encoding='utf-8') as f:
+            count = self.insert(csv.DictReader(f))
+        # Indexes are built once after the load, which is much faster
+        self.commit(csv_file)
+        return count
+
+    # -- querying ---------------------------------------------------------
+
+    def load_index(self) -> None:
+        """Answer counts, facets and page ids from an in-memory column index.
+
+        Worth it for a long-running reader; the index is a snapshot, so call
+        this again after the store changes.
+        """
+        try:
+            from invoice_index import FacetIndex
+        except ImportError as exc:
+            raise RuntimeError("The in-memory facet index needs NumPy: pip install numpy") from exc
+        self.index = FacetIndex.load(self.conn)
+
+    def page(self, query: InvoiceQuery, page: int = 1, limit: int = 20,
+             sort_by: str = 'receivedDate', sort_order: str = 'desc',
+             as_of: Optional[str] = None) -> Dict[str, Any]:
+        """The ``GET /invoices`` payload: one page of rows, pagination and summary."""
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Unknown sortBy {sort_by!r}; expected one of {tuple(SORT_FIELDS)}")
+        if sort_order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown sortOrder {sort_order!r}; expected 'asc' or 'desc'")
+        page = max(1, page)
+        limit = min(max(1, limit), MAX_LIMIT)
+        params: Dict[str, Any] = {'as_of': as_of or as_of_now()}
+        where = query.where(params)
+
+        sort_column = SORT_FIELDS[sort_by]
+        offset = (page - 1) * limit
+        if self.index is not None:
+            mask = self.index.mask(query, params['as_of'])
+            total, total_amount, paid_amount, overdue_amount, pending_count = \
+                self.index.summary(mask, params['as_of'])
+            seqs = self.index.page(mask, sort_column, sort_order == 'desc', params['as_of'],
+                                   offset, limit)
+        else:
+            total, total_amount, paid_amount, overdue_amount, pending_count = self.conn.execute(f"""
+                SELECT COUNT(*), TOTAL(amount),
+                       TOTAL(CASE WHEN status_class = 'paid' THEN amount END),
+                       TOTAL(CASE WHEN status_class = 'open' AND due_date < :as_of THEN amount END),
+                       TOTAL(CASE WHEN {_PAYMENT_STATUS} = 'pending' THEN 1 END)
+                FROM invoices WHERE {where}""", params).fetchone()
+            seqs = None
+
+        if sort_column == 'payment_status':
+            sort_column = _PAYMENT_STATUS
+        # Ties fall back to the CSV's order: newest first, then insertion order
+        order = f"{sort_column} {sort_order.upper()}, received_date DESC, seq"
+        if sort_column == 'received_date':
+            order = f"received_date {sort_order.upper()}, seq"
+        columns = ', '.join(column for _, column in API_FIELDS)
+        if seqs is None:
+            params.update(limit=limit, offset=offset)
+            cursor = self.conn.execute(f"""
+                SELECT {columns}, {_PAYMENT_STATUS} FROM invoices WHERE seq IN (
+                    SELECT seq FROM invoices WHERE {where} ORDER BY {order}
+                    LIMIT :limit OFFSET :offset)
+                ORDER BY {order}""", params)
+        else:
+            cursor = self.conn.execute(
+                f"SELECT {columns}, {_PAYMENT_STATUS} FROM invoices "
+                f"WHERE seq IN ({', '.join(map(str, seqs))}) ORDER BY {order}", params)
+        invoices = []
+        for values in cursor:
+            invoice = {field: value for (field, _), value in zip(API_FIELDS, values)}
+            invoice['paymentStatus'] = values[-1]
+            invoices.append(invoice)
+
+        total_pages = math.ceil(total / limit)
+        return {
+            'invoices': invoices,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total,
+                'totalPages': total_pages,
+                'hasNext': page < total_pages,
+                'hasPrev': page > 1,
+            },
+            'summary': {
+                'totalAmount': round(total_amount, 2),
+                'paidAmount': round(paid_amount, 2),
+                'overdueAmount': round(overdue_amount, 2),
+                'pendingCount': int(pending_count),
+            },
+        }
+
+    def facets(self, query: InvoiceQuery, as_of: Optional[str] = None) -> Dict[str, Any]:
+        """Facet counts for the filtered rows, shaped like ``invoice-filter-facets.json``."""
+        params: Dict[str, Any] = {'as_of': as_of or as_of_now()}
+        where = query.where(params)
+        conn = self.conn
+
+        if self.index is not None:
+            mask = self.index.mask(query, params['as_of'])
+            found = self.index.facets(mask, params['as_of'])
+            status_counts = found['statuses']
+            categories = found['categories']
+            emails = dict(conn.execute('SELECT vendor, email FROM vendors'))
+            vendors = [(value, emails.get(value), count) for value, count in found['vendors']]
+            (amount_min, amount_max), (date_min, date_max) = found['amount_range'], found['date_range']
+        else:
+            status_counts = dict(conn.execute(
+                f"SELECT {_PAYMENT_STATUS} AS status, COUNT(*) FROM invoices WHERE {where} "
+                f"GROUP BY status", params).fetchall())
+            categories = conn.execute(
+                f"SELECT category, COUNT(*) FROM invoices "
+                f"WHERE {where} GROUP BY category ORDER BY MIN(seq)", params).fetchall()
+            vendors = conn.execute(
+                f"SELECT v.vendor, vendors.email, v.count FROM ("
+                f"  SELECT vendor, COUNT(*) AS count, "
+                f"         MIN(seq) AS first FROM invoices WHERE {where} GROUP BY vendor"
+                f") AS v LEFT JOIN vendors USING (vendor) ORDER BY v.first", params).fetchall()
+            amount_min, amount_max = conn.execute(
+                f"SELECT MIN(amount), MAX(amount) FROM invoices WHERE {where}", params).fetchone()
+            date_min = self._received_bound(where, params, 'ASC')
+            date_max = self._received_bound(where, params, 'DESC')
+
+        vendor_entries = []
+        for value, email, count in vendors:
+            entry: Dict[str, Any] = {'value': value}
+            if email:
+                entry['email'] = email
+            entry['count'] = count
+            vendor_entries.append(entry)
+        return {
+            'facets': {
+                'statuses': [{'value': status, 'count': status_counts[status]}
+                             for status in STATUSES if status_counts.get(status)],
+                'categories': [{'value': value, 'count': count} for value, count in categories],
+                'vendors': vendor_entries,
+                'amountRange': {'min': amount_min or 0, 'max': amount_max or 0},
+                'dateRange': {'min': date_min, 'max': date_max},
+            },
+        }
+
+    def _received_bound(self, where: str, params: Dict[str, Any], order: str) -> Optional[str]:
+        """The first received date of the matches, in ``order``, that names a real day."""
+        # GLOB skips most non-dates cheaply, but ``2025-02-30`` passes it; walk
+        # the sorted dates past any such value, as the index and rollups do
+        for (received,) in self.conn.execute(
+                f"SELECT received_date FROM invoices WHERE {where} "
+                f"AND received_date GLOB '[0-9][0-9][0-9][0-9]-*' "
+                f"ORDER BY received_date {order}", params):
+            if is_iso_date(received):
+                return received
+        return None
+
+    def summary(self, query: InvoiceQuery, as_of: Optional[str] = None,
+                top: int = 5) -> Dict[str, Any]:
+        """The ``GET /dashboard/summary`` payload (``DashboardSummary``) for the filtered rows."""
+        params: Dict[str, Any] = {'as_of': as_of or as_of_now(), 'top': top}
+        where = query.where(params)
+        totals = self.conn.execute(f"""
+            SELECT COUNT(*), TOTAL(amount),
+                   TOTAL(CASE WHEN status = 'paid' THEN amount END),
+                   TOTAL(CASE WHEN status = 'pending' THEN amount END),
+                   TOTAL(CASE WHEN status = 'overdue' THEN amount END),
+                   TOTAL(status = 'paid'), TOTAL(status = 'pending'), TOTAL(status = 'overdue')
+            FROM (SELECT amount, {_PAYMENT_STATUS} AS status FROM invoices WHERE {where})""",
+                                   params).fetchone()
+        count, total, paid, pending, overdue, *by_status = totals
+        vendors = self.conn.execute(
+            f"SELECT vendor, TOTAL(amount) AS amount, COUNT(*) FROM invoices WHERE {where} "
+            f"GROUP BY vendor ORDER BY amount DESC, MIN(seq) LIMIT :top", params).fetchall()
+        return {
+            'totalInvoices': count,
+            'totalAmount': round(total, 2),
+            'paidAmount': round(paid, 2),
+            'pendingAmount': round(pending, 2),
+            'overdueAmount': round(overdue, 2),
+            'paymentStats': {status: int(value)
+                             for status, value in zip(('paid', 'pending', 'overdue'), by_status)},
+            'topVendors': [{'vendor': vendor, 'amount': round(amount, 2), 'count': vendor_count}
+                           for vendor, amount, vendor_count in vendors],
+            # The converted data carries no user activity log
+            'recentActivity': [],
+        }
+
+    def payment_trends(self, query: InvoiceQuery, group_by: str = 'week',
+                       as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+        """``GET /dashboard/charts/payment-trends``: amounts by payment status per period.
+
+        Rows are bucketed by received day into ``day``/``week``/``month``
+        periods, each dated by its first day; undated rows are left out.
+        """
+        params: Dict[str, Any] = {'as_of': as_of or as_of_now()}
+        where = query.where(params)
+        buckets: Dict[str, Dict[str, float]] = {}
+        for received, amount, status in self.conn.execute(
+                f"SELECT received_date, amount, {_PAYMENT_STATUS} FROM invoices "
+                f"WHERE {where} AND received_date GLOB '[0-9][0-9][0-9][0-9]-*'", params):
+            if not is_iso_date(received):
+                continue
+            day = period(received[:10], group_by)
+            if group_by == 'month':
+                day += '-01'
+            bucket = buckets.setdefault(day, {'paid': 0.0, 'pending': 0.0, 'overdue': 0.0})
+            bucket[status] += amount or 0.0
+        return [{'date': day, **{status: round(value, 2) for status, value in bucket.items()}}
+                for day, bucket in sorted(buckets.items())]
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_store(store_file: Path, csv_file: Path) -> int:
+    """Rebuild ``store_file`` from ``csv_file``, via a temporary file swapped in."""
+    tmp = store_file.with_name(store_file.name + '.tmp')
+    for stale in (tmp, Path(f'{tmp}-wal'), Path(f'{tmp}-shm')):
+        stale.unlink(missing_ok=True)
+    with InvoiceStore(tmp) as store:
+        count = store.rebuild(csv_file)
+        store.conn.execute('PRAGMA journal_mode=DELETE')
+    os.replace(tmp, store_file)
+    return count
+
+
+def store_is_current(store_file: Path, csv_file: Path) -> bool:
+    """Whether ``store_file`` exists and holds exactly the rows of ``csv_file``."""
+    if not store_file.exists():
+        return False
+    with InvoiceStore(store_file) as store:
+        return store.describes(csv_file)
+
+
+def _add_query_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--status', action='append', default=[], choices=STATUSES)
+    parser.add_argument('--vendor', action='append', default=[])
+    parser.add_argument('--category', action='append', default=[])
+    parser.add_argument('--source-tab', action='append', default=[])
+    parser.add_argument('--date-from', default=None, help='received on or after (YYYY-MM-DD)')
+    parser.add_argument('--date-to', default=None, help='received on or before (YYYY-MM-DD)')
+    parser.add_argument('--amount-min', type=float, default=None)
+    parser.add_argument('--amount-max', type=float, default=None)
+    parser.add_argument('--as-of', default=None,
+                        help='judge overdue at this ISO time (default: now)')
+    parser.add_argument('--index', action='store_true',
+                        help='answer from the in-memory column index (needs NumPy)')
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', type=Path, default=STORE_FILE,
+                        help='SQLite store (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='rebuild the store from a cleaned CSV')
+    build.add_argument('--csv', type=Path, default=CSV_FILE,
+                       help='cleaned CSV (default: %(default)s)')
+    query = commands.add_parser('query', help='print one page of filtered invoices as JSON')
+    _add_query_arguments(query)
+    query.add_argument('--sort', choices=SORT_FIELDS, default='receivedDate')
+    query.add_argument('--order', choices=('asc', 'desc'), default='desc')
+    query.add_argument('--page', type=int, default=1)
+    query.add_argument('--limit', type=int, default=20)
+    facets = commands.add_parser('facets', help='print facet counts for the filters as JSON')
+    _add_query_arguments(facets)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+    if args.command == 'build':
+        started = time.perf_counter()
+        count = build_store(args.store, args.csv)
+        print(f"Indexed {count:,} invoices into {args.store} "
+              f"in {time.perf_counter() - started:.2f}s")
+        return
+
+    if not args.store.exists():
+        raise RuntimeError(f"No store at {args.store}; run the build command first")
+    query = InvoiceQuery(args.status, args.vendor, args.category, args.source_tab,
+                         args.date_from, args.date_to, args.amount_min, args.amount_max)
+    started = time.perf_counter()
+    with InvoiceStore(args.store) as store:
+        if args.index:
+            store.load_index()
+            print(f"(index loaded in {(time.perf_counter() - started) * 1000:.0f} ms)",
+                  file=sys.stderr)
+            started = time.perf_counter()
+        if args.command == 'query':
+            payload = store.page(query, args.page, args.limit, args.sort, args.order, args.as_of)
+        else:
+            payload = store.facets(query, args.as_of)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(payload, indent=2))
+    print(f"({elapsed * 1000:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Generate synthetic mailbox exports shaped like ``invoice_data_since_2024``.
+
+Produces the same 31 tab-separated columns as the real export with the same
+mix that drives the converter's branches: Xero reminder senders versus
+direct PDFs, a share of rows without a ``file_url``, repeated ``message_id``
+rows (the same email exported again), ``$1,012.00``-style amounts and
+``4-Sep-25`` dates. Vendors follow a skewed distribution like the real
+mailbox, where a couple of suppliers dominate.
+
+Usage:
+    python data/synthetic_invoices.py --rows 100000 --output /tmp/invoices.tsv
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import random
+from collections import deque
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+TSV_COLUMNS = [
+    'invoice_number', 'invoice_date', 'due_date', 'currency', 'subtotal', 'gst_total',
+    'total', 'amount_due', 'supplier_name', 'supplier_abn', 'supplier_email',
+    'customer_name', 'customer_abn', 'bank_bsb', 'bank_account', 'reference_hint',
+    'file_name', 'file_url', 'folder_path', 'file_id', 'folder_id', 'source', 'notes',
+    'confidence', 'line_1_desc', 'line_1_qty', 'line_1_unit_price', 'message_id',
+    'email_subject', 'email_from_name', 'email_from_address',
+]
+
+# Ratios measured on the real export (Sep 2025 snapshot).
+XERO_RATIO = 0.60
+DUPLICATE_RATE = 0.23
+# The snapshot has every file_url filled, but Xero "links only" mails exist in
+# production; keep a small share so that branch is exercised.
+MISSING_FILE_URL_RATIO = 0.05
+MISSING_SUBJECT_RATIO = 0.02
+
+SEED_VENDORS = [
+    'Align.Build Pty Ltd', 'Taxcellent Business Advisors Pty Ltd', 'Marconi Court Pty Ltd',
+    'GAK Ballarat Pty Ltd', 'BLUE SKY BEVERAGES PTY LTD',
+    'Rudra Projects & Developments Pty Ltd', 'NK Business Services Pty Ltd',
+    'Schofields Flying Club Ltd', 'Survey Plus (Tas) Pty Ltd',
+    'Davies Construction (Tas) Pty Ltd',
+]
+CUSTOMERS = ['Rudra projects', 'Luck Street Trust', 'Marconi Court Pty Ltd',
+             'Rudra Projects & Developments Pty Ltd', 'GAK Ballarat Pty Ltd']
+XERO_SENDERS = ['invoicereminders@post.xero.com', 'messaging-service@post.xero.com']
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+SHAREPOINT_ROOT = ('https://rudraprojects-my.sharepoint.com/personal/'
+                   'satyagala_rudraprojects_onmicrosoft_com/Documents/Invoice_Attachments')
+MESSAGE_ID_PREFIX = ('AAMkADQyZmU2Mjk0LTU2YjktNDdhMS05YzE3LWJlNjNkZGQ0MWVhZgBGAAAAAAAckzNzsX2FRYp2'
+                     'SXd_PzQPBwAAVfusFxFLSIhkFoo9H3MfAAAAAAEMAAAAVfusFxFLSIhkFoo9H3MfAAA')
+
+START_DATE = date(2024, 1, 2)
+DATE_SPAN_DAYS = 640
+
+
+def _vendor_pool(count: int) -> List[str]:
+    extra = [f'Synthetic Supplier {i:04d} Pty Ltd' for i in range(max(0, count - len(SEED_VENDORS)))]
+    return (SEED_VENDORS + extra)[:count]
+
+
+def _short_date(value: date) -> str:
+    return f'{value.day}-{MONTH_NAMES[value.month - 1]}-{value.year % 100:02d}'
+
+
+def _money(value: float) -> str:
+    return f'${value:,.2f}'
+
+
+def generate_rows(
+    count: int,
+    seed: int = 2024,
+    vendors: int = 200,
+    xero_ratio: float = XERO_RATIO,
+    duplicate_rate: float = DUPLICATE_RATE,
+    missing_file_url_ratio: float = MISSING_FILE_URL_RATIO,
+    missing_subject_ratio: float = MISSING_SUBJECT_RATIO,
+) -> Iterator[List[str]]:
+    """Yield ``count`` export rows (values in ``TSV_COLUMNS`` order)."""
+    rng = random.Random(seed)
+    pool = _vendor_pool(vendors)
+    # Zipf-like weights: the first couple of vendors dominate, as in the real mailbox.
+    weights = [1.0 / (rank + 1) ** 1.2 for rank in range(len(pool))]
+    recent: deque = deque(maxlen=256)
+    serial = 0
+
+    for _ in range(count):
+        if recent and rng.random() < duplicate_rate:
+            # Same email exported again (reminder threads, re-syncs).
+            yield list(rng.choice(recent))
+            continue
+
+        serial += 1
+        supplier = rng.choices(pool, weights)[0]
+        customer = rng.choice(CUSTOMERS)
+        invoice_number = f'INV-{serial:06d}'
+        issued = START_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+        due = issued + timedelta(days=rng.choice((7, 14, 30)))
+        subtotal = round(rng.lognormvariate(6.5, 1.1), 2)
+        gst = round(subtotal * 0.1, 2)
+        total = subtotal + gst
+        folder = (issued + timedelta(days=2)).isoformat()
+        file_name = f'Invoice {invoice_number}.pdf'
+        is_xero = rng.random() < xero_ratio
+        file_url = ''
+        if rng.random() >= missing_file_url_ratio:
+            file_url = f"{SHAREPOINT_ROOT}/{folder}/{file_name.replace(' ', '%20')}"
+        subject = f'Invoice {invoice_number} from {supplier} for {customer}'
+        if rng.random() < missing_subject_ratio:
+            subject = ''
+        message_id = MESSAGE_ID_PREFIX + base64.urlsafe_b64encode(
+            serial.to_bytes(6, 'big')).decode('ascii') + 'AAA='
+        quantity = rng.choice(('1', '1.75', '5.75', '8'))
+
+        row = [
+            invoice_number, _short_date(issued), _short_date(due), 'AUD',
+            _money(subtotal), _money(gst), _money(total), _money(total), supplier,
+            str(rng.randrange(10 ** 10, 10 ** 11)), '', customer, '',
+            f'{rng.randrange(10 ** 5, 10 ** 6):06d}', f'{rng.randrange(1000, 9999)} 0034', '',
+            file_name, file_url, f'/drive/root:/Invoice_Attachments/{folder}',
+            f'015B23OE{rng.getrandbits(128):032X}'[:34], '015B23OEWATWVPW3ZR3ZDYQVBEYCUAYKUS',
+            'pdf', 'Please make the payment by due date to the below mentioned bank account:',
+            '', 'Invoice period services', quantity, f'{subtotal:.0f}', message_id, subject,
+            '', rng.choice(XERO_SENDERS) if is_xero else '',
+        ]
+        recent.append(row)
+        yield row
+
+
+def write_tsv(path: Path, count: int, seed: int = 2024, **options) -> Path:
+    """Write a synthetic export with ``count`` data rows to ``path``."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('\t'.join(TSV_COLUMNS) + '\n')
+        for row in generate_rows(count, seed=seed, **options):
+            f.write('\t'.join(row) + '\n')
+    return path
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--output', type=Path, required=True)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--vendors', type=int, default=200)
+    parser.add_argument('--xero-ratio', type=float, default=XERO_RATIO)
+    parser.add_argument('--duplicate-rate', type=float, default=DUPLICATE_RATE)
+    parser.add_argument('--missing-file-url-ratio', type=float, default=MISSING_FILE_URL_RATIO)
+    args = parser.parse_args(argv)
+
+    write_tsv(args.output, args.rows, seed=args.seed, vendors=args.vendors,
+              xero_ratio=args.xero_ratio, duplicate_rate=args.duplicate_rate,
+              missing_file_url_ratio=args.missing_file_url_ratio)
+    print(f"Wrote {args.rows:,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""The data/ scripts import each other as top-level modules, as they do when run."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,98 @@
+import base64
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from api_server import ApiServer
+
+CSV_FILE = Path(__file__).resolve().parent.parent / 'invoices_cleaned_2024.csv'
+
+
+@pytest.fixture
+def server(tmp_path):
+    csv_file = tmp_path / 'invoices.csv'
+    shutil.copy(CSV_FILE, csv_file)
+    server = ApiServer(csv_file, tmp_path / 'invoices.sqlite', tmp_path / 'invoices.rollups')
+    yield server
+    server.dataset.close()
+
+
+def _get(server, target):
+    head, _, body = server.respond('GET', target, {}).partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def _cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', ['NQ', _cursor({'offset': 20}), _cursor([1, 2]), 'not base64!'])
+def test_malformed_cursor_is_a_400(server, cursor):
+    status, payload = _get(server, f'/api/v1/invoices?limit=5&cursor={cursor}')
+    assert status == 400
+    assert payload['error']['code'] == 'INVALID_CURSOR'
+
+
+def test_issued_cursor_pages_on(server):
+    status, first = _get(server, '/api/v1/invoices?limit=5')
+    assert status == 200
+    cursor = first['data']['pagination']['nextCursor']
+    status, second = _get(server, f'/api/v1/invoices?limit=5&cursor={cursor}')
+    assert status == 200
+    assert second['data']['pagination']['page'] == 2
+
+
+def _expected_rows(csv_file, as_of, since):
+    import csv
+    from invoice_store import _amount, payment_status
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        return [(row['Received_Date'][:10], _amount(row) or 0.0, payment_status(row, as_of),
+                 row['Vendor'] or 'Unknown Vendor')
+                for row in csv.DictReader(f) if row['Received_Date'] >= since]
+
+
+def test_documented_dashboard_summary(server):
+    as_of = '2025-09-30T00:00:00.000Z'
+    payload = server._route('/api/v1/dashboard/summary', (('period', '90d'),), as_of)
+    assert payload['success'] is True
+    data = payload['data']
+    rows = _expected_rows(server.csv_file, as_of, '2025-07-02')
+    assert data['totalInvoices'] == len(rows) > 0
+    assert data['totalAmount'] == round(sum(amount for _, amount, _, _ in rows), 2)
+    for status in ('paid', 'pending', 'overdue'):
+        assert data['paymentStats'][status] == sum(1 for row in rows if row[2] == status)
+        assert data[f'{status}Amount'] == round(sum(a for _, a, s, _ in rows if s == status), 2)
+    top = data['topVendors'][0]
+    assert top['amount'] == max(round(sum(a for _, a, _, v in rows if v == vendor), 2)
+                                for vendor in {row[3] for row in rows})
+
+
+def test_documented_payment_trends(server):
+    as_of = '2025-09-30T00:00:00.000Z'
+    payload = server._route('/api/v1/dashboard/charts/payment-trends',
+                            (('groupBy', 'month'), ('period', '1y')), as_of)
+    rows = _expected_rows(server.csv_file, as_of, '2024-09-30')
+    months = sorted({day[:7] for day, _, _, _ in rows})
+    assert [point['date'] for point in payload['data']] == [f'{month}-01' for month in months]
+    assert round(sum(point['paid'] + point['pending'] + point['overdue']
+                     for point in payload['data']), 2) == round(sum(row[1] for row in rows), 2)
+
+
+@pytest.mark.parametrize('target', ['/api/v1/stats', '/api/stats', '/api/v1/invoices/facets',
+                                    '/api/v1/dashboard/summary', '/api/dashboard/summary',
+                                    '/api/v1/dashboard/charts/payment-trends?groupBy=day'])
+def test_every_endpoint_wraps_its_body(server, target):
+    status, payload = _get(server, target)
+    assert status == 200
+    assert payload['success'] is True and 'data' in payload
+
+
+@pytest.mark.parametrize('target', ['/api/v1/dashboard/summary?period=2d',
+                                    '/api/v1/dashboard/charts/payment-trends?groupBy=year',
+                                    '/api/v1/dashboard/summary?vendor=Acme'])
+def test_dashboard_parameters_are_validated(server, target):
+    status, payload = _get(server, target)
+    assert status == 400
+    assert payload['error']['code'] == 'VALIDATION_ERROR'
@@ -0,0 +1,70 @@
+import pytest
+
+import change_capture
+from change_capture import ChangeCapture, read_delta
+
+FIELDNAMES = ['Email_ID', 'Vendor', 'Amount']
+
+
+def capture(changes, rows, chunk_rows=2):
+    with ChangeCapture(changes) as cdc:
+        run = cdc.capture(iter(rows), FIELDNAMES, 'test', chunk_rows=chunk_rows)
+    header, *lines = read_delta(changes / run.delta_file)
+    return run, header, lines
+
+
+def test_first_capture_inserts_every_row(tmp_path):
+    rows = [['m1', 'Acme', '10'], ['m2', 'Bolt', '5'], ['m3', 'Crane', '7']]
+    run, header, lines = capture(tmp_path, rows)
+    assert run.previous_run_id is None
+    assert header['counts'] == {'insert': 3, 'update': 0, 'delete': 0, 'unchanged': 0}
+    assert header['fieldnames'] == FIELDNAMES
+    assert lines[0] == {'op': 'insert', 'key': 'm1',
+                        'row': {'Email_ID': 'm1', 'Vendor': 'Acme', 'Amount': '10'}}
+
+
+def test_second_capture_reports_inserts_updates_and_deletes(tmp_path):
+    first, _, _ = capture(tmp_path, [['m1', 'Acme', '10'], ['m2', 'Bolt', '5'],
+                                     ['m3', 'Crane', '7']])
+    run, header, lines = capture(tmp_path, [['m1', 'Acme', '10'], ['m3', 'Crane', '8'],
+                                            ['m4', 'Delta', '1']])
+    assert header['previousRunId'] == first.run_id
+    assert header['counts'] == {'insert': 1, 'update': 1, 'delete': 1, 'unchanged': 1}
+    assert [(line['op'], line['key']) for line in lines] == [
+        ('update', 'm3'), ('insert', 'm4'), ('delete', 'm2')]
+    assert lines[0]['row']['Amount'] == '8'
+
+    _, header, lines = capture(tmp_path, [['m1', 'Acme', '10'], ['m3', 'Crane', '8'],
+                                          ['m4', 'Delta', '1']])
+    assert lines == [] and header['counts']['unchanged'] == 3
+
+
+def test_repeated_and_missing_keys(tmp_path):
+    # Duplicates straddle a chunk boundary; suffixes still follow file order
+    rows = [['m1', 'Acme', '1'], ['m1', 'Acme', '2'], ['m1', 'Acme', '3'], ['', 'Anon', '4']]
+    _, _, lines = capture(tmp_path, rows)
+    keys = [line['key'] for line in lines]
+    assert keys[:3] == ['m1', 'm1#2', 'm1#3'] and keys[3].startswith('#')
+
+    # A keyless row is keyed by its hash, so editing it is a delete plus an insert
+    edited = rows[:3] + [['', 'Anon', '5']]
+    _, header, lines = capture(tmp_path, edited)
+    assert header['counts'] == {'insert': 1, 'update': 0, 'delete': 1, 'unchanged': 3}
+    assert [line['op'] for line in lines] == ['insert', 'delete']
+
+
+def test_failed_capture_leaves_the_index_and_no_delta(tmp_path, monkeypatch):
+    capture(tmp_path, [['m1', 'Acme', '10']])
+
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(change_capture.os, 'replace', fail)
+    with pytest.raises(OSError):
+        capture(tmp_path, [['m2', 'Bolt', '5']])
+    monkeypatch.undo()
+
+    assert len(list(tmp_path.glob('*.jsonl'))) == 1
+    assert not list(tmp_path.glob('*.tmp')) and not list(tmp_path.glob('*.body'))
+    _, header, _ = capture(tmp_path, [['m2', 'Bolt', '5']])
+    assert header['counts'] == {'insert': 1, 'update': 0, 'delete': 1, 'unchanged': 0}
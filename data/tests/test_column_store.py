@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import column_store
+from column_store import ColumnStore, ColumnStoreWriter
+
+FIELDNAMES = ['Email_ID', 'Vendor', 'Amount']
+
+
+def test_rows_are_flushed_in_chunks_and_read_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(column_store, 'FLUSH_ROWS', 4)
+    rows = [{'Email_ID': f'm{i}', 'Vendor': ['Acme', 'Bolt', None][i % 3], 'Amount': i * 1.5}
+            for i in range(11)]
+    writer = ColumnStoreWriter(tmp_path / 'out.columns', FIELDNAMES)
+    for row in rows:
+        writer.append(row)
+        # Nothing beyond one chunk per column is held in memory
+        assert len(writer.builders['Email_ID'].offsets.buffer) < 4
+        assert len(writer.builders['Amount'].values.buffer) < 4
+    writer.close()
+
+    store = ColumnStore.open(tmp_path / 'out.columns')
+    assert len(store) == 11
+    assert list(store.rows()) == [{'Email_ID': row['Email_ID'], 'Vendor': row['Vendor'] or '',
+                                   'Amount': row['Amount']} for row in rows]
+    assert store['Amount'][store['Vendor'].mask('Bolt')].sum() == 1.5 * (1 + 4 + 7 + 10)
+    assert not (tmp_path / 'out.columns.tmp').exists()
+
+
+def test_abort_leaves_the_previous_store(tmp_path):
+    writer = ColumnStoreWriter(tmp_path / 'out.columns', FIELDNAMES)
+    writer.append({'Email_ID': 'm1', 'Vendor': 'Acme', 'Amount': 1})
+    writer.close()
+    writer = ColumnStoreWriter(tmp_path / 'out.columns', FIELDNAMES)
+    writer.append({'Email_ID': 'm2', 'Vendor': 'Bolt', 'Amount': 2})
+    writer.abort()
+    assert [row['Email_ID'] for row in ColumnStore.open(tmp_path / 'out.columns').rows()] == ['m1']
+    assert not (tmp_path / 'out.columns.tmp').exists()
@@ -0,0 +1,71 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from compressed_io import (compress_file, decompress_file, detect_codec, open_file, plain_path,
+                           resolve)
+from convert_invoices import convert_batch
+
+EXPORT = Path(__file__).resolve().parent.parent / 'invoice_data_since_2024'
+TEXT = 'Email_ID,Vendor\r\nm1,Ácme\r\nm2,"Bolt, Inc"\r\n' * 100
+
+
+@pytest.fixture(params=['gzip', 'zstd'])
+def codec(request):
+    if request.param == 'zstd':
+        pytest.importorskip('zstandard')
+    return request.param
+
+
+def _suffix(codec):
+    return '.gz' if codec == 'gzip' else '.zst'
+
+
+def test_text_round_trip(tmp_path, codec):
+    path = tmp_path / f'out.csv{_suffix(codec)}'
+    with open_file(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(TEXT)
+    assert detect_codec(path) == codec
+    with open_file(path, 'r', encoding='utf-8', newline='') as f:
+        assert f.read() == TEXT
+    # Magic bytes win over the name, and .tmp names take the real file's codec
+    renamed = tmp_path / 'renamed.csv'
+    shutil.copy(path, renamed)
+    with open_file(renamed, 'r', encoding='utf-8', newline='') as f:
+        assert f.read() == TEXT
+    with open_file(tmp_path / f'next.csv{_suffix(codec)}.tmp', 'w', encoding='utf-8') as f:
+        f.write('x')
+    assert detect_codec(tmp_path / f'next.csv{_suffix(codec)}.tmp') == codec
+
+
+def test_appends_are_read_back_in_order(tmp_path, codec):
+    path = tmp_path / f'grown.tsv{_suffix(codec)}'
+    for part in ('header\n', 'a\n', 'b\n'):
+        with open_file(path, 'a', encoding='utf-8') as f:
+            f.write(part)
+    with open_file(path, 'r', encoding='utf-8') as f:
+        assert f.readlines() == ['header\n', 'a\n', 'b\n']
+
+
+def test_compress_and_decompress_files(tmp_path, codec):
+    original = tmp_path / 'export.tsv'
+    shutil.copy(EXPORT, original)
+    packed, before, after = compress_file(original, codec, remove=True)
+    assert packed.name == 'export.tsv' + _suffix(codec)
+    assert not original.exists() and after < before
+    assert resolve(original) == packed and plain_path(packed) == original
+    with pytest.raises(ValueError):
+        compress_file(packed, codec)
+    restored, _, _ = decompress_file(packed)
+    assert restored.read_bytes() == EXPORT.read_bytes()
+
+
+def test_converter_reads_and_writes_compressed_files(tmp_path, codec):
+    packed, _, _ = compress_file(shutil.copy(EXPORT, tmp_path / 'export.tsv'), codec, remove=True)
+    convert_batch(EXPORT, tmp_path / 'plain.csv')
+    output = tmp_path / f'cleaned.csv{_suffix(codec)}'
+    convert_batch(packed, output)
+    assert detect_codec(output) == codec
+    with open_file(output, 'rb') as f:
+        assert f.read() == (tmp_path / 'plain.csv').read_bytes()
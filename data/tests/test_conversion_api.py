@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from conversion_api import InvoiceConverter, ConvertOptions
+
+HEADER = 'message_id\tinvoice_number\tsupplier_name\tinvoice_date\ttotal\n'
+
+
+def export(*rows):
+    return io.StringIO(HEADER + ''.join('\t'.join(row) + '\n' for row in rows))
+
+
+class FailingSink(io.StringIO):
+    def write(self, text):
+        if 'm2' in text:
+            raise OSError('disk full')
+        return super().write(text)
+
+
+def test_failed_convert_does_not_mark_messages_seen():
+    converter = InvoiceConverter(ConvertOptions(dedup_across_calls=True, sort=False))
+    rows = (('m1', 'A-1', 'Acme', '2025-09-01', '10'), ('m2', 'B-2', 'Bolt', '2025-09-02', '20'))
+    with pytest.raises(OSError):
+        converter.convert(export(*rows), FailingSink())
+    assert not converter.seen_message_ids
+
+    stats = converter.convert(export(*rows), io.StringIO())
+    assert stats.written == 2
+    assert converter.convert(export(*rows), io.StringIO()).written == 0
+
+
+def test_iter_rows_remembers_messages_once_consumed():
+    converter = InvoiceConverter(ConvertOptions(dedup_across_calls=True))
+    rows = converter.iter_rows(export(('m1', 'A-1', 'Acme', '2025-09-01', '10')))
+    assert not converter.seen_message_ids
+    assert [row['Email_ID'] for row in rows] == ['m1']
+    assert list(converter.iter_rows(export(('m1', 'A-1', 'Acme', '2025-09-01', '10')))) == []
+
+
+def test_iter_rows_refuses_keep_latest_and_never_leaks_the_sequence_tag():
+    converter = InvoiceConverter()
+    with pytest.raises(ValueError, match='keep-latest'):
+        converter.iter_rows(export(), duplicates='keep-latest')
+    rows = list(converter.iter_rows(export(('m1', 'A-1', 'Acme', '2025-09-01', '10'),
+                                           ('m2', 'A-1', 'Acme', '2025-09-03', '10')),
+                                    duplicates='flag'))
+    assert [row['Duplicate_Of'] for row in rows] == ['', 'm1']
+    assert all(not name.startswith('_') for row in rows for name in row)
@@ -0,0 +1,13 @@
+import pytest
+
+from convert_invoices import parse_amount
+
+
+@pytest.mark.parametrize('raw', ['nan', 'inf', '-Infinity'])
+def test_parse_amount_rejects_non_finite_values(raw):
+    assert parse_amount(raw) == (0.0, False)
+
+
+def test_parse_amount_strips_currency_formatting():
+    assert parse_amount('$1,234.50') == (1234.5, True)
+    assert parse_amount('') == (0.0, True)
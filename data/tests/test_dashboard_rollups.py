@@ -0,0 +1,12 @@
+import json
+
+from dashboard_rollups import TRENDS_FILE, DashboardRollups
+
+
+def test_invalid_received_date_does_not_break_trends(tmp_path):
+    rollups = DashboardRollups()
+    rollups.add(100.0, '', '2025-09-01T00:00:00.000Z', 'standard_pdf', 'Acme', '', 'Processed')
+    rollups.add(50.0, '', '2025-02-30T00:00:00.000Z', 'standard_pdf', 'Acme', '', 'Processed')
+    rollups.write(tmp_path, '2025-09-10T00:00:00.000Z')
+    trends = json.loads((tmp_path / TRENDS_FILE).read_text())
+    assert trends['series']['month']['all'] == [{'period': '2025-09', 'count': 1, 'amount': 100.0}]
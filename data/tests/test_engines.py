@@ -0,0 +1,89 @@
+"""The row engine is compiled from mappings/mailbox.json; the compact and
+columnar engines implement the same rules by hand and must agree with it."""
+
+import copy
+from pathlib import Path
+
+import pytest
+
+import convert_invoices
+from column_mapping import MAILBOX_SPEC, load_spec, spec_digest
+from convert_invoices import (HAND_WRITTEN_MAPPING_DIGEST, convert_batch, convert_columnar,
+                              convert_compact, parse_args)
+
+pytest.importorskip('numpy')
+
+DATA_DIR = Path(__file__).resolve().parent.parent
+RUN_TIMESTAMP = '2030-01-01T00:00:00.000Z'
+HEADER = (DATA_DIR / 'invoice_data_since_2024').read_text(encoding='utf-8').split('\n', 1)[0]
+
+# One row per rule branch in mailbox.json
+ROWS = [
+    {'message_id': 'm1', 'email_from_address': 'billing@acme.com', 'supplier_name': 'Acme',
+     'invoice_number': 'A-1', 'invoice_date': '2025-09-01', 'due_date': '2025-09-30',
+     'total': '$1,200.50', 'file_url': 'https://onedrive/a1.pdf', 'email_subject': 'Invoice A-1'},
+    {'message_id': 'm2', 'email_from_address': 'messaging-service@post.XERO.com',
+     'supplier_name': 'Bolt', 'invoice_number': 'B-7', 'invoice_date': '03/08/2025',
+     'total': '99', 'file_url': 'https://onedrive/b7.pdf'},
+    {'message_id': 'm3', 'email_from_address': 'no-reply@xero.com', 'email_from_name': 'Crane',
+     'invoice_number': 'C-2', 'invoice_date': '2025-02-30', 'due_date': 'soon', 'total': 'nan'},
+    {'message_id': 'm4', 'email_from_address': 'no-reply@xero.com', 'invoice_number': '',
+     'invoice_date': '', 'total': 'inf', 'customer_name': 'RPD'},
+    {'message_id': 'm5', 'email_from_address': 'ap@delta.com', 'email_from_name': 'Delta Ltd',
+     'invoice_number': 'D-9', 'invoice_date': '45900', 'total': 'twelve'},
+    {'message_id': 'm1', 'supplier_name': 'Duplicate', 'invoice_date': '2025-09-02'},
+    {'message_id': '', 'supplier_name': 'Acme', 'invoice_date': '1 Sep 2025', 'total': '-5'},
+]
+
+
+def write_export(path, columns):
+    lines = ['\t'.join(columns)]
+    lines += ['\t'.join(row.get(name, '') for name in columns) for row in ROWS]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def export(tmp_path):
+    return write_export(tmp_path / 'export.tsv', HEADER.split('\t'))
+
+
+def _summary(stats):
+    return (dict(stats.category_stats), dict(stats.status_stats), dict(stats.vendor_stats),
+            dict(stats.parse_failures), round(stats.total_amount, 2), stats.written)
+
+
+@pytest.mark.parametrize('source', ['handcrafted', 'no email_from_name', 'mailbox export'])
+def test_all_engines_match_the_compiled_spec(source, export, tmp_path):
+    if source == 'handcrafted':
+        input_file = export
+    elif source == 'no email_from_name':
+        columns = [name for name in HEADER.split('\t') if name != 'email_from_name']
+        input_file = write_export(tmp_path / 'no_from_name.tsv', columns)
+    else:
+        input_file = DATA_DIR / 'invoice_data_since_2024'
+    results = {}
+    for name, convert in (('rows', convert_batch), ('compact', convert_compact),
+                          ('columnar', convert_columnar)):
+        output = tmp_path / f'{name}.csv'
+        # Rows without an invoice date take the run timestamp; pin it so runs agree
+        stats = convert(input_file, output, run_timestamp=RUN_TIMESTAMP)
+        results[name] = (output.read_bytes(), _summary(stats))
+    assert results['compact'] == results['rows']
+    assert results['columnar'] == results['rows']
+
+
+def test_shipped_spec_is_the_one_the_hand_written_engines_implement():
+    assert spec_digest(load_spec(MAILBOX_SPEC)) == HAND_WRITTEN_MAPPING_DIGEST
+
+
+def test_changed_spec_refuses_the_hand_written_engines(monkeypatch, export, tmp_path):
+    changed = copy.deepcopy(convert_invoices.MAILBOX_MAPPING)
+    changed['fields']['Vendor']['fallback']['default'] = 'Unknown Supplier'
+    monkeypatch.setattr(convert_invoices, 'MAILBOX_MAPPING', changed)
+    for engine in ('compact', 'columnar'):
+        with pytest.raises(SystemExit):
+            parse_args(['--engine', engine])
+    with pytest.raises(RuntimeError, match='mailbox.json has changed'):
+        convert_compact(export, tmp_path / 'out.csv')
+    assert parse_args(['--engine', 'rows']).engine == 'rows'
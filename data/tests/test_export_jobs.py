@@ -0,0 +1,76 @@
+import csv
+import gzip
+from pathlib import Path
+
+import pytest
+
+from export_jobs import ExportWorker, JobQueue, job_query, run_job
+
+CSV_FILE = Path(__file__).resolve().parent.parent / 'invoices_cleaned_2024.csv'
+
+
+def _csv_rows():
+    with open(CSV_FILE, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _exported(job):
+    with gzip.open(job.file_path, 'rt', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def test_job_runs_from_pending_to_completed(tmp_path):
+    queue = JobQueue(tmp_path)
+    job = queue.enqueue({'dateFrom': '2025-01-01', 'amountRange': {'min': 1000}})
+    assert queue.load(job.id).status == 'pending'
+
+    assert run_job(tmp_path, job.id, CSV_FILE, chunk_rows=7) == 'completed'
+    job = queue.load(job.id)
+    assert job.started_at and job.completed_at and job.error_message is None
+    expected = [row['Email_ID'] for row in _csv_rows()
+                if row['Received_Date'] >= '2025-01-01' and float(row['Amount']) >= 1000]
+    exported = _exported(job)
+    assert [row['Email_ID'] for row in exported] == expected
+    assert job.row_count == len(expected) > 0
+    assert set(exported[0]) >= {'Email_ID', 'Payment_Status'}
+    assert list(queue.files_dir.iterdir()) == [Path(job.file_path)]
+
+
+def test_search_and_mixed_filter_shapes(tmp_path):
+    vendor = _csv_rows()[0]['Vendor']
+    queue = JobQueue(tmp_path)
+    job = queue.enqueue({'vendor': vendor, 'vendors': ['No Such Vendor'],
+                         'search': vendor.split()[0].upper()})
+    run_job(tmp_path, job.id, CSV_FILE)
+    exported = _exported(queue.load(job.id))
+    assert exported and {row['Vendor'] for row in exported} == {vendor}
+
+
+def test_failed_job_records_the_error_and_leaves_no_file(tmp_path):
+    queue = JobQueue(tmp_path)
+    job = queue.enqueue({})
+    assert run_job(tmp_path, job.id, tmp_path / 'missing.csv') == 'failed'
+    job = queue.load(job.id)
+    assert job.error_message.startswith('FileNotFoundError')
+    assert job.file_path is None and job.completed_at
+    assert list(queue.files_dir.iterdir()) == []
+
+
+def test_unknown_status_is_rejected_at_enqueue(tmp_path):
+    with pytest.raises(ValueError):
+        JobQueue(tmp_path).enqueue({'status': 'late'})
+    assert job_query({'statuses': ['Overdue']})[0].statuses == ['overdue']
+
+
+def test_worker_requeues_interrupted_jobs_and_drains_the_queue(tmp_path):
+    queue = JobQueue(tmp_path)
+    interrupted = queue.enqueue({})
+    interrupted.status, interrupted.row_count = 'processing', 40
+    queue.save(interrupted)
+    queued = queue.enqueue({'status': 'overdue'})
+
+    ExportWorker(queue, CSV_FILE, concurrency=2).run(once=True)
+    jobs = {job.id: job for job in queue.jobs()}
+    assert {job.status for job in jobs.values()} == {'completed'}
+    assert jobs[interrupted.id].row_count == len(_csv_rows())
+    assert Path(jobs[queued.id].file_path).exists()
@@ -0,0 +1,51 @@
+import random
+from pathlib import Path
+
+import external_sort
+from convert_invoices import convert_batch, convert_streaming
+from external_sort import external_sort as sort_rows
+
+DATA_DIR = Path(__file__).resolve().parent.parent
+
+
+def _rows(count, seed=7):
+    rng = random.Random(seed)
+    # Few distinct keys, so stability is visible through the sequence numbers
+    return [{'key': rng.randrange(20), 'seq': seq} for seq in range(count)]
+
+
+def test_tiny_budget_spills_runs_and_merges_them_stably(tmp_path):
+    rows = _rows(500)
+    sorted_iter = sort_rows(iter(rows), key=lambda row: row['key'], reverse=True,
+                            memory_budget=2000, tmp_dir=str(tmp_path))
+    first = next(sorted_iter)
+    (workdir,) = tmp_path.iterdir()
+    assert len(list(workdir.iterdir())) > 1
+    assert [first, *sorted_iter] == sorted(rows, key=lambda row: row['key'], reverse=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_run_counts_above_the_fan_in_merge_in_passes(tmp_path, monkeypatch):
+    monkeypatch.setattr(external_sort, 'MAX_FAN_IN', 3)
+    rows = _rows(200, seed=11)
+    result = list(sort_rows(rows, key=lambda row: row['key'], memory_budget=1,
+                            tmp_dir=str(tmp_path)))
+    assert result == sorted(rows, key=lambda row: row['key'])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_input_within_the_budget_never_touches_disk(tmp_path):
+    rows = _rows(50)
+    sorted_iter = sort_rows(rows, key=lambda row: row['key'], tmp_dir=str(tmp_path))
+    first = next(sorted_iter)
+    (workdir,) = tmp_path.iterdir()
+    assert list(workdir.iterdir()) == []
+    assert [first, *sorted_iter] == sorted(rows, key=lambda row: row['key'])
+
+
+def test_streaming_with_a_zero_budget_matches_the_batch_output(tmp_path):
+    input_file = DATA_DIR / 'invoice_data_since_2024'
+    convert_batch(input_file, tmp_path / 'batch.csv')
+    convert_streaming(input_file, tmp_path / 'stream.csv', memory_budget_mb=0,
+                      tmp_dir=str(tmp_path))
+    assert (tmp_path / 'stream.csv').read_bytes() == (tmp_path / 'batch.csv').read_bytes()
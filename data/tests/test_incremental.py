@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from convert_invoices import convert_batch, convert_incremental
+
+DATA_DIR = Path(__file__).resolve().parent.parent
+EXPORT = DATA_DIR / 'invoice_data_since_2024'
+
+
+def _lines():
+    return EXPORT.read_bytes().splitlines(keepends=True)
+
+
+def test_resumed_runs_match_a_full_conversion(tmp_path):
+    lines = _lines()
+    input_file = tmp_path / 'export.tsv'
+    output = tmp_path / 'out.csv'
+    checkpoint = tmp_path / 'checkpoint.db'
+
+    # Grow the export in three appends, converting after each one; rows 54 and
+    # 55 share a message id, so the first cut splits a duplicate pair
+    for cut in (55, 120, len(lines)):
+        input_file.write_bytes(b''.join(lines[:cut]))
+        convert_incremental(input_file, output, checkpoint, tmp_dir=str(tmp_path))
+    resumed = convert_incremental(input_file, output, checkpoint, tmp_dir=str(tmp_path))
+
+    convert_batch(input_file, tmp_path / 'full.csv')
+    assert output.read_bytes() == (tmp_path / 'full.csv').read_bytes()
+    assert resumed.original == 0
+
+
+def test_rewritten_export_is_converted_from_scratch(tmp_path):
+    lines = _lines()
+    input_file = tmp_path / 'export.tsv'
+    output = tmp_path / 'out.csv'
+    checkpoint = tmp_path / 'checkpoint.db'
+
+    input_file.write_bytes(b''.join(lines[:120]))
+    convert_incremental(input_file, output, checkpoint, tmp_dir=str(tmp_path))
+    # Drop early rows instead of appending: the checkpoint no longer applies
+    input_file.write_bytes(b''.join(lines[:1] + lines[60:]))
+    stats = convert_incremental(input_file, output, checkpoint, tmp_dir=str(tmp_path))
+
+    convert_batch(input_file, tmp_path / 'full.csv')
+    assert output.read_bytes() == (tmp_path / 'full.csv').read_bytes()
+    assert stats.original == len(lines) - 60
@@ -0,0 +1,40 @@
+import csv
+
+import pytest
+
+pytest.importorskip('openpyxl')
+from openpyxl import Workbook
+
+from ingest_sources import Source, ingest
+
+HEADER = ['message_id', 'invoice_number', 'supplier_name', 'invoice_date', 'total']
+
+
+def write_workbook(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Xero only'
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def test_same_sheet_title_in_two_workbooks_keeps_separate_provenance(tmp_path):
+    current = write_workbook(tmp_path / 'current_invoices.xlsx',
+                             [['m1', 'A-1', 'Acme', '2025-09-01', 10]])
+    drop = write_workbook(tmp_path / '2025-09-09-current-invoices.xlsx',
+                          [['m1', 'A-1', 'Acme', '2025-09-01', 10],
+                           ['m2', 'B-2', 'Bolt', '2025-09-02', 20]])
+    output = tmp_path / 'merged.csv'
+    stats, per_tab = ingest([Source(current, 'Xero only'), Source(drop, 'Xero only')],
+                            output, workers=1)
+
+    assert per_tab == {'current_invoices/Xero only': {'read': 1, 'kept': 1},
+                       '2025-09-09-current-invoices/Xero only': {'read': 2, 'kept': 1}}
+    with open(output, newline='', encoding='utf-8') as f:
+        tabs = {row['Email_ID']: row['sourceTab'] for row in csv.DictReader(f)}
+    assert tabs == {'m1': 'current_invoices/Xero only',
+                    'm2': '2025-09-09-current-invoices/Xero only'}
+    assert stats.duplicates == 1
@@ -0,0 +1,26 @@
+from invoice_dates import is_iso_date, parse_date
+
+
+def test_iso_timestamps_keep_their_clock():
+    assert parse_date('2025-09-04') == ('2025-09-04T00:00:00.000Z', True)
+    assert parse_date('2025-09-04T10:30') == ('2025-09-04T10:30:00.000Z', True)
+    assert parse_date('2025-09-04 10:30:15') == ('2025-09-04T10:30:15.000Z', True)
+    assert parse_date('2025-09-04T10:30:15.123Z') == ('2025-09-04T10:30:15.000Z', True)
+
+
+def test_iso_offsets_and_trailing_text_are_failures():
+    for raw in ('2025-09-04T10:00:00+10:00', '2025-09-04T10:00:00garbage',
+                '2025-09-04T10:00:61', '2025-09-04T10:00:00.'):
+        assert parse_date(raw) == (raw, False)
+
+
+def test_unknown_month_name_is_a_failure():
+    assert parse_date('4-Sep-25') == ('2025-09-04T00:00:00.000Z', True)
+    assert parse_date('4-Foo-25') == ('4-Foo-25', False)
+
+
+def test_is_iso_date_rejects_days_that_do_not_exist():
+    assert is_iso_date('2024-02-29T00:00:00.000Z')
+    assert not is_iso_date('2025-13-01T00:00:00.000Z')
+    assert not is_iso_date('2025-02-30T00:00:00.000Z')
+    assert not is_iso_date('4-Sep-25')
@@ -0,0 +1,64 @@
+import csv
+import sqlite3
+
+from change_capture import capture_csv
+from convert_invoices import FIELDNAMES
+from invoice_loader import apply_changes, load_csv
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({name: row.get(name, '') for name in FIELDNAMES})
+    return path
+
+
+def table(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute('SELECT invoice_key, total, supplier_name, due_date '
+                            'FROM invoices ORDER BY invoice_key').fetchall()
+
+
+ROWS = [
+    {'Email_ID': 'm1', 'Amount': '10.5', 'Vendor': 'Acme', 'Due_Date': '2025-09-30T00:00:00.000Z'},
+    {'Email_ID': 'm1', 'Amount': '4', 'Vendor': 'Acme', 'Due_Date': ''},
+    {'Email_ID': 'm2', 'Amount': 'nan', 'Vendor': 'Bolt', 'Due_Date': '2025-02-30T00:00:00.000Z'},
+    {'Email_ID': 'm3', 'Amount': '7', 'Vendor': 'Crane', 'Due_Date': '31/09/2025'},
+]
+
+
+def test_load_is_idempotent(tmp_path):
+    csv_file = write_csv(tmp_path / 'cleaned.csv', ROWS)
+    db = tmp_path / 'dashboard.sqlite'
+    assert load_csv(str(db), csv_file, batch_rows=2).upserted == 4
+    loaded = table(db)
+    # Repeated Email_IDs get #n suffixes; dates that aren't real days load as NULL
+    assert [key for key, *_ in loaded] == ['m1', 'm1#2', 'm2', 'm3']
+    assert loaded[0] == ('m1', 10.5, 'Acme', '2025-09-30T00:00:00.000Z')
+    assert loaded[2][3] is None and loaded[3][3] is None
+
+    assert load_csv(f'sqlite:///{db}', csv_file).upserted == 4
+    assert table(db) == loaded
+
+
+def test_apply_keeps_the_table_equal_to_a_fresh_load(tmp_path):
+    csv_file = write_csv(tmp_path / 'cleaned.csv', ROWS)
+    changes = tmp_path / 'changes'
+    db = tmp_path / 'dashboard.sqlite'
+    capture_csv(csv_file, changes)
+    first = apply_changes(str(db), changes)
+    assert (first.runs, first.upserted, first.deleted) == (1, 4, 0)
+
+    updated = [dict(ROWS[0], Amount='11'), ROWS[1], ROWS[3],
+               {'Email_ID': 'm4', 'Amount': '3', 'Vendor': 'Delta'}]
+    write_csv(csv_file, updated)
+    capture_csv(csv_file, changes)
+    second = apply_changes(str(db), changes)
+    assert (second.runs, second.upserted, second.deleted) == (1, 2, 1)
+
+    fresh = tmp_path / 'fresh.sqlite'
+    load_csv(str(fresh), csv_file)
+    assert table(db) == table(fresh)
+    assert apply_changes(str(db), changes).runs == 0
@@ -0,0 +1,90 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from convert_invoices import FIELDNAMES, convert_batch, convert_partitioned
+from invoice_partitions import (MANIFEST_NAME, load_manifest, read_range, select_partitions,
+                                write_partitions)
+
+EXPORT = Path(__file__).resolve().parent.parent / 'invoice_data_since_2024'
+
+
+@pytest.fixture(scope='module')
+def converted(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('partitions')
+    convert_batch(EXPORT, tmp_path / 'batch.csv')
+    convert_partitioned(EXPORT, tmp_path / 'invoices', tmp_dir=str(tmp_path))
+    with open(tmp_path / 'batch.csv', newline='', encoding='utf-8') as f:
+        return tmp_path / 'invoices', list(csv.DictReader(f))
+
+
+def test_manifest_describes_the_partition_files(converted):
+    directory, rows = converted
+    manifest = load_manifest(directory)
+    assert manifest['rows'] == len(rows)
+    assert [entry['month'] for entry in manifest['partitions']] == sorted(
+        {row['Received_Date'][:7] for row in rows}, reverse=True)
+    listed = []
+    for entry in manifest['partitions']:
+        with open(directory / entry['file'], newline='', encoding='utf-8') as f:
+            part = list(csv.DictReader(f))
+        assert entry['rows'] == len(part)
+        assert entry['totalAmount'] == round(sum(float(row['Amount']) for row in part), 2)
+        assert entry['minReceived'] == min(row['Received_Date'] for row in part)
+        assert entry['maxReceived'] == max(row['Received_Date'] for row in part)
+        listed += part
+    # Files in manifest order are the batch output, newest first
+    assert listed == rows
+
+
+@pytest.mark.parametrize('date_from, date_to', [
+    (None, None), ('2025-03-01', None), (None, '2024-12-31'),
+    ('2025-02-14', '2025-05-02'), ('2025-06-01', '2025-06-01'), ('2031-01-01', None),
+])
+def test_read_range_matches_a_full_scan(converted, date_from, date_to):
+    directory, rows = converted
+    expected = [row for row in rows
+                if (not date_from or row['Received_Date'][:10] >= date_from)
+                and (not date_to or row['Received_Date'][:10] <= date_to)]
+    assert list(read_range(directory, date_from, date_to)) == expected
+
+
+def test_range_reads_open_only_months_with_matching_rows(converted):
+    directory, rows = converted
+    selected = select_partitions(load_manifest(directory), '2025-02-14', '2025-05-02')
+    months = {row['Received_Date'][:7] for row in rows
+              if '2025-02-14' <= row['Received_Date'][:10] <= '2025-05-02'}
+    assert [entry['month'] for entry in selected] == sorted(months, reverse=True)
+    assert len(selected) < len(load_manifest(directory)['partitions'])
+
+
+def _row(received, amount='1'):
+    return dict(dict.fromkeys(FIELDNAMES, ''), Received_Date=received, Amount=amount)
+
+
+def test_undated_rows_and_rewrites(tmp_path):
+    directory = tmp_path / 'invoices'
+    rows = [_row('2025-09-04T00:00:00.000Z'), _row('2025-08-01T00:00:00.000Z'),
+            _row('2025-09-01T00:00:00.000Z', '2.5'), _row('4-Foo-25'), _row('')]
+    assert write_partitions(directory, rows, FIELDNAMES, 'now') == 5
+    manifest = load_manifest(directory)
+    assert [(e['month'], e['rows']) for e in manifest['partitions']] == [
+        ('2025-09', 2), ('2025-08', 1), ('undated', 2)]
+    assert manifest['partitions'][-1]['minReceived'] is None
+    # Undated rows only come back from an unbounded read
+    assert len(list(read_range(directory))) == 5
+    assert len(list(read_range(directory, '2000-01-01'))) == 3
+
+    write_partitions(directory, rows[1:2], FIELDNAMES, 'later')
+    assert sorted(path.name for path in directory.iterdir()) == ['2025-08.csv', MANIFEST_NAME]
+
+    def failing():
+        yield rows[0]
+        raise OSError('export went away')
+
+    with pytest.raises(OSError):
+        write_partitions(directory, failing(), FIELDNAMES, 'failed')
+    assert json.loads((directory / MANIFEST_NAME).read_text())['generatedAt'] == 'later'
+    assert not (tmp_path / 'invoices.tmp').exists()
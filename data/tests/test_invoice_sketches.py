@@ -0,0 +1,33 @@
+import json
+import random
+
+from invoice_sketches import SpaceSaving
+
+
+def reference_space_saving(stream, capacity):
+    """The textbook algorithm: scan every counter for the one to evict."""
+    counters = {}
+    for item, weight in stream:
+        if item in counters:
+            counters[item][0] += weight
+        elif len(counters) < capacity:
+            counters[item] = [weight, 0]
+        else:
+            victim = min(counters, key=lambda key: counters[key][0])
+            floor = counters.pop(victim)[0]
+            counters[item] = [floor + weight, floor]
+    return counters
+
+
+def test_heap_eviction_matches_the_linear_scan():
+    rng = random.Random(7)
+    stream = [(f'vendor-{int(rng.paretovariate(1.2)) % 300}', rng.choice([1, 2, 12.5]))
+              for _ in range(5000)]
+    sketch = SpaceSaving(capacity=20)
+    for i, (item, weight) in enumerate(stream):
+        sketch.add(item, weight)
+        if i == 2500:
+            # Resuming from saved state (as incremental runs do) keeps the order
+            sketch = SpaceSaving.from_state(json.loads(json.dumps(sketch.to_state())))
+    assert sketch.counters == reference_space_saving(stream, 20)
+    assert sketch.top(1)[0][0] == 'vendor-1'
@@ -0,0 +1,93 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from invoice_store import SORT_FIELDS, InvoiceQuery, InvoiceStore
+
+pytest.importorskip('numpy')
+
+CSV_FILE = Path(__file__).resolve().parent.parent / 'invoices_cleaned_2024.csv'
+# Half the shipped invoices fall due before this
+AS_OF = '2025-01-13T00:00:00.000Z'
+
+# Rows the shipped CSV lacks: paid, undated, NaN amounts, blank labels, ties
+EXTRA_ROWS = [
+    {'Email_ID': 'x1', 'Received_Date': '2025-09-04T00:00:00.000Z', 'Amount': '0.0',
+     'Vendor': 'Align.Build Pty Ltd', 'Category': 'standard_pdf',
+     'Due_Date': '2025-09-11T00:00:00.000Z'},
+    {'Email_ID': 'x2', 'Received_Date': '2025-09-04T00:00:00.000Z', 'Amount': '250.0',
+     'Vendor': '', 'Category': '', 'Due_Date': ''},
+    {'Email_ID': 'x3', 'Received_Date': '2024-02-30T00:00:00.000Z', 'Amount': 'nan',
+     'Vendor': 'Zeta', 'Category': 'xero', 'Due_Date': 'soon'},
+    {'Email_ID': 'x4', 'Received_Date': '', 'Amount': '12.5', 'Vendor': 'Zeta',
+     'Category': 'xero', 'Due_Date': '2024-01-01T00:00:00.000Z'},
+]
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    with open(CSV_FILE, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    path = tmp_path / 'invoices.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=reader.fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(rows[:70] + EXTRA_ROWS + rows[70:])
+    return path
+
+
+@pytest.fixture
+def stores(tmp_path, csv_file):
+    with InvoiceStore(tmp_path / 'invoices.sqlite') as plain:
+        plain.rebuild(csv_file)
+        with InvoiceStore(tmp_path / 'invoices.sqlite') as indexed:
+            indexed.load_index()
+            yield plain, indexed
+
+
+def _queries(plain):
+    facets = plain.facets(InvoiceQuery(), AS_OF)['facets']
+    vendors = [entry['value'] for entry in facets['vendors']]
+    categories = [entry['value'] for entry in facets['categories']]
+    return [
+        InvoiceQuery(),
+        InvoiceQuery(statuses=['overdue']),
+        InvoiceQuery(statuses=['paid', 'pending']),
+        InvoiceQuery(vendors=vendors[:2], amount_min=100),
+        InvoiceQuery(categories=categories[-1:], date_from='2025-01-01', date_to='2025-06-30'),
+        InvoiceQuery(statuses=['pending'], amount_max=300),
+        InvoiceQuery(vendors=['No Such Vendor']),
+    ]
+
+
+def test_index_pages_and_facets_match_sql(stores):
+    plain, indexed = stores
+    for query in _queries(plain):
+        assert indexed.facets(query, AS_OF) == plain.facets(query, AS_OF)
+        for sort_by in SORT_FIELDS:
+            for sort_order in ('asc', 'desc'):
+                for page in (1, 3):
+                    args = (query, page, 25, sort_by, sort_order, AS_OF)
+                    assert indexed.page(*args) == plain.page(*args), (query, sort_by, sort_order)
+
+
+def test_totals_match_the_csv_rows(stores, csv_file):
+    plain, _ = stores
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    for query in _queries(plain):
+        expected = sum(1 for row in rows if query.matches(row, AS_OF))
+        for store in stores:
+            assert store.page(query, as_of=AS_OF)['pagination']['total'] == expected
+
+
+def test_bad_sort_arguments_are_rejected(stores):
+    plain, _ = stores
+    with pytest.raises(ValueError):
+        plain.page(InvoiceQuery(), sort_by='total')
+    with pytest.raises(ValueError):
+        plain.page(InvoiceQuery(), sort_order='up')
+    with pytest.raises(ValueError):
+        plain.page(InvoiceQuery(statuses=['late']))
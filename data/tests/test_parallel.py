@@ -0,0 +1,32 @@
+from pathlib import Path
+
+import pytest
+
+from convert_invoices import convert_batch, convert_parallel, shard_ranges
+
+DATA_DIR = Path(__file__).resolve().parent.parent
+EXPORT = DATA_DIR / 'invoice_data_since_2024'
+
+
+def _summary(stats):
+    return (stats.original, stats.duplicates, stats.written, dict(stats.category_stats),
+            dict(stats.status_stats), dict(stats.vendor_stats), dict(stats.parse_failures),
+            round(stats.total_amount, 2))
+
+
+@pytest.mark.parametrize('duplicate_policy', [None, 'drop', 'flag', 'keep-latest'])
+def test_parallel_matches_batch(duplicate_policy, tmp_path):
+    batch = convert_batch(EXPORT, tmp_path / 'batch.csv', duplicate_policy=duplicate_policy)
+    parallel = convert_parallel(EXPORT, tmp_path / 'parallel.csv', workers=3,
+                                duplicate_policy=duplicate_policy, tmp_dir=str(tmp_path))
+    assert (tmp_path / 'parallel.csv').read_bytes() == (tmp_path / 'batch.csv').read_bytes()
+    assert _summary(parallel) == _summary(batch)
+
+
+def test_shards_cover_the_body_on_line_boundaries():
+    header_end = EXPORT.read_bytes().index(b'\n') + 1
+    ranges = shard_ranges(EXPORT, header_end, 7)
+    data = EXPORT.read_bytes()
+    assert ranges[0][0] == header_end and ranges[-1][1] == len(data)
+    for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+        assert hi == lo and data[hi - 1:hi] == b'\n'
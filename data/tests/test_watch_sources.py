@@ -0,0 +1,29 @@
+from watch_sources import SourceWatcher, Target, default_targets
+
+HEADER = 'message_id\tinvoice_number\tsupplier_name\tinvoice_date\ttotal\n'
+
+
+def test_a_file_shared_by_two_targets_runs_both(tmp_path):
+    tsv = tmp_path / 'export.tsv'
+    tsv.write_text(HEADER, encoding='utf-8')
+    runs = []
+    targets = [Target('mailbox', [tsv], lambda paths: runs.append('mailbox')),
+               Target('workbooks', [tsv, tmp_path / '*.xlsx'],
+                      lambda paths: runs.append('workbooks'))]
+    watcher = SourceWatcher(targets, tmp_path / 'state.json', debounce=0)
+    watcher.scan_all()
+    watcher.settle()
+    assert runs == ['mailbox', 'workbooks']
+
+    watcher.scan_all()
+    watcher.settle()
+    assert runs == ['mailbox', 'workbooks']
+
+
+def test_merged_csv_is_written_next_to_the_configured_output(tmp_path):
+    tsv = tmp_path / 'export.tsv'
+    tsv.write_text(HEADER + 'm1\tA-1\tAcme\t2025-09-01\t10\n', encoding='utf-8')
+    mailbox, workbooks = default_targets(tsv, tmp_path / 'cleaned.csv')
+    assert tsv in workbooks.patterns
+    workbooks.action([tsv])
+    assert (tmp_path / 'invoices_merged.csv').exists()
@@ -0,0 +1,190 @@
+"""Pre-aggregated trend cubes: invoice counts and amounts over time.
+
+The dashboard's ``trends.invoiceDelta``/``amountDelta`` and its charts compare
+periods of received invoices, overall or for one vendor, category or
+processing status. Rather than rescanning invoices per request, the
+converter keeps one ``[count, amount]`` cell per received day:
+
+* overall, and
+* per vendor, per category and per processing status.
+
+Cells are added to as rows are written (``dashboard_rollups.py`` keeps them
+in its state, so incremental runs extend them) and :meth:`TrendCubes.merge`
+combines cubes built separately. Weeks (starting Monday) and months are
+rolled up from the day cells on demand, so a series or a period comparison
+reads a few hundred cells whatever the number of invoices.
+
+``invoice-trends.json`` in the rollups directory materialises the month and
+week series for every dimension, the last :data:`DAY_SERIES_DAYS` days of
+day series, and the 30-day deltas overall and per dimension value.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+GRAINS = ('day', 'week', 'month')
+DIMENSIONS = ('vendor', 'category', 'status')
+# invoiceDelta/amountDelta compare the last window with the one before it.
+TREND_WINDOW_DAYS = 30
+# Day series in the materialised payload cover this many days up to as_of
+DAY_SERIES_DAYS = 90
+
+
+def _percent_change(current: float, previous: float) -> float:
+    if not previous:
+        return 0.0
+    return round((current - previous) / previous * 100, 1)
+
+
+@lru_cache(maxsize=4096)
+def week_start(day: str) -> str:
+    """Monday of the ISO week containing ``day`` (both ``YYYY-MM-DD``)."""
+    value = date.fromisoformat(day)
+    return (value - timedelta(days=value.weekday())).isoformat()
+
+
+def period(day: str, grain: str) -> str:
+    """The ``day``/``week``/``month`` bucket a ``YYYY-MM-DD`` day falls in."""
+    if grain == 'day':
+        return day
+    if grain == 'week':
+        return week_start(day)
+    if grain == 'month':
+        return day[:7]
+    raise ValueError(f"Unknown grain {grain!r}; expected one of {', '.join(GRAINS)}")
+
+
+def _add(cells: Dict[str, List[float]], day: str, count: float, amount: float) -> None:
+    cell = cells.get(day)
+    if cell is None:
+        cells[day] = [count, amount]
+    else:
+        cell[0] += count
+        cell[1] += amount
+
+
+class TrendCubes:
+    """``[count, amount]`` per received day, overall and per dimension value."""
+
+    def __init__(self) -> None:
+        self.total: Dict[str, List[float]] = {}
+        # dimension -> value -> day -> [count, amount]
+        self.cells: Dict[str, Dict[str, Dict[str, List[float]]]] = {
+            dimension: {} for dimension in DIMENSIONS}
+
+    def add(self, day: str, amount: float, vendor: str, category: str, status: str) -> None:
+        _add(self.total, day, 1, amount)
+        for cells, value in ((self.cells['vendor'], vendor),
+                             (self.cells['category'], category),
+                             (self.cells['status'], status)):
+            days = cells.get(value)
+            if days is None:
+                cells[value] = {day: [1, amount]}
+            else:
+                _add(days, day, 1, amount)
+
+    def merge(self, other: 'TrendCubes') -> None:
+        for day, (count, amount) in other.total.items():
+            _add(self.total, day, count, amount)
+        for dimension, values in other.cells.items():
+            mine = self.cells[dimension]
+            for value, days in values.items():
+                target = mine.setdefault(value, {})
+                for day, (count, amount) in days.items():
+                    _add(target, day, count, amount)
+
+    def values(self, dimension: str) -> List[str]:
+        """Values seen for ``dimension``, most invoices first."""
+        values = self._dimension(dimension)
+        return sorted(values, key=lambda value: (-sum(cell[0] for cell in values[value].values()),
+                                                 value))
+
+    def _dimension(self, dimension: str) -> Dict[str, Dict[str, List[float]]]:
+        try:
+            return self.cells[dimension]
+        except KeyError:
+            raise ValueError(f"Unknown dimension {dimension!r}; "
+                             f"expected one of {', '.join(DIMENSIONS)}") from None
+
+    def _days(self, dimension: Optional[str], value: Optional[str]) -> Dict[str, List[float]]:
+        if dimension is None:
+            return self.total
+        return self._dimension(dimension).get(value, {})
+
+    def series(self, grain: str = 'day', dimension: Optional[str] = None,
+               value: Optional[str] = None, start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """``{period, count, amount}`` per bucket, oldest first.
+
+        ``start`` and ``end`` are inclusive ``YYYY-MM-DD`` days; a partial
+        week or month at either end covers only the days inside the range.
+        """
+        buckets: Dict[str, List[float]] = {}
+        for day, (count, amount) in self._days(dimension, value).items():
+            if (start and day < start) or (end and day > end):
+                continue
+            _add(buckets, period(day, grain), count, amount)
+        return [{'period': key, 'count': int(buckets[key][0]),
+                 'amount': round(buckets[key][1], 2)} for key in sorted(buckets)]
+
+    def window(self, start: str, end: str, dimension: Optional[str] = None,
+               value: Optional[str] = None) -> Tuple[int, float]:
+        """Count and amount received on days ``start <= day < end``."""
+        count, amount = 0, 0.0
+        for day, (day_count, day_amount) in self._days(dimension, value).items():
+            if start <= day < end:
+                count += day_count
+                amount += day_amount
+        return int(count), amount
+
+    def deltas(self, as_of: str, dimension: Optional[str] = None, value: Optional[str] = None,
+               window_days: int = TREND_WINDOW_DAYS) -> Dict[str, Any]:
+        """Percent change of the last ``window_days`` up to ``as_of`` over the window before."""
+        today = datetime.strptime(as_of[:10], '%Y-%m-%d') + timedelta(days=1)
+        window = timedelta(days=window_days)
+        current = self.window((today - window).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'),
+                              dimension, value)
+        previous = self.window((today - 2 * window).strftime('%Y-%m-%d'),
+                               (today - window).strftime('%Y-%m-%d'), dimension, value)
+        return {
+            'invoiceDelta': _percent_change(current[0], previous[0]),
+            'amountDelta': _percent_change(current[1], previous[1]),
+        }
+
+    def payload(self, as_of: str) -> Dict[str, Any]:
+        """The ``invoice-trends.json`` payload."""
+        day_start = (datetime.strptime(as_of[:10], '%Y-%m-%d')
+                     - timedelta(days=DAY_SERIES_DAYS - 1)).strftime('%Y-%m-%d')
+        series: Dict[str, Any] = {}
+        for grain in GRAINS:
+            start = day_start if grain == 'day' else None
+            end = as_of[:10] if grain == 'day' else None
+            entry: Dict[str, Any] = {'all': self.series(grain, start=start, end=end)}
+            for dimension in DIMENSIONS:
+                entry[dimension] = {value: self.series(grain, dimension, value, start, end)
+                                    for value in self.values(dimension)}
+            series[grain] = entry
+        breakdowns = {}
+        for dimension in DIMENSIONS:
+            breakdowns[dimension] = [dict(value=value, **self.deltas(as_of, dimension, value))
+                                     for value in self.values(dimension)]
+        return {
+            'asOf': as_of,
+            'windowDays': TREND_WINDOW_DAYS,
+            'trends': self.deltas(as_of),
+            'breakdowns': breakdowns,
+            'series': series,
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'total': self.total, 'cells': self.cells}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'TrendCubes':
+        cubes = cls()
+        cubes.total = state['total']
+        cubes.cells.update(state['cells'])
+        return cubes
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Watch the invoice drops and convert only when a source really changed.
+
+Replaces re-running the converter blindly from cron. The mailbox export and
+the workbooks in ``data/`` and ``data/onedrive/`` are watched with inotify
+(Linux, via libc; no extra package) or, where that isn't available, by
+polling their size and mtime. A change only triggers work once:
+
+1. the file has stopped changing for ``--debounce`` seconds, so a download
+   or copy still in progress isn't converted half-written;
+2. its size or mtime differ from the last conversion; and
+3. its content hash differs too, so a ``touch`` or an identical re-download
+   (the OneDrive sync rewrites the same file) is ignored.
+
+The mailbox export is converted in-process with a resident
+:class:`~conversion_api.InvoiceConverter`, so caches stay warm between
+conversions. Changes to the workbooks or to the export re-run the
+multi-source ingestion, which writes ``invoices_merged.csv`` next to the
+cleaned CSV. The last converted fingerprints are saved in
+``data/.watch-state.json`` so a restart doesn't reconvert unchanged files.
+
+Usage:
+    python data/watch_sources.py [--poll] [--interval 5] [--debounce 2]
+    python data/watch_sources.py --once      # one check, for cron
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import ctypes.util
+import fnmatch
+import hashlib
+import json
+import os
+import select
+import struct
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from compressed_io import resolve
+from conversion_api import ConvertOptions, InvoiceConverter
+from convert_invoices import DATA_DIR, INPUT_FILE, OUTPUT_FILE
+
+ONEDRIVE_DIR = DATA_DIR / 'onedrive'
+STATE_FILE = DATA_DIR / '.watch-state.json'
+WORKBOOK_FILE = DATA_DIR / 'current_invoices.xlsx'
+ONEDRIVE_PATTERN = ONEDRIVE_DIR / '*.xlsx'
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_INTERVAL = 5.0
+HASH_CHUNK = 1024 * 1024
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def log(message: str) -> None:
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+@dataclass
+class Fingerprint:
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class Target:
+    """A group of watched files sharing one conversion action.
+
+    ``patterns`` are paths whose file name may be a glob (``onedrive/*.xlsx``).
+    """
+
+    name: str
+    patterns: List[Path]
+    action: Callable[[List[Path]], None]
+
+    @property
+    def directories(self) -> Set[Path]:
+        return {pattern.parent for pattern in self.patterns}
+
+    def matches(self, path: Path) -> bool:
+        return any(path.parent == pattern.parent and fnmatch.fnmatch(path.name, pattern.name)
+                   for pattern in self.patterns)
+
+    def files(self) -> List[Path]:
+        found = set()
+        for pattern in self.patterns:
+            if pattern.parent.is_dir():
+                found.update(path for path in pattern.parent.glob(pattern.name) if path.is_file())
+        return sorted(found)
+
+
+class InotifyWatcher:
+    """Directory watches through the raw inotify syscalls."""
+
+    def __init__(self, directories: Iterable[Path]) -> None:
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: float) -> Set[Path]:
+        """Paths with events within ``timeout`` seconds (empty on timeout)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name and wd in self._dirs:
+                    changed.add(self._dirs[wd] / os.fsdecode(name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback: compare (size, mtime) of the watched files every interval."""
+
+    def __init__(self, targets: Iterable[Target], interval: float) -> None:
+        self._targets = list(targets)
+        self._interval = interval
+        self._last = self._scan()
+
+    def _scan(self) -> Dict[Path, tuple]:
+        snapshot = {}
+        for target in self._targets:
+            for path in target.files():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: float) -> Set[Path]:
+        time.sleep(min(timeout, self._interval))
+        current = self._scan()
+        changed = {path for path in current.keys() | self._last.keys()
+                   if current.get(path) != self._last.get(path)}
+        self._last = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class SourceWatcher:
+    """Debounces file events and runs each target's action on real changes."""
+
+    def __init__(self, targets: List[Target], state_file: Path = STATE_FILE,
+                 debounce: float = DEFAULT_DEBOUNCE) -> None:
+        self.targets = targets
+        self.state_file = state_file
+        self.debounce = debounce
+        self.fingerprints: Dict[str, Fingerprint] = self._load_state()
+        # path -> (size, mtime_ns, monotonic time it was last seen changing)
+        self._pending: Dict[Path, tuple] = {}
+
+    def _load_state(self) -> Dict[str, Fingerprint]:
+        if not self.state_file.exists():
+            return {}
+        data = json.loads(self.state_file.read_text(encoding='utf-8'))
+        return {path: Fingerprint(**value) for path, value in data.items()}
+
+    def _save_state(self) -> None:
+        tmp = self.state_file.with_name(self.state_file.name + '.tmp')
+        tmp.write_text(json.dumps({path: asdict(fp) for path, fp in self.fingerprints.items()},
+                                  indent=2) + '\n', encoding='utf-8')
+        os.replace(tmp, self.state_file)
+
+    def targets_for(self, path: Path) -> List[Target]:
+        return [target for target in self.targets if target.matches(path)]
+
+    def notice(self, paths: Iterable[Path]) -> None:
+        """Queue paths that may have changed; they settle before being checked."""
+        now = time.monotonic()
+        for path in paths:
+            if not self.targets_for(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                self._pending.pop(path, None)
+                continue
+            key = (stat.st_size, stat.st_mtime_ns)
+            previous = self._pending.get(path)
+            if previous is None or previous[:2] != key:
+                self._pending[path] = key + (now,)
+
+    def changed(self, path: Path) -> Optional[Fingerprint]:
+        """The new fingerprint when ``path`` differs from the last conversion."""
+        stat = path.stat()
+        known = self.fingerprints.get(str(path))
+        if known is not None and (known.size, known.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return None
+        fingerprint = Fingerprint(stat.st_size, stat.st_mtime_ns, file_hash(path))
+        if known is not None and known.sha256 == fingerprint.sha256:
+            # Same bytes rewritten (touch, identical re-download): remember the
+            # new mtime so we don't hash it again, but don't convert.
+            self.fingerprints[str(path)] = fingerprint
+            self._save_state()
+            log(f"{path.name}: rewritten with identical content, skipped")
+            return None
+        return fingerprint
+
+    def settle(self) -> None:
+        """Run actions for pending paths that have been quiet for ``debounce`` seconds."""
+        now = time.monotonic()
+        # A path may feed several targets (the TSV is also an ingestion source)
+        due: Dict[str, List[Path]] = {}
+        fingerprints: Dict[Path, Fingerprint] = {}
+        for path, (size, mtime_ns, seen) in list(self._pending.items()):
+            if now - seen < self.debounce:
+                continue
+            del self._pending[path]
+            try:
+                stat = path.stat()
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                    # Still being written; wait another debounce period.
+                    self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+                    continue
+                fingerprint = self.changed(path)
+            except FileNotFoundError:
+                continue
+            if fingerprint is not None:
+                for target in self.targets_for(path):
+                    due.setdefault(target.name, []).append(path)
+                fingerprints[path] = fingerprint
+
+        for target in self.targets:
+            paths = due.get(target.name)
+            if not paths:
+                continue
+            log(f"{target.name}: {', '.join(path.name for path in paths)} changed, converting")
+            started = time.perf_counter()
+            try:
+                target.action(paths)
+            except Exception as exc:  # keep the daemon alive; retry on the next change
+                log(f"{target.name}: conversion failed: {exc}")
+                continue
+            for path in paths:
+                self.fingerprints[str(path)] = fingerprints[path]
+            self._save_state()
+            log(f"{target.name}: done in {time.perf_counter() - started:.2f}s")
+
+    def scan_all(self) -> None:
+        """Queue every watched file as already settled (start-up and ``--once``)."""
+        for target in self.targets:
+            for path in target.files():
+                stat = path.stat()
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, float('-inf'))
+
+    def run(self, watcher, interval: float) -> None:
+        self.scan_all()
+        self.settle()
+        while True:
+            self.notice(watcher.wait(self.debounce if self._pending else interval))
+            self.settle()
+
+
+def default_targets(input_file: Path = INPUT_FILE, output_file: Path = OUTPUT_FILE,
+                    options: Optional[ConvertOptions] = None,
+                    merged_file: Optional[Path] = None) -> List[Target]:
+    """The mailbox conversion and the multi-source ingestion.
+
+    The ingestion reads the mailbox TSV too, so it watches it as well. Its
+    merged CSV goes to ``merged_file``, by default next to ``output_file``.
+    """
+    from ingest_sources import OUTPUT_FILE as MERGED_FILE
+
+    converter = InvoiceConverter(options)
+    if merged_file is None:
+        merged_file = output_file.with_name(MERGED_FILE.name)
+
+    def convert_mailbox(paths: List[Path]) -> None:
+        stats = converter.convert(input_file, output_file)
+        log(f"mailbox: {stats.written} invoices written to {output_file.name} "
+            f"({stats.duplicates} duplicate messages)")
+
+    def ingest_workbooks(paths: List[Path]) -> None:
+        from ingest_sources import collect_sources, ingest, latest_onedrive_drop
+
+        workbooks = [path for path in (WORKBOOK_FILE, latest_onedrive_drop(ONEDRIVE_DIR))
+                     if path and path.exists()]
+        sources = collect_sources(input_file, workbooks)
+        ingest(sources, merged_file)
+
+    return [
+        Target('mailbox', [input_file], convert_mailbox),
+        Target('workbooks', [input_file, WORKBOOK_FILE, ONEDRIVE_PATTERN], ingest_workbooks),
+    ]
+
+
+def make_watcher(targets: List[Target], poll: bool, interval: float):
+    if not poll:
+        directories = sorted({directory for target in targets for directory in target.directories
+                              if directory.is_dir()})
+        try:
+            watcher = InotifyWatcher(directories)
+            log(f"watching {', '.join(str(d) for d in directories)} with inotify")
+            return watcher
+        except (OSError, AttributeError) as exc:
+            log(f"inotify unavailable ({exc}); polling instead")
+    log(f"polling every {interval:g}s")
+    return PollingWatcher(targets, interval)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', type=Path, default=INPUT_FILE,
+                        help='mailbox TSV export (default: %(default)s)')
+    parser.add_argument('--output', type=Path, default=OUTPUT_FILE,
+                        help='cleaned CSV to write (default: %(default)s)')
+    parser.add_argument('--merged-output', type=Path, default=None,
+                        help='merged multi-source CSV to write (default: invoices_merged.csv '
+                             'next to --output)')
+    parser.add_argument('--state', type=Path, default=STATE_FILE,
+                        help='fingerprints of the last conversion (default: %(default)s)')
+    parser.add_argument('--poll', action='store_true', help='poll instead of using inotify')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='polling interval in seconds (default: %(default)s)')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='seconds a file must stay unchanged before converting '
+                             '(default: %(default)s)')
+    parser.add_argument('--once', action='store_true',
+                        help='convert whatever changed since the last run, then exit')
+    parser.add_argument('--rollups', action='store_true',
+                        help='also materialise dashboard rollups next to the output')
+    args = parser.parse_args(argv)
+
+    rollups_dir = args.output.with_name(args.output.stem + '.rollups') if args.rollups else None
+    targets = default_targets(resolve(args.input).resolve(), args.output,
+                              ConvertOptions(rollups_dir=rollups_dir), args.merged_output)
+    source_watcher = SourceWatcher(targets, args.state, args.debounce)
+    if args.once:
+        source_watcher.scan_all()
+        source_watcher.settle()
+        return
+
+    watcher = make_watcher(targets, args.poll, args.interval)
+    try:
+        source_watcher.run(watcher, args.interval)
+    except KeyboardInterrupt:
+        log("stopped")
+    finally:
+        watcher.close()
+
+
+if __name__ == '__main__':
+    main()